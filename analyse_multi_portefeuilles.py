@@ -0,0 +1,94 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+import os
+import numpy as np
+import pandas as pd
+from database_portefeuille import DatabasePortefeuille
+from fournisseur_donnees import get_fournisseur, convertir_periode
+from moteur_rendements import MoteurRendements
+import analytique
+import comparaison
+from instrumentation import logger
+
+REFERENCES = ("^GSPC",)
+
+
+def _analyser_portefeuille(nom, transactions, clotures, rendements_references, debut, taux_sans_risque):
+    # Exécutée dans un processus séparé : uniquement des DataFrames en entrée, un dict en sortie
+    ligne = {"Portefeuille": nom}
+    try:
+        premier_jour = pd.Timestamp(transactions["date"].min()).normalize()
+        moteur = MoteurRendements(transactions, clotures.loc[premier_jour:])
+        rendements = moteur.rendements_twr().iloc[1:]
+        rendements = rendements[rendements.index >= debut]
+        if len(rendements) < 2:
+            raise ValueError("pas assez de séances")
+        r = rendements.to_numpy()
+        ligne.update({
+            "Valeur": float(moteur.valeurs[-1]),
+            "Lignes": int(np.count_nonzero(moteur.quantites[-1])),
+            "TWR": float(np.prod(1 + r) - 1),
+            "MWR": moteur.mwr(debut),
+            "Volatilité": analytique.volatilite(r, annualiser=True),
+            "Sharpe": analytique.sharpe(r, taux_sans_risque),
+            # Drawdown de l'indice des rendements chaînés, insensible aux apports et retraits
+            "Maximum Drawdown": analytique.maximum_drawdown(np.cumprod(1 + r)),
+        })
+        if rendements_references is not None and not rendements_references.empty:
+            resume = comparaison.comparer_series(rendements, rendements_references, taux_sans_risque)
+            for _, comparaison_reference in resume.iterrows():
+                ticker = comparaison_reference["Ticker"]
+                for cle in ("Surperformance", "Tracking error", "Information ratio", "Bêta", "Alpha (annualisé)"):
+                    ligne[f"{cle} {ticker}"] = comparaison_reference[cle]
+    except Exception as e:
+        ligne["Erreur"] = str(e)
+    return ligne
+
+
+def analyser_portefeuilles(db: DatabasePortefeuille = None, noms=None, references=REFERENCES, period="1y",
+                           taux_sans_risque=0.01, processus=None) -> pd.DataFrame:
+    """
+    Performance, Sharpe, drawdown et comparaison aux références de tous les portefeuilles de la base
+    (ou de `noms`), en un seul tableau indexé par portefeuille.
+    L'historique des transactions est lu en une requête et les clôtures de l'ensemble des tickers,
+    dédupliqués, en une seule requête groupée ; les calculs par portefeuille sont répartis sur un
+    pool de `processus` processus (tous les cœurs par défaut, 0 ou 1 pour rester dans le processus courant).
+    """
+    db = db or DatabasePortefeuille()
+    noms = db.get_all_portfolios() if noms is None else list(noms)
+    transactions = db.get_toutes_transactions(noms)
+    if transactions.empty:
+        return pd.DataFrame(index=pd.Index(noms, name="Portefeuille"))
+
+    references = [references] if isinstance(references, str) else list(references or [])
+    debut = pd.Timestamp(convertir_periode(period)[0])
+    premier_jour = pd.Timestamp(transactions["date"].min()).date()
+    tickers = list(dict.fromkeys(list(transactions["ticker"].unique()) + references))
+    clotures = get_fournisseur().get_clotures(tickers, min(premier_jour, debut.date()), date.today() + timedelta(days=1))
+
+    rendements_references = None
+    if references:
+        rendements_references = clotures[references].ffill().pct_change().iloc[1:]
+        rendements_references = rendements_references.loc[:, rendements_references.notna().any(axis=0)]
+    clotures = clotures.loc[:, clotures.notna().any(axis=0)]
+
+    taches = []
+    for nom, transactions_portefeuille in transactions.groupby("nom_portefeuille", sort=False):
+        colonnes = [t for t in transactions_portefeuille["ticker"].unique() if t in clotures.columns]
+        taches.append((nom, transactions_portefeuille.drop(columns="nom_portefeuille"), clotures[colonnes],
+                       rendements_references, debut, taux_sans_risque))
+
+    processus = os.cpu_count() if processus is None else processus
+    if processus <= 1 or len(taches) <= 1:
+        lignes = [_analyser_portefeuille(*tache) for tache in taches]
+    else:
+        with ProcessPoolExecutor(max_workers=min(processus, len(taches))) as executeur:
+            lignes = list(executeur.map(_analyser_portefeuille, *zip(*taches),
+                                        chunksize=max(1, len(taches) // (4 * processus))))
+
+    for ligne in lignes:
+        if "Erreur" in ligne:
+            logger.error("Erreur dans l'analyse du portefeuille %s : %s", ligne["Portefeuille"], ligne["Erreur"])
+    resume = pd.DataFrame(lignes).set_index("Portefeuille")
+    # Portefeuilles sans aucune transaction : lignes vides
+    return resume.reindex(list(dict.fromkeys(noms + list(resume.index))))
@@ -0,0 +1,360 @@
+"""
+Indicateurs de performance et de risque vectorisés, partagés par Actifs, Index et Portefeuille.
+
+Toutes les fonctions acceptent une série 1-D (une valeur par séance) ou un tableau 2-D
+(séances x instruments, le temps sur l'axe 0) : un appel calcule alors l'indicateur pour
+chaque colonne et renvoie un tableau de taille N au lieu d'un scalaire.
+"""
+from collections import deque
+from statistics import NormalDist
+import numpy as np
+
+JOURS_BOURSE = 252
+
+
+def _en_tableau(valeurs) -> np.ndarray:
+    return np.ascontiguousarray(valeurs, dtype=np.float64)
+
+
+def _resultat(valeur):
+    valeur = np.asarray(valeur)
+    return valeur.item() if valeur.ndim == 0 else valeur
+
+
+def rendements(prix) -> np.ndarray:
+    """Rendements simples ; un prix précédent nul donne un rendement nul."""
+    prix = _en_tableau(prix)
+    if prix.shape[0] < 2:
+        return np.zeros((0,) + prix.shape[1:])
+    precedents = prix[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        resultat = np.where(precedents != 0, prix[1:] / precedents - 1.0, 0.0)
+    return resultat
+
+
+def log_rendements(prix) -> np.ndarray:
+    prix = _en_tableau(prix)
+    if prix.shape[0] < 2:
+        return np.zeros((0,) + prix.shape[1:])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        resultat = np.log(prix[1:] / prix[:-1])
+    return np.where(np.isfinite(resultat), resultat, 0.0)
+
+
+def volatilite(rendements, annualiser: bool = False, periodes: int = JOURS_BOURSE):
+    """Écart-type (non biaisé) des rendements, éventuellement annualisé."""
+    rendements = _en_tableau(rendements)
+    if rendements.shape[0] < 2:
+        return _resultat(np.zeros(rendements.shape[1:]))
+    vol = rendements.std(axis=0, ddof=1)
+    if annualiser:
+        vol = vol * np.sqrt(periodes)
+    return _resultat(vol)
+
+
+def volatilite_glissante(rendements, fenetre: int, annualiser: bool = False,
+                         periodes: int = JOURS_BOURSE) -> np.ndarray:
+    """Volatilité sur chaque fenêtre de `fenetre` séances, calculée par sommes cumulées en O(T)."""
+    rendements = _en_tableau(rendements)
+    n = rendements.shape[0]
+    if fenetre < 2 or n < fenetre:
+        return np.zeros((0,) + rendements.shape[1:])
+    zeros = np.zeros((1,) + rendements.shape[1:])
+    somme = np.concatenate([zeros, np.cumsum(rendements, axis=0)])
+    somme_carres = np.concatenate([zeros, np.cumsum(rendements ** 2, axis=0)])
+    s = somme[fenetre:] - somme[:-fenetre]
+    s2 = somme_carres[fenetre:] - somme_carres[:-fenetre]
+    variance = np.maximum((s2 - s ** 2 / fenetre) / (fenetre - 1), 0.0)
+    vol = np.sqrt(variance)
+    if annualiser:
+        vol = vol * np.sqrt(periodes)
+    return vol
+
+
+def sharpe(rendements, taux_sans_risque: float = 0.0, periodes: int = JOURS_BOURSE):
+    """Ratio de Sharpe annualisé : (rendement annuel - taux sans risque) / volatilité annualisée."""
+    rendements = _en_tableau(rendements)
+    if rendements.shape[0] < 2:
+        return _resultat(np.zeros(rendements.shape[1:]))
+    vol = rendements.std(axis=0, ddof=1)
+    excedent = rendements.mean(axis=0) * periodes - taux_sans_risque
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(vol > 0, excedent / (vol * np.sqrt(periodes)), 0.0)
+    return _resultat(ratio)
+
+
+def sortino(rendements, taux_sans_risque: float = 0.0, periodes: int = JOURS_BOURSE):
+    """Ratio de Sortino annualisé : seul l'écart à la baisse sous le taux sans risque est pénalisé."""
+    rendements = _en_tableau(rendements)
+    if rendements.shape[0] < 2:
+        return _resultat(np.zeros(rendements.shape[1:]))
+    excedents = rendements - taux_sans_risque / periodes
+    ecart_baissier = np.sqrt(np.mean(np.minimum(excedents, 0.0) ** 2, axis=0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(ecart_baissier > 0,
+                         excedents.mean(axis=0) * periodes / (ecart_baissier * np.sqrt(periodes)), 0.0)
+    return _resultat(ratio)
+
+
+def drawdowns(prix) -> np.ndarray:
+    """Baisse relative (négative ou nulle) de chaque séance par rapport au plus haut précédent."""
+    prix = _en_tableau(prix)
+    if prix.shape[0] == 0:
+        return prix.copy()
+    pics = np.maximum.accumulate(prix, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        baisse = np.where(pics != 0, prix / pics - 1.0, 0.0)
+    return baisse
+
+
+def maximum_drawdown(prix):
+    """Plus forte baisse depuis un plus haut, en valeur positive (0.25 pour -25 %)."""
+    baisse = drawdowns(prix)
+    if baisse.shape[0] == 0:
+        return _resultat(np.zeros(baisse.shape[1:]))
+    return _resultat(-baisse.min(axis=0))
+
+
+def duree_drawdown(prix):
+    """Plus long nombre de séances passées sous un plus haut précédent."""
+    baisse = drawdowns(prix)
+    n = baisse.shape[0]
+    if n == 0:
+        return _resultat(np.zeros(baisse.shape[1:], dtype=np.int64))
+    positions = np.arange(n).reshape((n,) + (1,) * (baisse.ndim - 1))
+    # Position du dernier plus haut atteint à chaque séance
+    dernier_pic = np.maximum.accumulate(np.where(baisse >= 0, positions, 0), axis=0)
+    return _resultat((positions - dernier_pic).max(axis=0))
+
+
+class MetriquesGlissantes:
+    """Risque d'un actif sur les `fenetre` derniers rendements (volatilité, bêta, VaR paramétrique)
+    et drawdown sur tout le chemin des prix, mis à jour en O(1) à chaque nouvelle séance.
+
+    Les sommes courantes sont recalculées exactement toutes les `fenetre` mises à jour pour
+    éviter la dérive numérique des additions/soustractions successives.
+    """
+
+    def __init__(self, fenetre: int = JOURS_BOURSE):
+        self.fenetre = fenetre
+        self._rendements = deque()
+        self._rendements_ref = deque()
+        self._somme = 0.0
+        self._somme_carres = 0.0
+        self._somme_ref = 0.0
+        self._somme_carres_ref = 0.0
+        self._somme_croisee = 0.0
+        self._mises_a_jour = 0
+        self.dernier_prix = None
+        self.dernier_prix_ref = None
+        self.pic = None
+        self.maximum_drawdown = 0.0
+        # (prix, prix de référence, plus haut, drawdown maximal) avant la dernière séance
+        self._precedent = None
+
+    def initialiser(self, prix, prix_ref=None):
+        """Construit l'état à partir d'un historique complet (calcul vectorisé)."""
+        prix = _en_tableau(prix)
+        self.__init__(self.fenetre)
+        if prix.shape[0] == 0:
+            return
+        self._rendements.extend(rendements(prix)[-self.fenetre:].tolist())
+        if prix_ref is not None:
+            prix_ref = _en_tableau(prix_ref)
+            self._rendements_ref.extend(rendements(prix_ref)[-self.fenetre:].tolist())
+            self.dernier_prix_ref = float(prix_ref[-1])
+        self._recalculer_sommes()
+        self.dernier_prix = float(prix[-1])
+        self.pic = float(prix.max())
+        self.maximum_drawdown = maximum_drawdown(prix)
+        if prix.shape[0] > 1:
+            self._precedent = (float(prix[-2]), None if prix_ref is None else float(prix_ref[-2]),
+                               float(prix[:-1].max()), maximum_drawdown(prix[:-1]))
+
+    def _recalculer_sommes(self):
+        r = np.fromiter(self._rendements, dtype=np.float64, count=len(self._rendements))
+        self._somme = float(r.sum())
+        self._somme_carres = float(r @ r)
+        if self._rendements_ref:
+            r_ref = np.fromiter(self._rendements_ref, dtype=np.float64, count=len(self._rendements_ref))
+            self._somme_ref = float(r_ref.sum())
+            self._somme_carres_ref = float(r_ref @ r_ref)
+            self._somme_croisee = float(r @ r_ref)
+
+    def ajouter(self, prix: float, prix_ref: float = None):
+        """Intègre une nouvelle séance en O(1)."""
+        prix = float(prix)
+        suivre_ref = self.dernier_prix_ref is not None
+        if self.dernier_prix is None:
+            self.dernier_prix = self.pic = prix
+            self.dernier_prix_ref = None if prix_ref is None else float(prix_ref)
+            return
+        self._precedent = (self.dernier_prix, self.dernier_prix_ref, self.pic, self.maximum_drawdown)
+
+        r = prix / self.dernier_prix - 1.0 if self.dernier_prix != 0 else 0.0
+        self._rendements.append(r)
+        self._somme += r
+        self._somme_carres += r * r
+        if suivre_ref:
+            # Sans cotation de référence ce jour-là, on considère la référence inchangée
+            prix_ref = self.dernier_prix_ref if prix_ref is None else float(prix_ref)
+            r_ref = prix_ref / self.dernier_prix_ref - 1.0 if self.dernier_prix_ref != 0 else 0.0
+            self._rendements_ref.append(r_ref)
+            self._somme_ref += r_ref
+            self._somme_carres_ref += r_ref * r_ref
+            self._somme_croisee += r * r_ref
+            self.dernier_prix_ref = prix_ref
+
+        if len(self._rendements) > self.fenetre:
+            ancien = self._rendements.popleft()
+            self._somme -= ancien
+            self._somme_carres -= ancien * ancien
+            if suivre_ref:
+                ancien_ref = self._rendements_ref.popleft()
+                self._somme_ref -= ancien_ref
+                self._somme_carres_ref -= ancien_ref * ancien_ref
+                self._somme_croisee -= ancien * ancien_ref
+
+        self._mises_a_jour += 1
+        if self._mises_a_jour % self.fenetre == 0:
+            self._recalculer_sommes()
+
+        self.dernier_prix = prix
+        self.pic = max(self.pic, prix)
+        if self.pic != 0:
+            self.maximum_drawdown = max(self.maximum_drawdown, 1.0 - prix / self.pic)
+
+    def remplacer_dernier(self, prix: float, prix_ref: float = None):
+        """Remplace la dernière séance (clôture révisée après un prix en séance) en O(1)."""
+        prix = float(prix)
+        if self._precedent is None or not self._rendements:
+            # Une seule séance connue : elle est simplement remplacée
+            self.dernier_prix = self.pic = prix
+            if prix_ref is not None:
+                self.dernier_prix_ref = float(prix_ref)
+            return
+        prix_precedent, prix_ref_precedent, pic, maximum = self._precedent
+        r = prix / prix_precedent - 1.0 if prix_precedent != 0 else 0.0
+        ancien = self._rendements[-1]
+        self._rendements[-1] = r
+        self._somme += r - ancien
+        self._somme_carres += r * r - ancien * ancien
+        if self._rendements_ref and prix_ref_precedent is not None:
+            prix_ref = self.dernier_prix_ref if prix_ref is None else float(prix_ref)
+            r_ref = prix_ref / prix_ref_precedent - 1.0 if prix_ref_precedent != 0 else 0.0
+            ancien_ref = self._rendements_ref[-1]
+            self._rendements_ref[-1] = r_ref
+            self._somme_ref += r_ref - ancien_ref
+            self._somme_carres_ref += r_ref * r_ref - ancien_ref * ancien_ref
+            self._somme_croisee += r * r_ref - ancien * ancien_ref
+            self.dernier_prix_ref = prix_ref
+        self.dernier_prix = prix
+        self.pic = max(pic, prix)
+        self.maximum_drawdown = max(maximum, 1.0 - prix / self.pic) if self.pic != 0 else maximum
+
+    def _variance(self, somme, somme_carres):
+        n = len(self._rendements)
+        if n < 2:
+            return 0.0
+        return max((somme_carres - somme * somme / n) / (n - 1), 0.0)
+
+    def volatilite(self, annualiser: bool = False, periodes: int = JOURS_BOURSE):
+        vol = float(np.sqrt(self._variance(self._somme, self._somme_carres)))
+        return vol * float(np.sqrt(periodes)) if annualiser else vol
+
+    def beta(self):
+        """Bêta par rapport à la référence sur la fenêtre, ou None sans référence."""
+        n = len(self._rendements_ref)
+        if n < 2:
+            return None
+        variance_ref = self._variance(self._somme_ref, self._somme_carres_ref)
+        if variance_ref == 0:
+            return None
+        covariance = (self._somme_croisee - self._somme * self._somme_ref / n) / (n - 1)
+        return covariance / variance_ref
+
+    def value_at_risk(self, niveau: float = 0.95, horizon: int = 1):
+        """VaR paramétrique (loi normale) en fraction de la valeur : perte dépassée avec une
+        probabilité 1 - niveau sur `horizon` séances."""
+        n = len(self._rendements)
+        if n < 2:
+            return 0.0
+        moyenne = self._somme / n
+        z = NormalDist().inv_cdf(1.0 - niveau)
+        return -(moyenne * horizon + z * self.volatilite() * np.sqrt(horizon))
+
+    def drawdown_courant(self):
+        if not self.pic:
+            return 0.0
+        return 1.0 - self.dernier_prix / self.pic
+
+
+class StatistiquesCumulees:
+    """Moyenne et variance des rendements (algorithme de Welford), plus haut et drawdown maximal
+    sur tout l'historique, mis à jour en O(1) quand une séance s'ajoute."""
+
+    def __init__(self):
+        self.n = 0
+        self.moyenne = 0.0
+        self._m2 = 0.0
+        self.dernier_prix = None
+        self.pic = None
+        self.maximum_drawdown = 0.0
+        self._precedent = None
+
+    def initialiser(self, prix):
+        """Construit l'état à partir d'un historique complet (calcul vectorisé)."""
+        prix = _en_tableau(prix)
+        self.__init__()
+        if prix.shape[0] == 0:
+            return
+        # Tout sauf la dernière séance en vectorisé, puis la dernière par ajouter() : l'état
+        # précédent est ainsi conservé pour remplacer_dernier()
+        precedents = prix[:-1]
+        if precedents.shape[0]:
+            r = rendements(precedents)
+            self.n = len(r)
+            if self.n:
+                self.moyenne = float(r.mean())
+                self._m2 = float(((r - self.moyenne) ** 2).sum())
+            self.dernier_prix = float(precedents[-1])
+            self.pic = float(precedents.max())
+            self.maximum_drawdown = maximum_drawdown(precedents)
+        self.ajouter(prix[-1])
+
+    def remplacer_dernier(self, prix: float):
+        """Remplace le prix de la dernière séance (clôture révisée après un prix en séance)."""
+        etat = getattr(self, "_precedent", None)
+        if etat is None:
+            self.__init__()
+        else:
+            self.n, self.moyenne, self._m2, self.dernier_prix, self.pic, self.maximum_drawdown = etat
+        self.ajouter(prix)
+
+    def ajouter(self, prix: float):
+        prix = float(prix)
+        self._precedent = (self.n, self.moyenne, self._m2, self.dernier_prix, self.pic, self.maximum_drawdown)
+        if self.dernier_prix is None:
+            self.dernier_prix = self.pic = prix
+            return
+        r = prix / self.dernier_prix - 1.0 if self.dernier_prix != 0 else 0.0
+        self.n += 1
+        ecart = r - self.moyenne
+        self.moyenne += ecart / self.n
+        self._m2 += ecart * (r - self.moyenne)
+        self.dernier_prix = prix
+        self.pic = max(self.pic, prix)
+        if self.pic != 0:
+            self.maximum_drawdown = max(self.maximum_drawdown, 1.0 - prix / self.pic)
+
+    def volatilite(self, annualiser: bool = False, periodes: int = JOURS_BOURSE):
+        if self.n < 2:
+            return 0.0
+        vol = float(np.sqrt(self._m2 / (self.n - 1)))
+        return vol * float(np.sqrt(periodes)) if annualiser else vol
+
+    def sharpe(self, taux_sans_risque: float = 0.0, periodes: int = JOURS_BOURSE):
+        vol = self.volatilite()
+        if vol == 0:
+            return 0.0
+        return (self.moyenne * periodes - taux_sans_risque) / (vol * float(np.sqrt(periodes)))
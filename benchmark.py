@@ -0,0 +1,227 @@
+"""
+Mesures de performance des chemins critiques (chargement, analytique, persistance), hors-ligne,
+sur des prix synthétiques reproductibles :
+
+    python benchmark.py --tickers 10,100 --annees 1,5 --transactions 1000,10000 [--repetitions 3]
+
+Chaque scénario est exécuté dans un répertoire temporaire (base SQLite neuve) ; le temps retenu est
+le meilleur des répétitions, la mémoire est le pic mesuré par tracemalloc sur une exécution séparée.
+"""
+import argparse
+import gc
+import itertools
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+import numpy as np
+import pandas as pd
+import analytique
+from classe_actifs import Actifs
+from classe_index import Index
+from classe_portefeuille import Portefeuille
+from database_portefeuille import DatabasePortefeuille
+from chargement_concurrent import charger_concurrent
+from fournisseur_donnees import CachePrix, FournisseurSynthetique, get_fournisseur, set_fournisseur
+from serie_datee import SerieDatee, vider_series_clotures
+from stockage_colonnes import StockageColonnes
+
+
+def _tickers(n):
+    return [f"SYN{i:04d}" for i in range(n)]
+
+
+def _transactions(tickers, annees, n, graine=0):
+    generateur = np.random.default_rng(graine)
+    fin = pd.Timestamp(date.today())
+    jours = pd.bdate_range(fin - pd.DateOffset(years=annees), fin - pd.Timedelta(days=1))
+    return pd.DataFrame({
+        "ticker": generateur.choice(tickers, n),
+        "quantite": generateur.integers(1, 100, n),
+        "date_achat": generateur.choice(jours, n),
+    })
+
+
+def _nouveau_fournisseur(annees):
+    # Cache en mémoire neuf : chaque mesure part à froid
+    vider_series_clotures()
+    set_fournisseur(CachePrix(FournisseurSynthetique(annees=annees), repertoire=None))
+
+
+def _portefeuille(nom, transactions):
+    portefeuille = Portefeuille(nom)
+    portefeuille.importer_transactions(transactions)
+    return portefeuille
+
+
+def scenarios(n_tickers, annees, n_transactions):
+    """Liste de (nom, preparer, executer) : seul executer(*preparer()) est mesuré."""
+    tickers = _tickers(n_tickers)
+    transactions = _transactions(tickers, annees, n_transactions)
+    periode = f"{annees}y"
+    compteur = itertools.count()
+
+    def nom_unique():
+        return f"bench{next(compteur)}"
+
+    def a_froid(*args):
+        _nouveau_fournisseur(annees)
+        return args
+
+    def clotures():
+        _nouveau_fournisseur(annees)
+        prix = get_fournisseur().get_clotures_periode(tickers, periode).to_numpy()
+        return (analytique.rendements(prix),)
+
+    def metriques():
+        prix = clotures()[0]
+        return (np.cumprod(1 + np.nan_to_num(prix), axis=0),)
+
+    def actifs_charges():
+        _nouveau_fournisseur(annees)
+        actifs = [Actifs(t) for t in tickers]
+        for actif in actifs:
+            actif.charger()
+        return (actifs,)
+
+    def serie():
+        prix = metriques()[0][:, 0]
+        dates = pd.bdate_range(end=date.today(), periods=len(prix))
+        return (SerieDatee(dates, prix), dates)
+
+    def portefeuille_importe():
+        _nouveau_fournisseur(annees)
+        return (_portefeuille(nom_unique(), transactions),)
+
+    def base_remplie():
+        db = DatabasePortefeuille(filename=f"{nom_unique()}.db", fichier_csv=None)
+        db.ajouter_actions(("p", t, q, 100.0, d) for t, q, d in transactions.itertuples(index=False, name=None))
+        return (db,)
+
+    def executer_requetes_fenetres(serie_datee, dates):
+        debuts = dates[np.random.default_rng(1).integers(0, len(dates) - 1, 1000)]
+        for debut in debuts:
+            serie_datee.volatilite_entre(debut)
+            serie_datee.drawdown_entre(debut)
+
+    def stockage_rempli():
+        # Stockage écrit une fois ; la mesure porte sur l'ouverture et la lecture de toutes les colonnes
+        repertoire = f"{nom_unique()}_colonnes"
+        StockageColonnes(FournisseurSynthetique(annees=annees), repertoire).get_clotures_periode(tickers, periode)
+        return (repertoire,)
+
+    def lire_stockage(repertoire):
+        stockage = StockageColonnes(FournisseurSynthetique(annees=annees), repertoire)
+        return [stockage.get_serie_clotures_periode(t, periode) for t in tickers]
+
+    def retirer(db):
+        for ticker in tickers[:min(len(tickers), 50)]:
+            db.retirer_action("p", ticker, 10)
+
+    return [
+        ("Actifs.charger (séquentiel)", a_froid, lambda: [Actifs(t).charger() for t in tickers]),
+        ("charger_concurrent", lambda: a_froid([Actifs(t) for t in tickers]),
+         lambda actifs: charger_concurrent(actifs, concurrence=8)),
+        ("Actifs.actualiser_metriques", actifs_charges,
+         lambda actifs: [actif.actualiser_metriques() for actif in actifs]),
+        ("Index.charger + rafraichir", a_froid,
+         lambda: Index(tickers[0]).rafraichir()),
+        ("StockageColonnes (ouverture + lecture)", stockage_rempli, lire_stockage),
+        ("StockageColonnes.get_clotures_periode", stockage_rempli,
+         lambda repertoire: StockageColonnes(FournisseurSynthetique(annees=annees), repertoire).get_clotures_periode(tickers, periode)),
+        ("analytique (volatilité, Sharpe, drawdown)", clotures,
+         lambda r: (analytique.volatilite(r, annualiser=True), analytique.sharpe(r), analytique.maximum_drawdown(np.cumprod(1 + r, axis=0)))),
+        ("MetriquesGlissantes.ajouter", metriques, _ajouter_metriques),
+        ("SerieDatee (1000 fenêtres)", serie, executer_requetes_fenetres),
+        ("DatabasePortefeuille.ajouter_action (unitaire)",
+         lambda: (DatabasePortefeuille(filename=f"{nom_unique()}.db", fichier_csv=None),),
+         lambda db: [db.ajouter_action("p", t, q, 100.0, d) for t, q, d in transactions.itertuples(index=False, name=None)]),
+        ("DatabasePortefeuille.ajouter_actions (groupé)",
+         lambda: (DatabasePortefeuille(filename=f"{nom_unique()}.db", fichier_csv=None),),
+         lambda db: db.ajouter_actions(("p", t, q, 100.0, d) for t, q, d in transactions.itertuples(index=False, name=None))),
+        ("DatabasePortefeuille.retirer_action (50 retraits)", base_remplie, retirer),
+        ("Portefeuille.importer_transactions", lambda: a_froid(nom_unique()),
+         lambda nom: _portefeuille(nom, transactions)),
+        ("Portefeuille.get_valeur_historique", portefeuille_importe,
+         lambda p: p.get_valeur_historique(periode)),
+        ("Portefeuille.get_rendements (TWR)", portefeuille_importe,
+         lambda p: p.get_rendements(periode)),
+        ("Portefeuille.ratio_sharpe", portefeuille_importe,
+         lambda p: p.ratio_sharpe()),
+    ]
+
+
+def _ajouter_metriques(prix):
+    metriques = analytique.MetriquesGlissantes(252)
+    moitie = len(prix) // 2
+    metriques.initialiser(prix[:moitie, 0], prix[:moitie, -1])
+    for i in range(moitie, len(prix)):
+        metriques.ajouter(prix[i, 0], prix[i, -1])
+    return metriques
+
+
+def mesurer(preparer, executer, repetitions):
+    temps = []
+    for _ in range(repetitions):
+        args = preparer()
+        gc.collect()
+        debut = time.perf_counter()
+        executer(*args)
+        temps.append(time.perf_counter() - debut)
+
+    args = preparer()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        executer(*args)
+        _, pic = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(temps), pic / 2 ** 20
+
+
+def executer_benchmarks(liste_tickers, liste_annees, liste_transactions, repetitions=3, filtre=None):
+    lignes = []
+    repertoire_initial = os.getcwd()
+    with tempfile.TemporaryDirectory() as repertoire:
+        os.chdir(repertoire)
+        try:
+            for n_tickers, annees, n_transactions in itertools.product(liste_tickers, liste_annees, liste_transactions):
+                for nom, preparer, executer in scenarios(n_tickers, annees, n_transactions):
+                    if filtre and filtre.lower() not in nom.lower():
+                        continue
+                    secondes, memoire = mesurer(preparer, executer, repetitions)
+                    lignes.append({"Scénario": nom, "Tickers": n_tickers, "Années": annees,
+                                   "Transactions": n_transactions, "Temps (s)": secondes, "Pic mémoire (Mo)": memoire})
+                    print(f"{nom:<50} {n_tickers:>5} tickers {annees:>3} ans {n_transactions:>7} transactions "
+                          f"{secondes:>9.4f} s {memoire:>9.1f} Mo", flush=True)
+        finally:
+            os.chdir(repertoire_initial)
+    return pd.DataFrame(lignes)
+
+
+def _entiers(texte):
+    return [int(v) for v in texte.split(",") if v.strip()]
+
+
+def main(argv=None):
+    parseur = argparse.ArgumentParser(description="Benchmarks hors-ligne du portefeuille")
+    parseur.add_argument("--tickers", type=_entiers, default=[10, 100])
+    parseur.add_argument("--annees", type=_entiers, default=[1, 5])
+    parseur.add_argument("--transactions", type=_entiers, default=[1_000, 10_000])
+    parseur.add_argument("--repetitions", type=int, default=3)
+    parseur.add_argument("--filtre", help="n'exécute que les scénarios dont le nom contient ce texte")
+    parseur.add_argument("--sortie", metavar="FICHIER.csv", help="enregistre les résultats (comparaison entre versions)")
+    args = parseur.parse_args(argv)
+
+    resultats = executer_benchmarks(args.tickers, args.annees, args.transactions, args.repetitions, args.filtre)
+    if args.sortie:
+        resultats.to_csv(args.sortie, index=False)
+        print(f"Résultats écrits dans {args.sortie}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Union
+import pandas as pd
+from classe_actifs import Actifs
+from classe_index import Index
+from instrumentation import chronometre
+
+
+class RapportChargement:
+    """Résultat d'un chargement concurrent : objets chargés et échecs, ticker par ticker."""
+
+    def __init__(self):
+        self.reussis = {}
+        self.echecs = {}
+        self.tentatives = {}
+        self.durees = {}
+        self.index = None
+
+    def est_complet(self):
+        return not self.echecs
+
+    def to_dataframe(self):
+        data = []
+        for ticker in list(self.reussis) + list(self.echecs):
+            data.append({
+                "Ticker": ticker,
+                "Statut": "OK" if ticker in self.reussis else "Échec",
+                "Tentatives": self.tentatives.get(ticker, 0),
+                "Durée (s)": round(self.durees.get(ticker, 0), 3),
+                "Erreur": self.echecs.get(ticker, ""),
+            })
+        return pd.DataFrame(data)
+
+
+async def _charger_avec_reprises(ticker: str, objet, fonction: Callable, rapport: RapportChargement,
+                                 semaphore: asyncio.Semaphore, executeur: ThreadPoolExecutor,
+                                 timeout: float, tentatives: int, backoff: float):
+    boucle = asyncio.get_running_loop()
+    debut = time.perf_counter()
+    erreur = None
+    for essai in range(1, tentatives + 1):
+        rapport.tentatives[ticker] = essai
+        try:
+            async with semaphore:
+                # Le contexte est copié pour que les mesures restent rattachées au rendu en cours
+                await asyncio.wait_for(boucle.run_in_executor(executeur, contextvars.copy_context().run, fonction), timeout)
+            rapport.reussis[ticker] = objet
+            rapport.durees[ticker] = time.perf_counter() - debut
+            return
+        except asyncio.TimeoutError:
+            erreur = f"délai de {timeout:g}s dépassé"
+        except Exception as e:
+            erreur = f"{type(e).__name__}: {e}"
+        if essai < tentatives:
+            # Attente exponentielle hors du sémaphore pour laisser passer les autres tickers
+            await asyncio.sleep(backoff * 2 ** (essai - 1))
+    rapport.echecs[ticker] = erreur
+    rapport.durees[ticker] = time.perf_counter() - debut
+
+
+async def charger_concurrent_async(actifs: List[Actifs], index: Union[Index, str, None] = None,
+                                   concurrence: int = 8, timeout: float = 15.0,
+                                   tentatives: int = 3, backoff: float = 0.5) -> RapportChargement:
+    rapport = RapportChargement()
+    taches = [(actif.ticker, actif, actif.charger) for actif in actifs]
+    if index is not None:
+        if isinstance(index, str):
+            index = Index(index, initialiser=False)
+        rapport.index = index
+        taches.append((index.ticker, index, index.charger))
+
+    semaphore = asyncio.Semaphore(concurrence)
+    # Réserve de threads au-delà de la concurrence : un appel bloqué après son délai
+    # ne doit pas empêcher les tentatives suivantes de démarrer
+    executeur = ThreadPoolExecutor(max_workers=2 * concurrence)
+    try:
+        await asyncio.gather(*(
+            _charger_avec_reprises(ticker, objet, fonction, rapport, semaphore, executeur,
+                                   timeout, tentatives, backoff)
+            for ticker, objet, fonction in taches
+        ))
+    finally:
+        executeur.shutdown(wait=False, cancel_futures=True)
+    return rapport
+
+
+@chronometre()
+def charger_concurrent(actifs: List[Actifs], index: Union[Index, str, None] = None,
+                       concurrence: int = 8, timeout: float = 15.0,
+                       tentatives: int = 3, backoff: float = 0.5) -> RapportChargement:
+    """Charge en parallèle les actifs (et l'index de référence éventuel).
+
+    Chaque ticker dispose de `tentatives` essais limités à `timeout` secondes, séparés
+    d'une attente exponentielle ; les échecs sont listés dans le rapport au lieu d'être ignorés.
+    """
+    return asyncio.run(charger_concurrent_async(actifs, index, concurrence, timeout, tentatives, backoff))
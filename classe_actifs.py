@@ -1,28 +1,90 @@
-import yfinance as yf
-import math
-from typing import List
-import matplotlib.pyplot as plt
-import streamlit as st
+import numpy as np
+import pandas as pd
 from datetime import datetime, timedelta
+from fournisseur_donnees import FournisseurDonnees, get_fournisseur
+from classe_index import Index
+from serie_datee import prix_a_date, series_clotures
+import analytique
+import graphiques
+from instrumentation import chronometre, logger
+
+def _champ_info(cle: str, defaut):
+    # Champ fondamental lu à la demande dans les infos du ticker
+    return property(lambda self: self.infos.get(cle, defaut))
+
 
 class Actifs: 
-    def __init__(self, ticker: str, quantite: int=0, taux_sans_risque: float = 0.02):
+    """Les fondamentaux, les prix et les rendements ne sont chargés qu'à la première lecture,
+    puis conservés jusqu'au prochain refresh() : construire un Actifs ne coûte aucun appel réseau."""
+
+    nom_entreprise = _champ_info("longName", "Inconnu")
+    secteur = _champ_info("sector", "Inconnu")
+    industrie = _champ_info("industry", "Inconnu")
+    volume = _champ_info("volume", 0)
+    market_cap = _champ_info("marketCap", 0)
+    high = _champ_info("fiftyTwoWeekHigh", 0)
+    low = _champ_info("fiftyTwoWeekLow", 0)
+
+    def __init__(self, ticker: str, quantite: int=0, taux_sans_risque: float = 0.02,
+                 fournisseur: FournisseurDonnees = None, reference: Index = None,
+                 fenetre_risque: int = 252, periode_risque: str = "1y"):
         self.ticker = ticker.upper()
         self.quantite = quantite
         self.taux_sans_risque = taux_sans_risque
-        self.nom_entreprise = ""
-        self.prix_aujourdhui = 0
-        self.prix_hier = 0
-        self.historique_prix = []
-        self.secteur = ""
-        self.industrie = ""
-        self.high = 0
-        self.low = 0
-        self.volume = 0
-        self.market_cap = 0
-        self.historique_rendements: List[float] = []
-
-        self.initialiser_donnees()
+        self.fournisseur = fournisseur
+        # Indicateurs de risque : fenêtre glissante (en séances) sur l'historique de `periode_risque`
+        self.reference = reference
+        self.fenetre_risque = fenetre_risque
+        self.periode_risque = periode_risque
+        self._infos = None
+        self._historique_prix = None
+        self._historique_rendements = None
+        self._metriques = None
+        self._derniere_date_risque = None
+
+    def __setstate__(self, etat):
+        # Les anciennes sauvegardes contenaient les données chargées : on ne garde que l'identité
+        self.__init__(etat["ticker"], etat.get("quantite", 0), etat.get("taux_sans_risque", 0.02),
+                      etat.get("fournisseur"), etat.get("reference"),
+                      etat.get("fenetre_risque", 252), etat.get("periode_risque", "1y"))
+
+    @property
+    def infos(self) -> dict:
+        if self._infos is None:
+            try:
+                self._infos = self.get_fournisseur().get_infos(self.ticker)
+            except Exception as e:
+                logger.error("Erreur lors du chargement des infos de %s : %s", self.ticker, e)
+                self._infos = {}
+        return self._infos
+
+    def _lire_historique_prix(self) -> np.ndarray:
+        # Vue sans copie quand le fournisseur est le stockage en colonnes
+        return self.get_fournisseur().get_serie_clotures_periode(self.ticker, "5d")[1]
+
+    @property
+    def historique_prix(self) -> np.ndarray:
+        if self._historique_prix is None:
+            try:
+                self._historique_prix = self._lire_historique_prix()
+            except Exception as e:
+                logger.error("Erreur lors du chargement des prix de %s : %s", self.ticker, e)
+                self._historique_prix = np.zeros(0)
+        return self._historique_prix
+
+    @property
+    def historique_rendements(self) -> np.ndarray:
+        if self._historique_rendements is None:
+            self.calculer_rendements()
+        return self._historique_rendements
+
+    @property
+    def prix_aujourdhui(self):
+        return float(self.historique_prix[-1]) if len(self.historique_prix) else 0
+
+    @property
+    def prix_hier(self):
+        return float(self.historique_prix[-2]) if len(self.historique_prix) >= 2 else 0
 
     def afficher_infos(self):
         return {
@@ -46,31 +108,106 @@ class Actifs:
     def __eq__(self, other):
         return self.ticker == other.ticker
 
-    def initialiser_donnees(self):
-        try:
-            info = yf.Ticker(self.ticker)
-            data = info.history(period="5d")  
+    def get_fournisseur(self) -> FournisseurDonnees:
+        # Le fournisseur partagé n'est pas stocké sur l'objet pour rester picklable
+        return self.fournisseur or get_fournisseur()
 
-            self.nom_entreprise = info.info.get("longName", "Inconnu")
-            self.secteur = info.info.get("sector", "Inconnu")
-            self.volume = info.info.get("volume", 0)
-            self.market_cap = info.info.get("marketCap", 0)
-            self.industrie = info.info.get("industry", "Inconnu")
-            self.high = info.info.get("fiftyTwoWeekHigh", 0)
-            self.low = info.info.get("fiftyTwoWeekLow", 0)
+    @property
+    def est_charge(self):
+        return self._infos is not None and self._historique_prix is not None
 
-            self.historique_prix = data["Close"].tolist()
+    def refresh(self):
+        """Oublie les données chargées ; elles seront relues à la prochaine lecture."""
+        self._infos = None
+        self._historique_prix = None
+        self._historique_rendements = None
+        self._metriques = None
+        self._derniere_date_risque = None
 
-            if len(self.historique_prix) >= 2:
-                self.prix_hier = self.historique_prix[-2]
-                self.prix_aujourdhui = self.historique_prix[-1]
-            elif len(self.historique_prix) == 1:
-                self.prix_aujourdhui = self.historique_prix[-1]
+    def definir_reference(self, reference: Index):
+        self.reference = reference
+        self._metriques = None
+        self._derniere_date_risque = None
 
-            self.calculer_rendements()
-        
+    def _tickers_risque(self):
+        if self.reference is None:
+            return [self.ticker]
+        return [self.ticker, self.reference.ticker.upper()]
+
+    @property
+    def metriques(self) -> analytique.MetriquesGlissantes:
+        """Indicateurs de risque construits une fois sur l'historique complet, puis mis à jour
+        séance par séance par actualiser_metriques()."""
+        if self._metriques is None:
+            metriques = analytique.MetriquesGlissantes(self.fenetre_risque)
+            try:
+                tickers = self._tickers_risque()
+                clotures = self.get_fournisseur().get_clotures_periode(tickers, self.periode_risque)
+                clotures = clotures.dropna(subset=[self.ticker])
+                prix_ref = clotures[tickers[1]].ffill().bfill().to_numpy() if len(tickers) > 1 else None
+                metriques.initialiser(clotures[self.ticker].to_numpy(), prix_ref)
+                if len(clotures):
+                    self._derniere_date_risque = clotures.index[-1]
+            except Exception as e:
+                logger.error("Erreur lors du calcul des indicateurs de risque de %s : %s", self.ticker, e)
+            self._metriques = metriques
+        return self._metriques
+
+    @chronometre()
+    def actualiser_metriques(self):
+        """
+        Relit la dernière séance connue et ajoute les suivantes (O(1) par séance). La dernière
+        séance est remplacée si sa clôture a été révisée depuis (prix en séance).
+        Retourne le nombre de séances ajoutées ou révisées.
+        """
+        if self._metriques is not None and not hasattr(self._metriques, "_precedent"):
+            # Métriques d'une ancienne sauvegarde, sans l'état précédent : reconstruites
+            self._metriques = None
+        metriques = self.metriques
+        if self._derniere_date_risque is None:
+            return 0
+        tickers = self._tickers_risque()
+        clotures = self.get_fournisseur().get_clotures(tickers, self._derniere_date_risque, datetime.today() + timedelta(days=1))
+        clotures = clotures.dropna(subset=[self.ticker])
+        revisees = 0
+        if len(clotures) and clotures.index[0] == self._derniere_date_risque:
+            ligne = clotures.to_numpy()[0]
+            prix_ref = ligne[1] if len(tickers) > 1 and not np.isnan(ligne[1]) else None
+            if ligne[0] != metriques.dernier_prix or (prix_ref is not None and prix_ref != metriques.dernier_prix_ref):
+                metriques.remplacer_dernier(ligne[0], prix_ref)
+                revisees = 1
+        clotures = clotures[clotures.index > self._derniere_date_risque]
+        for date, ligne in zip(clotures.index, clotures.to_numpy()):
+            prix_ref = ligne[1] if len(tickers) > 1 and not np.isnan(ligne[1]) else None
+            metriques.ajouter(ligne[0], prix_ref)
+            self._derniere_date_risque = date
+        return revisees + len(clotures)
+
+    def volatilite_glissante(self, annualiser: bool = False):
+        return self.metriques.volatilite(annualiser)
+
+    def beta(self):
+        return self.metriques.beta()
+
+    def value_at_risk(self, niveau: float = 0.95, horizon: int = 1):
+        return self.metriques.value_at_risk(niveau, horizon)
+
+    @chronometre()
+    def charger(self):
+        """Charge immédiatement fondamentaux et prix en laissant remonter les erreurs."""
+        infos = self.get_fournisseur().get_infos(self.ticker)
+        historique_prix = self._lire_historique_prix()
+        if len(historique_prix) == 0:
+            raise ValueError(f"Aucune donnée de prix pour {self.ticker}")
+        self._infos = infos
+        self._historique_prix = historique_prix
+        self._historique_rendements = None
+
+    def initialiser_donnees(self):
+        try:
+            self.charger()
         except Exception as e:
-            print(f"Erreur lors de l'initialisation des données : {e}")
+            logger.error("Erreur lors de l'initialisation des données de %s : %s", self.ticker, e)
 
     def get_infos(self):
         return {
@@ -85,8 +222,10 @@ class Actifs:
             "Valeur la + basse sur 52 semaines": self.low,
             "Variation jour": self.variation_jour(),
             "Variation jour (%)": f"{self.variation_jour_pct():.2f}%",
-            "Volatilité historique": f"{self.calculer_vol_historique():.4f}",
+            "Volatilité historique": f"{self.volatilite_glissante():.4f}",
             "Maximum Drawdown (%)": f"{self.maximum_drawdown()*100:.2f}%",
+            "Bêta": f"{self.beta():.2f}" if self.beta() is not None else "N/A",
+            "VaR 95% (1 jour)": f"{self.value_at_risk()*100:.2f}%",
         }
 
     def variation_jour(self):
@@ -98,66 +237,66 @@ class Actifs:
         return 0
 
     def calculer_rendements(self):
-        self.historique_rendements = []
-        for i in range(1, len(self.historique_prix)):
-            prix_ancien = self.historique_prix[i - 1]
-            prix_nouveau = self.historique_prix[i]
-            if prix_ancien != 0:
-                rendement = (prix_nouveau - prix_ancien) / prix_ancien
-                self.historique_rendements.append(rendement)
-            else:
-                self.historique_rendements.append(0)
+        self._historique_rendements = analytique.rendements(self.historique_prix)
 
     def calculer_vol_historique(self):
-        if len(self.historique_rendements) < 2:
-            return 0
-        moyenne = sum(self.historique_rendements) / len(self.historique_rendements)
-        variance = sum((r - moyenne) ** 2 for r in self.historique_rendements) / (len(self.historique_rendements) - 1)
-        return math.sqrt(variance)
+        return analytique.volatilite(self.historique_rendements)
 
     def maximum_drawdown(self):
-        if self.high != 0:
-            return (self.high - self.low) / self.high
-        else: 
-            return 0
+        return self.metriques.maximum_drawdown
 
-    def afficher_graphique(self, start_date='2024-01-01', end_date=None):
+    def afficher_graphique(self, start_date='2024-01-01', end_date=None, n_points=graphiques.LARGEUR_PIXELS):
+        import streamlit as st  # uniquement pour l'affichage, pas au chargement du module
         if end_date is None:
             end_date = (datetime.today() - timedelta(days=1)).strftime('%Y-%m-%d')
 
-        data = yf.download(self.ticker, start=start_date, end=end_date)
-        if data.empty:
+        # Historique déjà en cache (stockage en colonnes), réduit à la largeur du graphique
+        dates, prix = self.get_fournisseur().get_serie_clotures(self.ticker, start_date, end_date)
+        if len(prix) == 0:
             st.warning("Pas de données disponibles pour afficher le graphique.")
             return
 
-        st.line_chart(data['Close'])
+        st.line_chart(graphiques.serie_reduite(self.ticker, dates, prix, n_points))
         st.write("Derniers jours de clôture:")
-        st.dataframe(data[['Close']].tail(5))
+        st.dataframe(pd.DataFrame({"Close": prix[-5:]}, index=pd.DatetimeIndex(dates[-5:], name="Date")))
         st.write("Statistiques descriptives:")
-        st.write(data['Close'].describe().round(2))
+        st.write(pd.Series(prix, name="Close").describe().round(2))
 
-    # obtenir le prix à une date donnée
+    # obtenir le prix à une date donnée (clôture de la dernière séance à cette date ou avant)
     def get_prix_a_date(self, date: datetime):
         try:
-            start = date.strftime("%Y-%m-%d")
-            end = (date + timedelta(days=1)).strftime("%Y-%m-%d")
-            data = yf.download(self.ticker, start=start, end=end, progress=False)
-            if data.empty:
-                print(f"Aucune donnée pour {self.ticker} à la date {date.strftime('%Y-%m-%d')}")
-                return None
-            return data['Close'][0]
+            prix = prix_a_date(self.ticker, date, self.get_fournisseur())
+            if prix is None:
+                logger.warning("Aucune donnée pour %s à la date %s", self.ticker, date.strftime('%Y-%m-%d'))
+            return prix
         except Exception as e:
-            print(f"Erreur récupération prix à date pour {self.ticker}: {e}")
+            logger.error("Erreur récupération prix à date pour %s : %s", self.ticker, e)
             return None
 
+    def performance_entre(self, debut, fin=None):
+        """Rendement, volatilité annualisée et drawdown maximal entre deux dates (O(log n)),
+        sur la série de clôtures partagée du ticker."""
+        serie = series_clotures([self.ticker], debut, self.get_fournisseur())[self.ticker]
+        return {
+            "Rendement": serie.rendement_entre(debut, fin),
+            "Volatilité": serie.volatilite_entre(debut, fin, annualiser=True),
+            "Maximum Drawdown": serie.drawdown_entre(debut, fin),
+        }
+
+    def get_performances_fenetres(self):
+        """DataFrame des performances 1M / 3M / YTD / 1Y / 3Y / 5Y."""
+        debut = datetime.today() - timedelta(days=5 * 366 + 7)
+        serie = series_clotures([self.ticker], debut, self.get_fournisseur())[self.ticker]
+        return pd.DataFrame(serie.performances_fenetres()).T
+
     # récupérer historique des prix (clôture)
     def get_historique_prix(self, period="1y"):
         try:
-            data = yf.download(self.ticker, period=period, progress=False)
-            if data.empty:
-                print(f"Aucune donnée historique pour {self.ticker} sur la période {period}")
+            dates, valeurs = self.get_fournisseur().get_serie_clotures_periode(self.ticker, period)
+            if len(valeurs) == 0:
+                logger.warning("Aucune donnée historique pour %s sur la période %s", self.ticker, period)
                 return None
-            return data['Close']
+            return pd.Series(np.array(valeurs), index=pd.DatetimeIndex(dates, name="Date"), name="Close")
         except Exception as e:
-            print(f"Erreur récupération historique prix pour {self.ticker}: {e}")
+            logger.error("Erreur récupération historique prix pour %s : %s", self.ticker, e)
             return None
@@ -1,88 +1,130 @@
-import yfinance as yf
-import math
-from typing import List
-from datetime import datetime
-import matplotlib.pyplot as plt
+import numpy as np
+from datetime import datetime, timedelta
 import pandas as pd
+from fournisseur_donnees import FournisseurDonnees, get_fournisseur
+import analytique
+import graphiques
+from serie_datee import SerieDatee
+from instrumentation import chronometre, logger
 
 class Index:
-    def __init__(self, ticker: str):
+    def __init__(self, ticker: str, fournisseur: FournisseurDonnees = None, initialiser: bool = True):
         self.ticker = ticker
+        self.fournisseur = fournisseur
         self.nom = ""
-        self.historique_prix: List[float] = []
-        self.historique_rendements: List[float] = []
-        self.historique_dates = []
-        self.initialiser_donnees()
+        self.historique_prix = np.zeros(0)
+        self.historique_rendements = np.zeros(0)
+        self.historique_dates = np.zeros(0, dtype="datetime64[ns]")
+        self.statistiques = analytique.StatistiquesCumulees()
+        self._serie = None
+        if initialiser:
+            self.initialiser_donnees()
+
+    @chronometre()
+    def charger(self):
+        """Charge l'historique en laissant remonter les erreurs."""
+        fournisseur = self.fournisseur or get_fournisseur()
+        # Dernière année par défaut ; vues sans copie quand le fournisseur est le stockage en colonnes
+        dates, prix = fournisseur.get_serie_clotures_periode(self.ticker, "1y")
+        if len(prix) == 0:
+            raise ValueError(f"Aucune donnée de prix pour {self.ticker}")
+
+        self.nom = fournisseur.get_infos(self.ticker).get("longName", "Inconnu")
+        self.historique_prix = prix
+        self.historique_dates = dates
+        self.calculer_rendements()
+        self.statistiques.initialiser(self.historique_prix)
+
+    @chronometre()
+    def rafraichir(self):
+        """
+        Relit la dernière séance connue et ajoute les suivantes, en mettant à jour rendements,
+        volatilité, Sharpe et drawdown de façon incrémentale. La dernière séance est remplacée si
+        sa clôture a été révisée (prix en séance puis clôture définitive).
+        Retourne le nombre de séances ajoutées ou révisées.
+        """
+        if len(self.historique_dates) == 0:
+            self.charger()
+            return len(self.historique_prix)
+
+        fournisseur = self.fournisseur or get_fournisseur()
+        derniere_date = np.datetime64(pd.Timestamp(self.historique_dates[-1]), "ns")
+        dates, nouveaux_prix = fournisseur.get_serie_clotures(self.ticker, pd.Timestamp(derniere_date),
+                                                              datetime.today() + timedelta(days=1))
+        revisees = 0
+        if len(dates) and dates[0] == derniere_date:
+            if nouveaux_prix[0] != self.historique_prix[-1]:
+                self._reviser_derniere(float(nouveaux_prix[0]))
+                revisees = 1
+        nouvelles = dates > derniere_date
+        dates, nouveaux_prix = dates[nouvelles], nouveaux_prix[nouvelles]
+        if len(nouveaux_prix) == 0:
+            return revisees
+
+        self.historique_rendements = np.concatenate([
+            self.historique_rendements,
+            analytique.rendements(np.concatenate([[self.historique_prix[-1]], nouveaux_prix])),
+        ])
+        for prix in nouveaux_prix:
+            self.statistiques.ajouter(prix)
+        self.historique_prix = np.concatenate([self.historique_prix, nouveaux_prix])
+        self.historique_dates = np.concatenate([np.asarray(self.historique_dates, dtype="datetime64[ns]"), dates])
+        return revisees + len(nouveaux_prix)
+
+    def _reviser_derniere(self, prix):
+        # L'historique peut être une vue en lecture seule sur le stockage : on le recopie
+        self.historique_prix = np.concatenate([self.historique_prix[:-1], [prix]])
+        self.historique_rendements = np.array(self.historique_rendements, dtype=np.float64)
+        if len(self.historique_rendements):
+            self.historique_rendements[-1] = analytique.rendements(self.historique_prix[-2:])[0]
+        if getattr(self.statistiques, "_precedent", None) is None:
+            # Accumulateur d'une ancienne sauvegarde, sans l'état précédent : reconstruit
+            self.statistiques.initialiser(self.historique_prix)
+        else:
+            self.statistiques.remplacer_dernier(prix)
+        self._serie = None
 
     def initialiser_donnees(self):
         try:
-            info = yf.Ticker(self.ticker)
-            data = info.history(period="1y")  # Dernière année par défaut
-
-            self.nom = info.info.get("longName", "Inconnu")
-            self.historique_prix = data["Close"].tolist()
-            self.historique_dates = data.index.to_list()
-            self.calculer_rendements()
+            self.charger()
         except Exception as e:
-            # On évite print, on peut stocker une erreur ou la gérer différemment
+            logger.error("Erreur lors de l'initialisation des données de l'index %s : %s", self.ticker, e)
             self.nom = "Erreur chargement données"
-            self.historique_prix = []
-            self.historique_dates = []
-            self.historique_rendements = []
+            self.historique_prix = np.zeros(0)
+            self.historique_dates = np.zeros(0, dtype="datetime64[ns]")
+            self.historique_rendements = np.zeros(0)
+            self.statistiques = analytique.StatistiquesCumulees()
 
     def calculer_rendements(self):
-        self.historique_rendements = []
-        for i in range(1, len(self.historique_prix)):
-            prix_ancien = self.historique_prix[i - 1]
-            prix_nouveau = self.historique_prix[i]
-            if prix_ancien != 0:
-                rendement = (prix_nouveau - prix_ancien) / prix_ancien
-                self.historique_rendements.append(rendement)
-            else:
-                self.historique_rendements.append(0)
+        self.historique_rendements = analytique.rendements(self.historique_prix)
 
     def variation_jour(self):
         if len(self.historique_prix) < 2:
             return 0
-        return self.historique_prix[-1] - self.historique_prix[-2]
+        return float(self.historique_prix[-1] - self.historique_prix[-2])
 
     def variation_jour_pct(self):
         if len(self.historique_prix) < 2 or self.historique_prix[-2] == 0:
             return 0
-        return (self.historique_prix[-1] - self.historique_prix[-2]) / self.historique_prix[-2] * 100
+        return float((self.historique_prix[-1] - self.historique_prix[-2]) / self.historique_prix[-2] * 100)
 
     def calculer_vol_historique(self):
         return self.volatilite()
 
     def volatilite(self):
-        if len(self.historique_rendements) < 2:
-            return 0
-        moyenne = sum(self.historique_rendements) / len(self.historique_rendements)
-        variance = sum((r - moyenne) ** 2 for r in self.historique_rendements) / (len(self.historique_rendements) - 1)
-        return math.sqrt(variance)
+        return self.statistiques.volatilite()
 
     def calculer_sharpe(self, taux_sans_risque=0.01):
-        if not self.historique_rendements:
-            return 0
-        rendement_moyen = sum(self.historique_rendements) / len(self.historique_rendements)
-        volatilite = self.volatilite()
-        if volatilite == 0:
-            return 0
-        rendement_annuel = rendement_moyen * 252
-        return (rendement_annuel - taux_sans_risque) / (volatilite * math.sqrt(252))
+        return self.statistiques.sharpe(taux_sans_risque)
 
     def maximum_drawdown(self):
-        if not self.historique_prix:
-            return 0
-        pic = self.historique_prix[0]
-        max_dd = 0
-        for prix in self.historique_prix:
-            if prix > pic:
-                pic = prix
-            drawdown = (prix - pic) / pic
-            if drawdown < max_dd:
-                max_dd = drawdown
-        return abs(max_dd)
+        return self.statistiques.maximum_drawdown
+
+    def serie(self) -> SerieDatee:
+        # Série indexée par date, reconstruite seulement quand l'historique a changé
+        if self._serie is None or len(self._serie) != len(self.historique_prix):
+            self._serie = SerieDatee(self.historique_dates, self.historique_prix)
+        return self._serie
 
     def get_rendement_depuis(self, date_debut):
         if isinstance(date_debut, str):
@@ -91,33 +133,33 @@ class Index:
             except ValueError:
                 return None
 
-        if not self.historique_dates or not self.historique_prix:
-            return None
-
-        index_debut = None
-        for i, d in enumerate(self.historique_dates):
-            if d is None:
-                continue
-            if d >= date_debut:
-                index_debut = i
-                break
-
-        if index_debut is None:
+        if len(self.historique_dates) == 0 or len(self.historique_prix) == 0:
             return None
 
-        prix_debut = self.historique_prix[index_debut]
-        prix_fin = self.historique_prix[-1]
+        return self.serie().rendement_entre(date_debut)
 
-        if prix_debut == 0:
-            return None
+    def performance_entre(self, debut=None, fin=None):
+        """Rendement, volatilité annualisée et drawdown maximal entre deux dates (O(log n))."""
+        serie = self.serie()
+        return {
+            "Rendement": serie.rendement_entre(debut, fin),
+            "Volatilité": serie.volatilite_entre(debut, fin, annualiser=True),
+            "Maximum Drawdown": serie.drawdown_entre(debut, fin),
+        }
 
-        rendement = (prix_fin / prix_debut) - 1
-        return rendement
+    def get_performances_fenetres(self):
+        """DataFrame des performances 1M / 3M / YTD / 1Y / 3Y / 5Y. L'historique chargé ne couvre
+        qu'un an : les clôtures des cinq dernières années sont lues pour ce tableau seulement."""
+        fournisseur = self.fournisseur or get_fournisseur()
+        debut = datetime.today() - timedelta(days=5 * 366 + 7)
+        dates, prix = fournisseur.get_serie_clotures(self.ticker, debut, datetime.today() + timedelta(days=1))
+        serie = SerieDatee(dates, prix) if len(prix) else self.serie()
+        return pd.DataFrame(serie.performances_fenetres()).T
 
     def performance_cumulee(self):
-        if not self.historique_prix:
+        if len(self.historique_prix) == 0:
             return 0
-        return (self.historique_prix[-1] / self.historique_prix[0]) - 1
+        return float(self.historique_prix[-1] / self.historique_prix[0]) - 1
 
     def afficher_infos(self):
         # Retourner un dict à afficher dans Streamlit
@@ -132,18 +174,18 @@ class Index:
             "Maximum Drawdown (%)": round(self.maximum_drawdown() * 100, 2),
         }
 
-    def afficher_graphique(self):
-        if not self.historique_dates or not self.historique_prix:
+    def afficher_graphique(self, n_points: int = graphiques.LARGEUR_PIXELS):
+        """Figure matplotlib explicite des clôtures, réduites à `n_points` points."""
+        if len(self.historique_dates) == 0 or len(self.historique_prix) == 0:
+            return None
+        serie = graphiques.serie_reduite(self.ticker, self.historique_dates, self.historique_prix, n_points)
+        return graphiques.figure_prix(serie, f"Historique des prix pour {self.ticker.upper()}")
+
+    def image_graphique(self, n_points: int = graphiques.LARGEUR_PIXELS):
+        """Même graphique en PNG, mis en cache tant que l'historique ne change pas."""
+        if len(self.historique_dates) == 0 or len(self.historique_prix) == 0:
             return None
-        plt.figure(figsize=(10, 5))
-        plt.plot(self.historique_dates, self.historique_prix, label="Prix de clôture")
-        plt.title(f"Historique des prix pour {self.ticker.upper()}")
-        plt.xlabel("Date")
-        plt.ylabel("Prix")
-        plt.grid(True)
-        plt.legend()
-        plt.tight_layout()
-        return plt
+        return graphiques.image_prix(self.ticker, self.historique_dates, self.historique_prix, n_points=n_points)
 
     def get_performance(self):
         """Retourne un DataFrame avec les indicateurs clés de performance,
@@ -1,131 +1,319 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from database_portefeuille import DatabasePortefeuille
 from classe_actifs import Actifs
+from classe_positions import TablePositions
 from classe_index import Index  # Ton indice de référence
+from fournisseur_donnees import get_fournisseur, convertir_periode
+from serie_datee import prix_a_date, series_clotures
+from chargement_concurrent import RapportChargement, charger_concurrent
+import analytique
+from instrumentation import chronometre, logger
+import comparaison
+import simulation_risque
+from optimiseur import OptimiseurMoyenneVariance
+from service_covariance import ServiceCovariance
+from moteur_rendements import MoteurRendements
 
 DATA_FILE = "portefeuille.csv"
 
+# Noms de colonnes acceptés dans les exports courtier
+COLONNES_TRANSACTIONS = {
+    "ticker": "ticker", "symbole": "ticker", "symbol": "ticker",
+    "quantite": "quantite", "quantité": "quantite", "quantity": "quantite",
+    "date_achat": "date_achat", "date achat": "date_achat", "date": "date_achat",
+    "prix_achat": "prix_achat", "prix achat": "prix_achat", "price": "prix_achat",
+}
+
+
+def _normaliser_transactions(bloc: pd.DataFrame) -> pd.DataFrame:
+    bloc = bloc.rename(columns=lambda c: COLONNES_TRANSACTIONS.get(str(c).strip().lower(), c))
+    manquantes = {"ticker", "quantite", "date_achat"} - set(bloc.columns)
+    if manquantes:
+        raise ValueError(f"Colonnes manquantes dans les transactions : {sorted(manquantes)}")
+    if "prix_achat" not in bloc.columns:
+        bloc["prix_achat"] = np.nan
+    return pd.DataFrame({
+        "ticker": bloc["ticker"].astype(str).str.strip().str.upper(),
+        "quantite": pd.to_numeric(bloc["quantite"], errors="coerce"),
+        "date_achat": pd.to_datetime(bloc["date_achat"], errors="coerce"),
+        "prix_achat": pd.to_numeric(bloc["prix_achat"], errors="coerce"),
+    })
+
+
+def _lire_transactions(source, taille_bloc):
+    if isinstance(source, pd.DataFrame):
+        yield _normaliser_transactions(source)
+    elif isinstance(source, str) and source.lower().endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            yield _normaliser_transactions(pd.read_parquet(source))
+        else:
+            for lot in pq.ParquetFile(source).iter_batches(batch_size=taille_bloc):
+                yield _normaliser_transactions(lot.to_pandas())
+    elif isinstance(source, str):
+        for bloc in pd.read_csv(source, chunksize=taille_bloc):
+            yield _normaliser_transactions(bloc)
+    else:
+        lignes = []
+        for ligne in source:
+            lignes.append(ligne)
+            if len(lignes) >= taille_bloc:
+                yield _normaliser_transactions(_en_dataframe(lignes))
+                lignes = []
+        if lignes:
+            yield _normaliser_transactions(_en_dataframe(lignes))
+
+
+def _en_dataframe(lignes):
+    if isinstance(lignes[0], dict):
+        return pd.DataFrame(lignes)
+    colonnes = ["ticker", "quantite", "date_achat", "prix_achat"]
+    return pd.DataFrame([tuple(ligne) + (None,) * (len(colonnes) - len(ligne)) for ligne in lignes], columns=colonnes)
+
+
+def _prix_achats_en_masse(transactions: pd.DataFrame) -> np.ndarray:
+    """Clôture de la dernière séance à la date d'achat ou avant, pour chaque transaction ;
+    une seule requête groupée charge l'historique de tous les tickers concernés."""
+    series = series_clotures(list(transactions["ticker"].unique()), transactions["date_achat"].min())
+    prix = np.full(len(transactions), np.nan)
+    dates = transactions["date_achat"].to_numpy()
+    for ticker, positions in transactions.groupby("ticker").indices.items():
+        prix[positions] = series[ticker].valeurs_au(dates[positions])
+    return prix
+
 class Portefeuille:
     def __init__(self, nom):
         self.nom = nom
-        self.actifs = []
-        self.quantites = []
-        self.dates_achat = []
-        self.prix_achats = {}
+        self.positions = TablePositions()
         self.date_achat_portefeuille = None
         self.reference = None  # Un objet Index pour la référence
+        self.journal = None  # JournalPortefeuille où sont ajoutées les opérations, s'il y en a un
         self.db = DatabasePortefeuille()
         self.db.ajouter_portefeuille(nom)
 
-    def get_prix_achat(self, ticker: str, date_achat: datetime):
-        # TODO: remplacer par vrai prix d'achat selon date
-        return 100.0
+    def __setstate__(self, etat):
+        # Anciennes sauvegardes : positions en listes parallèles
+        if "positions" not in etat:
+            positions = TablePositions()
+            for actif, quantite, date_achat in zip(etat.pop("actifs", []), etat.pop("quantites", []), etat.pop("dates_achat", [])):
+                positions.ajouter(actif, quantite, etat.get("prix_achats", {}).get(actif.ticker, 0), date_achat)
+            etat.pop("prix_achats", None)
+            etat["positions"] = positions
+        etat.setdefault("journal", None)
+        self.__dict__.update(etat)
+
+    @property
+    def actifs(self):
+        return self.positions.actifs
+
+    @property
+    def quantites(self) -> np.ndarray:
+        return self.positions.quantites
+
+    @property
+    def dates_achat(self):
+        return self.positions.dates_achat
+
+    @property
+    def prix_achats(self):
+        return dict(zip(self.positions.tickers, self.positions.prix_achats.tolist()))
+
+    def get_prix_achat(self, ticker: str, date_achat: datetime, fournisseur=None):
+        # Clôture du jour d'achat, ou de la séance précédente (week-end, jour férié)
+        try:
+            return prix_a_date(ticker, date_achat, fournisseur)
+        except Exception as e:
+            logger.error("Erreur récupération prix d'achat pour %s : %s", ticker, e)
+            return None
 
     def ajouter_action(self, action: Actifs, quantite: int, date_achat: datetime):
-        prix_achat = self.get_prix_achat(action.ticker, date_achat)
+        prix_achat = self.get_prix_achat(action.ticker, date_achat, action.get_fournisseur())
         if prix_achat is None:
-            print(f"Impossible de récupérer le prix d'achat pour {action.ticker} à la date {date_achat.strftime('%Y-%m-%d')}.")
+            logger.warning("Impossible de récupérer le prix d'achat pour %s à la date %s", action.ticker, date_achat.strftime("%Y-%m-%d"))
             return
 
         self.db.ajouter_action(self.nom, action.ticker, quantite, prix_achat, date_achat)
+        self._enregistrer_position(action, quantite, prix_achat, date_achat)
+        if self.journal is not None:
+            self.journal.journaliser_ajout(self, action.ticker, quantite, prix_achat, date_achat)
 
-        if action in self.actifs:
-            idx = self.actifs.index(action)
-            ancienne_qte = self.quantites[idx]
-            ancien_prix = self.prix_achats.get(action.ticker, 0)
-            # Calcul du prix moyen pondéré d'achat
-            nouveau_prix = (ancien_prix * ancienne_qte + prix_achat * quantite) / (ancienne_qte + quantite)
-            self.quantites[idx] += quantite
-            self.prix_achats[action.ticker] = nouveau_prix
-            # Mise à jour de la date d'achat si la nouvelle est antérieure
-            if date_achat < self.dates_achat[idx]:
-                self.dates_achat[idx] = date_achat
-        else:
-            self.actifs.append(action)
-            self.quantites.append(quantite)
-            self.dates_achat.append(date_achat)
-            self.prix_achats[action.ticker] = prix_achat
+        logger.info("Action %s ajoutée avec %s unités au prix d'achat %.2f (date %s)", action.ticker, quantite, prix_achat, date_achat.strftime("%Y-%m-%d"))
+
+    def _enregistrer_position(self, action: Actifs, quantite, prix_achat, date_achat: datetime):
+        self.positions.ajouter(action, quantite, prix_achat, date_achat)
 
         # Mise à jour de la date d'achat la plus ancienne du portefeuille
         if self.date_achat_portefeuille is None or date_achat < self.date_achat_portefeuille:
             self.date_achat_portefeuille = date_achat
 
-        print(f"Action {action.ticker} ajoutée avec {quantite} unités au prix d'achat {prix_achat:.2f} (date {date_achat.strftime('%Y-%m-%d')})")
+    def restaurer_position(self, ticker: str, quantite, prix_achat, date_achat: datetime):
+        """Rétablit une position déjà enregistrée (sans écriture en base ni appel réseau)."""
+        self._enregistrer_position(Actifs(ticker), quantite, prix_achat, date_achat)
 
-    def retirer_action(self, ticker: str, quantite: int):
-        index = next((i for i, a in enumerate(self.actifs) if a.ticker == ticker), None)
-        if index is None:
-            print(f"L'action {ticker} n'est pas dans le portefeuille.")
-            return
+    @chronometre()
+    def importer_transactions(self, source, taille_bloc=50_000):
+        """
+        Importe en masse des transactions : chemin d'un export courtier (.csv ou .parquet, lu par
+        blocs), DataFrame ou itérable de dicts / tuples (ticker, quantite, date_achat[, prix_achat]).
+        Une quantité négative est une vente, retirée des lots les plus anciens à sa date et à son
+        prix. Les prix manquants sont récupérés en une requête groupée pour tous les tickers,
+        puis tous les achats sont enregistrés dans une seule transaction, avant les ventes.
+        Retourne le nombre de transactions importées.
+        """
+        transactions = pd.concat(list(_lire_transactions(source, taille_bloc)), ignore_index=True)
+        if transactions.empty:
+            return 0
 
-        if quantite > self.quantites[index]:
-            print(f"Impossible de retirer {quantite} unités car seule {self.quantites[index]} est disponible.")
-            return
+        invalides = transactions["quantite"].isna() | (transactions["quantite"] == 0) | transactions["date_achat"].isna()
+        for ligne, ticker, quantite, date_achat in transactions.loc[invalides, ["ticker", "quantite", "date_achat"]].itertuples(name=None):
+            logger.warning("Transaction ignorée ligne %d (%s, quantité %s, date %s) : quantité nulle ou non numérique, ou date invalide",
+                           ligne + 1, ticker, quantite, date_achat)
+        transactions = transactions[~invalides]
 
-        self.quantites[index] -= quantite
-        self.db.retirer_action(self.nom, ticker, quantite)
+        manquants = transactions["prix_achat"].isna()
+        if manquants.any():
+            transactions.loc[manquants, "prix_achat"] = _prix_achats_en_masse(transactions[manquants])
+            sans_prix = transactions["prix_achat"].isna()
+            for ticker in transactions.loc[sans_prix, "ticker"].unique():
+                logger.warning("Impossible de récupérer le prix d'achat pour %s", ticker)
+            transactions = transactions[~sans_prix]
+        if transactions.empty:
+            return 0
 
-        if self.quantites[index] == 0:
-            # Suppression complète de l'action si quantité nulle
-            del self.actifs[index]
-            del self.quantites[index]
-            del self.dates_achat[index]
-            if ticker in self.prix_achats:
-                del self.prix_achats[ticker]
+        achats = transactions[transactions["quantite"] > 0]
+        if not achats.empty:
+            self._importer_achats(achats)
 
-        print(f"{quantite} unités retirées de {ticker}.")
+        # Ventes dans l'ordre chronologique, une fois tous les achats enregistrés
+        ventes = transactions[transactions["quantite"] < 0].sort_values("date_achat", kind="stable")
+        nombre_ventes = 0
+        for ticker, quantite, date_vente, prix_vente in ventes[["ticker", "quantite", "date_achat", "prix_achat"]].itertuples(index=False, name=None):
+            quantite = -quantite
+            quantite = int(quantite) if float(quantite).is_integer() else float(quantite)
+            nombre_ventes += self.retirer_action(ticker, quantite, date_vente=date_vente.to_pydatetime(), prix_vente=float(prix_vente))
+
+        nombre = len(achats) + nombre_ventes
+        logger.info("%d transactions importées sur %d tickers", nombre, transactions["ticker"].nunique())
+        return nombre
+
+    def _importer_achats(self, achats: pd.DataFrame):
+        self.db.ajouter_actions(
+            (self.nom, ticker, quantite, prix_achat, date_achat)
+            for ticker, quantite, date_achat, prix_achat in achats[["ticker", "quantite", "date_achat", "prix_achat"]].itertuples(index=False, name=None)
+        )
+
+        # Une seule mise à jour des positions par ticker (prix moyen pondéré, date la plus ancienne)
+        achats = achats.assign(cout=achats["quantite"] * achats["prix_achat"])
+        positions = achats.groupby("ticker").agg(quantite=("quantite", "sum"), cout=("cout", "sum"),
+                                                 date_achat=("date_achat", "min"))
+        for ticker, quantite, cout, date_achat in positions.itertuples(name=None):
+            quantite = int(quantite) if float(quantite).is_integer() else float(quantite)
+            self._enregistrer_position(Actifs(ticker), quantite, cout / quantite, date_achat.to_pydatetime())
+            if self.journal is not None:
+                self.journal.journaliser_ajout(self, ticker, quantite, cout / quantite, date_achat.to_pydatetime())
+
+    def retirer_action(self, ticker: str, quantite: int, date_vente: datetime = None, prix_vente: float = None) -> bool:
+        """Vend `quantite` unités (lots les plus anciens d'abord) ; retourne False si la vente est refusée."""
+        position = self.positions.get(ticker)
+        if position is None:
+            logger.warning("L'action %s n'est pas dans le portefeuille.", ticker)
+            return False
+
+        if quantite > position[1]:
+            logger.warning("Impossible de retirer %s unités de %s car seule %g est disponible.", quantite, ticker, position[1])
+            return False
+
+        # Suppression complète de l'action si quantité nulle
+        self.positions.retirer(ticker, quantite)
+        self.db.retirer_action(self.nom, ticker, quantite, date_vente=date_vente, prix_vente=prix_vente)
+        if self.journal is not None:
+            self.journal.journaliser_retrait(self, ticker, quantite)
+
+        logger.info("%s unités retirées de %s", quantite, ticker)
+        return True
 
     def save_portefeuille_to_file(self):
         if not self.actifs:
-            print("Portefeuille vide, rien à sauvegarder.")
+            logger.warning("Portefeuille vide, rien à sauvegarder.")
             return
 
         data = []
-        for i in range(len(self.actifs)):
-            action = self.actifs[i]
-            quantite = self.quantites[i]
-            date_achat = self.dates_achat[i]
+        for action, quantite, prix_achat, date_achat in zip(self.actifs, self.quantites.tolist(), self.positions.prix_achats.tolist(), self.dates_achat):
             data.append({
                 "Ticker": action.ticker,
                 "Quantité": quantite,
+                "Prix Achat": prix_achat,
                 "Date Achat": date_achat.strftime("%Y-%m-%d")
             })
 
         df = pd.DataFrame(data)
         df.to_csv(DATA_FILE, index=False)
-        print(f"Portefeuille sauvegardé dans {DATA_FILE}")
+        logger.info("Portefeuille sauvegardé dans %s", DATA_FILE)
 
-    def charger_portefeuille_depuis_fichier(self):
+    @chronometre()
+    def prechauffer(self, reference=None, **options) -> RapportChargement:
+        """
+        Charge en parallèle les données des actifs pas encore chargés et de l'index de référence.
+        Les options (concurrence, timeout, tentatives, backoff) sont transmises à charger_concurrent.
+        """
+        a_charger = [actif for actif in self.actifs if not actif.est_charge]
+        rapport = charger_concurrent(a_charger, reference or self.reference, **options)
+        if rapport.index is not None:
+            self.reference = rapport.index
+        return rapport
+
+    def charger_portefeuille_depuis_fichier(self, prechauffer=False):
+        """Rétablit les positions sauvegardées par save_portefeuille_to_file. Rien n'est écrit dans la
+        base : les lots et le registre des transactions, d'où MoteurRendements tire les rendements,
+        sont déjà à jour et ne doivent pas recevoir de nouveaux achats."""
+        rapport = None
         try:
             df = pd.read_csv(DATA_FILE)
-            self.actifs.clear()
-            self.quantites.clear()
-            self.dates_achat.clear()
-            self.prix_achats.clear()
+            self.positions.vider()
+            # Positions déjà enregistrées : ni appel réseau, ni écriture en base. Les anciens fichiers
+            # sans prix d'achat reprennent le prix moyen des lots de la base.
+            prix_en_base = self._prix_achats_en_base() if "Prix Achat" not in df.columns else {}
 
             for _, row in df.iterrows():
                 ticker = row['Ticker']
                 quantite = int(row['Quantité'])
                 date_achat = datetime.strptime(row['Date Achat'], "%Y-%m-%d")
-                action = Actifs(ticker)
-                self.ajouter_action(action, quantite, date_achat)
+                prix_achat = row['Prix Achat'] if "Prix Achat" in df.columns else prix_en_base.get(ticker)
+                if prix_achat is None or pd.isna(prix_achat):
+                    logger.warning("Prix d'achat inconnu pour %s, position restaurée au prix 0", ticker)
+                    prix_achat = 0.0
+                self.restaurer_position(ticker, quantite, float(prix_achat), date_achat)
 
-            print(f"Portefeuille chargé depuis {DATA_FILE}")
+            logger.info("Portefeuille chargé depuis %s", DATA_FILE)
+            if prechauffer:
+                rapport = self.prechauffer()
+                for ticker, erreur in rapport.echecs.items():
+                    logger.warning("Données indisponibles pour %s : %s", ticker, erreur)
         except FileNotFoundError:
-            print(f"Aucun fichier {DATA_FILE} trouvé.")
+            logger.warning("Aucun fichier %s trouvé.", DATA_FILE)
         except Exception as e:
-            print(f"Erreur lors du chargement du portefeuille : {e}")
+            logger.exception("Erreur lors du chargement du portefeuille : %s", e)
+        return rapport
+
+    def _prix_achats_en_base(self):
+        """Prix d'achat moyen pondéré des lots de la base, par ticker."""
+        lots = pd.DataFrame(self.db.get_actions(self.nom), columns=["ticker", "quantite", "prix_achat", "date_achat"])
+        if lots.empty:
+            return {}
+        lots = lots.assign(cout=lots["quantite"] * lots["prix_achat"])
+        totaux = lots.groupby("ticker")[["quantite", "cout"]].sum()
+        return (totaux["cout"] / totaux["quantite"]).to_dict()
 
     def afficher_performance(self):
         data = []
-        for i, actif in enumerate(self.actifs):
-            quantite = self.quantites[i]
-            prix_achat = self.prix_achats.get(actif.ticker, 0)
+        for actif, quantite, prix_achat in zip(self.actifs, self.quantites.tolist(), self.positions.prix_achats.tolist()):
             try:
                 valeur_actuelle = actif.get_prix_actuel()  # À implémenter dans classe Actifs
             except Exception as e:
-                print(f"Erreur récupération prix actuel pour {actif.ticker} : {e}")
+                logger.error("Erreur récupération prix actuel pour %s : %s", actif.ticker, e)
                 valeur_actuelle = 0
 
             performance = (valeur_actuelle - prix_achat) / prix_achat if prix_achat > 0 else 0
@@ -138,18 +326,35 @@ class Portefeuille:
             })
         return pd.DataFrame(data)
 
-    def comparer_a_reference(self, reference: Index):
-        self.reference = reference
-        perf_portefeuille = self.afficher_performance()
-        perf_reference = reference.get_performance()
+    def _rendements_et_references(self, references, period):
+        # Accepte un Index, un ticker ou une liste des deux ; clôtures des références en une requête groupée
+        if isinstance(references, (Index, str)):
+            references = [references]
+        tickers = [r.ticker.upper() if isinstance(r, Index) else r.upper() for r in references]
+        if not tickers:
+            raise ValueError("Aucune référence à comparer")
+        self.reference = references[0]
+        clotures = get_fournisseur().get_clotures_periode(list(dict.fromkeys(tickers)), period)
+        return self.get_rendements(period), clotures.ffill().pct_change().iloc[1:]
 
-        # Vérification que les colonnes 'Ticker' existent
-        if "Ticker" not in perf_portefeuille.columns or "Ticker" not in perf_reference.columns:
-            print("Erreur: la colonne 'Ticker' est absente dans les performances à comparer.")
+    @chronometre()
+    def comparer_a_reference(self, reference, period="1y", taux_sans_risque=0.0):
+        """
+        Compare les rendements quotidiens du portefeuille à une ou plusieurs références, alignés
+        sur les séances communes : tracking error, information ratio, bêta, alpha, captures
+        à la hausse et à la baisse. Retourne une ligne par référence.
+        """
+        try:
+            rendements, rendements_references = self._rendements_et_references(reference, period)
+            return comparaison.comparer_series(rendements, rendements_references, taux_sans_risque)
+        except Exception as e:
+            logger.error("Erreur dans la comparaison du portefeuille aux références : %s", e)
             return None
 
-        comparaison = pd.merge(perf_portefeuille, perf_reference, on="Ticker", suffixes=('_Portefeuille', '_Reference'))
-        return comparaison
+    def performance_relative_glissante(self, reference, period="1y", fenetre=63):
+        """Surperformance du portefeuille sur les `fenetre` dernières séances, pour chaque référence."""
+        rendements, rendements_references = self._rendements_et_references(reference, period)
+        return comparaison.performance_relative_glissante(rendements, rendements_references, fenetre)
 
     def ratio_sharpe(self, taux_sans_risque=0.01):
         """
@@ -159,37 +364,118 @@ class Portefeuille:
 
         try:
             rendements = self.get_rendements()  # Retourne pd.Series des rendements journaliers
-            excess_returns = rendements - taux_sans_risque / 252  # Approx 252 jours de bourse/an
-            sharpe_ratio = excess_returns.mean() / excess_returns.std() * (252 ** 0.5)
-            return sharpe_ratio
+            return analytique.sharpe(rendements.to_numpy(), taux_sans_risque)
         except Exception as e:
-            print(f"Erreur dans le calcul du ratio de Sharpe: {e}")
+            logger.error("Erreur dans le calcul du ratio de Sharpe : %s", e)
             return None
 
-    def get_rendements(self):
+    @chronometre()
+    def get_valeur_historique(self, period="1y"):
         """
-        Calcule les rendements journaliers du portefeuille en fonction des prix actuels des actifs.
-        On suppose que chaque actif a une méthode get_historique_prix() qui renvoie une pd.Series indexée par date.
+        Valeur quotidienne du portefeuille : les clôtures de tous les actifs sont téléchargées
+        en une seule requête groupée, puis pondérées par les quantités via un produit matrice-vecteur.
         """
+        if not self.actifs:
+            raise ValueError("Pas d'actifs ou données historiques disponibles")
 
-        df_valeurs = None
-        for i, actif in enumerate(self.actifs):
-            quantite = self.quantites[i]
-            try:
-                prix_hist = actif.get_historique_prix()  # pd.Series indexée par date
-                valeur_actif = prix_hist * quantite
-                if df_valeurs is None:
-                    df_valeurs = valeur_actif.to_frame(name=actif.ticker)
-                else:
-                    df_valeurs = df_valeurs.join(valeur_actif.to_frame(name=actif.ticker), how='outer')
-            except Exception as e:
-                print(f"Erreur récupération historique prix pour {actif.ticker}: {e}")
+        tickers = self.positions.tickers
+        clotures = get_fournisseur().get_clotures_periode(tickers, period)
+        clotures = clotures.ffill().bfill()
+
+        disponibles = clotures.notna().all(axis=0).to_numpy()
+        for ticker in clotures.columns[~disponibles]:
+            logger.warning("Erreur récupération historique prix pour %s : aucune donnée", ticker)
+        if not disponibles.any() or clotures.empty:
+            raise ValueError("Pas d'actifs ou données historiques disponibles")
+
+        quantites = self.quantites[disponibles]
+        valeurs = clotures.to_numpy(dtype=np.float64)[:, disponibles] @ quantites
+        return pd.Series(valeurs, index=clotures.index, name="Total")
+
+    def get_matrice_rendements(self, period="1y"):
+        """
+        Rendements quotidiens alignés des actifs détenus (séances x tickers) et valeur actuelle
+        de chaque position, tirés de la même requête groupée que get_valeur_historique.
+        """
+        if not self.actifs:
+            raise ValueError("Pas d'actifs ou données historiques disponibles")
+        clotures = get_fournisseur().get_clotures_periode(self.positions.tickers, period).ffill()
+        disponibles = clotures.notna().any(axis=0).to_numpy()
+        clotures = clotures.loc[:, disponibles]
+        if clotures.empty:
+            raise ValueError("Pas d'actifs ou données historiques disponibles")
+        valeurs = pd.Series(clotures.iloc[-1].to_numpy() * self.quantites[disponibles], index=clotures.columns, name="Valeur")
+        return clotures.pct_change().iloc[1:].dropna(), valeurs
+
+    @chronometre()
+    def risque_monte_carlo(self, horizons=(1, 10, 20), niveaux=(0.95, 0.99), n_simulations=100_000,
+                           methode="covariance", period="1y", graine=None, processus=0):
+        """VaR et CVaR simulées (covariance ou bootstrap des jours historiques), en fraction et en montant."""
+        rendements, valeurs = self.get_matrice_rendements(period)
+        valeur = float(valeurs.sum())
+        return simulation_risque.var_cvar_monte_carlo(rendements.to_numpy(), valeurs.to_numpy() / valeur, horizons,
+                                                      niveaux, n_simulations, methode, graine, processus, valeur)
+
+    @chronometre()
+    def optimiser(self, period="1y", taux_sans_risque=0.01, poids_max=1.0, n_points=50):
+        """
+        Poids de variance minimale, de Sharpe maximal (même convention de taux sans risque que
+        ratio_sharpe) et frontière efficiente des actifs détenus, sans vente à découvert et avec
+        un plafond `poids_max` par actif. Les poids actuels (en valeur) sont joints pour comparaison.
+        """
+        rendements, valeurs = self.get_matrice_rendements(period)
+        optimiseur = OptimiseurMoyenneVariance.depuis_rendements(rendements, poids_max)
+        frontiere = optimiseur.frontiere(n_points, taux_sans_risque)
+        poids = pd.DataFrame({
+            "Actuel": valeurs / valeurs.sum(),
+            "Min variance": optimiseur.min_variance(),
+            "Max Sharpe": optimiseur.max_sharpe(taux_sans_risque, frontiere),
+        })
+        statistiques = pd.DataFrame(
+            [optimiseur.statistiques(poids[colonne].to_numpy(), taux_sans_risque) for colonne in poids.columns],
+            index=poids.columns, columns=["Rendement", "Volatilité", "Sharpe"],
+        )
+        return {"poids": poids, "statistiques": statistiques, "frontiere": frontiere}
 
-        if df_valeurs is None:
+    def service_covariance(self, indices=(), **options) -> ServiceCovariance:
+        """Covariance et corrélation des actifs détenus et des index donnés, tenues à jour par actualiser()."""
+        if not self.actifs and not indices:
             raise ValueError("Pas d'actifs ou données historiques disponibles")
+        return ServiceCovariance.depuis_portefeuille(self, indices, **options)
+
+    def get_transactions(self) -> pd.DataFrame:
+        """Historique des achats et ventes ; à défaut, les positions courantes tiennent lieu d'achats."""
+        transactions = self.db.get_transactions(self.nom)
+        if transactions.empty and len(self.positions):
+            transactions = pd.DataFrame({
+                "ticker": self.positions.tickers,
+                "quantite": self.quantites.copy(),
+                "prix": self.positions.prix_achats.copy(),
+                "date": pd.to_datetime(self.dates_achat),
+            })
+        return transactions
+
+    @chronometre()
+    def moteur_rendements(self) -> MoteurRendements:
+        return MoteurRendements.depuis_transactions(self.get_transactions())
+
+    def get_valeur_liquidative(self, period="max"):
+        """Valeur quotidienne des positions effectivement détenues chaque jour (achats et ventes rejoués)."""
+        valeurs = self.moteur_rendements().valeur_liquidative()
+        debut, _ = convertir_periode(period)
+        return valeurs[valeurs.index >= pd.Timestamp(debut)]
+
+    def get_rendements(self, period="1y"):
+        """
+        Rendements journaliers pondérés par le temps (TWR) : les positions de chaque jour sont
+        reconstituées à partir de l'historique des transactions et les apports sont neutralisés.
+        """
+        rendements = self.moteur_rendements().rendements_twr().iloc[1:]
+        debut, _ = convertir_periode(period)
+        return rendements[rendements.index >= pd.Timestamp(debut)]
 
-        df_valeurs = df_valeurs.fillna(method='ffill').fillna(method='bfill')
-        df_valeurs['Total'] = df_valeurs.sum(axis=1)
+    def rendement_twr(self, debut=None, fin=None):
+        return self.moteur_rendements().twr(debut, fin)
 
-        rendements = df_valeurs['Total'].pct_change().dropna()
-        return rendements
+    def rendement_mwr(self, debut=None, fin=None):
+        return self.moteur_rendements().mwr(debut, fin)
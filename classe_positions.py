@@ -0,0 +1,108 @@
+from datetime import datetime
+import numpy as np
+
+
+class TablePositions:
+    """
+    Positions d'un portefeuille, indexées par ticker et stockées en colonnes NumPy.
+    La recherche, l'ajout et le retrait se font en O(1) : une ligne retirée est remplacée
+    par la dernière. Les quantités et prix d'achat sont exposés en vues sans copie.
+    """
+
+    def __init__(self, capacite: int = 16):
+        self._lignes = {}
+        self._actifs = []
+        self._dates = []
+        self._quantites = np.zeros(capacite)
+        self._prix_achats = np.zeros(capacite)
+
+    def __len__(self):
+        return len(self._actifs)
+
+    def __contains__(self, ticker):
+        return ticker in self._lignes
+
+    def __iter__(self):
+        return iter(self._actifs)
+
+    def _agrandir(self):
+        capacite = max(16, 2 * len(self._quantites))
+        self._quantites = np.resize(self._quantites, capacite)
+        self._prix_achats = np.resize(self._prix_achats, capacite)
+
+    @property
+    def actifs(self):
+        return list(self._actifs)
+
+    @property
+    def tickers(self):
+        return [actif.ticker for actif in self._actifs]
+
+    @property
+    def dates_achat(self):
+        return list(self._dates)
+
+    @property
+    def quantites(self) -> np.ndarray:
+        """Vue (sans copie) des quantités, dans l'ordre de `actifs`."""
+        return self._quantites[:len(self)]
+
+    @property
+    def prix_achats(self) -> np.ndarray:
+        """Vue (sans copie) des prix moyens pondérés d'achat, dans l'ordre de `actifs`."""
+        return self._prix_achats[:len(self)]
+
+    def get(self, ticker):
+        """Retourne (actif, quantite, prix_achat, date_achat) ou None."""
+        ligne = self._lignes.get(ticker)
+        if ligne is None:
+            return None
+        return self._actifs[ligne], self._quantites[ligne], self._prix_achats[ligne], self._dates[ligne]
+
+    def ajouter(self, actif, quantite, prix_achat, date_achat: datetime):
+        ligne = self._lignes.get(actif.ticker)
+        if ligne is not None:
+            ancienne_qte = self._quantites[ligne]
+            # Calcul du prix moyen pondéré d'achat
+            self._prix_achats[ligne] = (self._prix_achats[ligne] * ancienne_qte + prix_achat * quantite) / (ancienne_qte + quantite)
+            self._quantites[ligne] += quantite
+            # Mise à jour de la date d'achat si la nouvelle est antérieure
+            if date_achat < self._dates[ligne]:
+                self._dates[ligne] = date_achat
+            return
+
+        ligne = len(self)
+        if ligne == len(self._quantites):
+            self._agrandir()
+        self._lignes[actif.ticker] = ligne
+        self._actifs.append(actif)
+        self._dates.append(date_achat)
+        self._quantites[ligne] = quantite
+        self._prix_achats[ligne] = prix_achat
+
+    def retirer(self, ticker, quantite):
+        """Diminue la quantité et supprime la position si elle tombe à zéro ; retourne le reste."""
+        ligne = self._lignes[ticker]
+        self._quantites[ligne] -= quantite
+        reste = self._quantites[ligne]
+        if reste <= 0:
+            self.supprimer(ticker)
+        return reste
+
+    def supprimer(self, ticker):
+        ligne = self._lignes.pop(ticker)
+        derniere = len(self) - 1
+        if ligne != derniere:
+            # La dernière ligne prend la place de la ligne supprimée
+            self._actifs[ligne] = self._actifs[derniere]
+            self._dates[ligne] = self._dates[derniere]
+            self._quantites[ligne] = self._quantites[derniere]
+            self._prix_achats[ligne] = self._prix_achats[derniere]
+            self._lignes[self._actifs[ligne].ticker] = ligne
+        self._actifs.pop()
+        self._dates.pop()
+
+    def vider(self):
+        self._lignes.clear()
+        self._actifs.clear()
+        self._dates.clear()
@@ -0,0 +1,149 @@
+"""
+Point d'entrée en ligne de commande, sans Streamlit ni matplotlib (tâches planifiées, workers).
+
+    python cli.py report [--portefeuille NOM] [--references ^GSPC,QQQ] [--period 1y]
+    python cli.py refresh-cache [TICKER ...] [--period 1y] [--vider]
+    python cli.py import-trades FICHIER --portefeuille NOM [--taille-bloc 50000]
+    python cli.py compare NOM --references ^GSPC,QQQ [--period 1y]
+
+Les modules de calcul ne sont importés que par la commande qui s'en sert.
+"""
+import argparse
+import logging
+import os
+import sys
+
+
+def _liste_tickers(texte):
+    return [t.strip().upper() for t in texte.split(",") if t.strip()]
+
+
+def _ecrire(tableau, format_sortie, sortie):
+    if format_sortie == "csv":
+        texte = tableau.to_csv()
+    elif format_sortie == "json":
+        texte = tableau.to_json(orient="index", force_ascii=False, indent=2)
+    else:
+        texte = tableau.to_string()
+    if sortie:
+        with open(sortie, "w", encoding="utf-8") as f:
+            f.write(texte)
+        print(f"Résultat écrit dans {sortie}")
+    else:
+        print(texte)
+
+
+def commande_report(args):
+    from analyse_multi_portefeuilles import analyser_portefeuilles
+    noms = [args.portefeuille] if args.portefeuille else None
+    resume = analyser_portefeuilles(noms=noms, references=_liste_tickers(args.references), period=args.period,
+                                    taux_sans_risque=args.taux_sans_risque, processus=args.processus)
+    if resume.empty:
+        print("Aucun portefeuille à analyser.")
+        return 1
+    _ecrire(resume, args.format, args.sortie)
+    return 0
+
+
+def commande_refresh_cache(args):
+    from fournisseur_donnees import get_fournisseur
+    from database_portefeuille import DatabasePortefeuille
+    fournisseur = get_fournisseur()
+    tickers = [t.upper() for t in args.tickers]
+    if not tickers:
+        # Par défaut : tous les tickers des portefeuilles de la base
+        tickers = sorted(DatabasePortefeuille().get_toutes_transactions()["ticker"].unique())
+    if args.vider and hasattr(fournisseur, "vider"):
+        for ticker in tickers:
+            fournisseur.vider(ticker, disque=True)
+    if not tickers:
+        print("Aucun ticker à rafraîchir.")
+        return 0
+    clotures = fournisseur.get_clotures_periode(tickers, args.period)
+    manquants = [t for t in tickers if t not in clotures.columns or clotures[t].isna().all()]
+    for ticker in manquants:
+        print(f"Erreur récupération historique prix pour {ticker}: aucune donnée")
+    print(f"{len(tickers) - len(manquants)}/{len(tickers)} tickers en cache sur {args.period}.")
+    return 1 if manquants else 0
+
+
+def commande_import_trades(args):
+    from classe_portefeuille import Portefeuille
+    from etat_portefeuille import JournalPortefeuille
+    # Le journal de l'application est mis à jour s'il s'agit du même portefeuille
+    journal = JournalPortefeuille(args.journal)
+    portefeuille = journal.charger() if os.path.exists(args.journal) else None
+    if portefeuille is None or portefeuille.nom != args.portefeuille:
+        portefeuille = Portefeuille(args.portefeuille)
+    nombre = portefeuille.importer_transactions(args.fichier, taille_bloc=args.taille_bloc)
+    return 0 if nombre else 1
+
+
+def commande_compare(args):
+    from classe_portefeuille import Portefeuille
+    portefeuille = Portefeuille(args.portefeuille)
+    comparaison = portefeuille.comparer_a_reference(_liste_tickers(args.references), period=args.period,
+                                                    taux_sans_risque=args.taux_sans_risque)
+    if comparaison is None:
+        return 1
+    _ecrire(comparaison.set_index("Ticker"), args.format, args.sortie)
+    return 0
+
+
+def creer_parseur():
+    parseur = argparse.ArgumentParser(prog="cli.py", description="Gestion de portefeuille en ligne de commande")
+    parseur.add_argument("--donnees-locales", metavar="REPERTOIRE",
+                         help="lit les historiques dans <TICKER>.csv au lieu d'interroger yfinance")
+    parseur.add_argument("--verbeux", action="store_true", help="journalise aussi les messages d'information")
+    parseur.add_argument("--mesures", action="store_true",
+                         help="affiche en fin d'exécution les durées, appels réseau et succès de cache")
+    commandes = parseur.add_subparsers(dest="commande", required=True)
+
+    sortie = argparse.ArgumentParser(add_help=False)
+    sortie.add_argument("--format", choices=["table", "csv", "json"], default="table")
+    sortie.add_argument("--sortie", metavar="FICHIER", help="écrit le résultat dans un fichier")
+    sortie.add_argument("--period", default="1y", help="période d'analyse façon yfinance (1y, 6mo, ytd, max...)")
+    sortie.add_argument("--taux-sans-risque", type=float, default=0.01)
+
+    report = commandes.add_parser("report", parents=[sortie], help="tableau de performance des portefeuilles")
+    report.add_argument("--portefeuille", help="un seul portefeuille (tous par défaut)")
+    report.add_argument("--references", default="^GSPC", help="tickers de référence séparés par des virgules")
+    report.add_argument("--processus", type=int, default=None, help="taille du pool de processus (0 : aucun)")
+    report.set_defaults(fonction=commande_report)
+
+    refresh = commandes.add_parser("refresh-cache", help="télécharge les clôtures dans le cache disque")
+    refresh.add_argument("tickers", nargs="*", help="tickers (tous ceux de la base par défaut)")
+    refresh.add_argument("--period", default="1y")
+    refresh.add_argument("--vider", action="store_true", help="efface ces tickers du cache (mémoire et disque) pour tout retélécharger")
+    refresh.set_defaults(fonction=commande_refresh_cache)
+
+    importer = commandes.add_parser("import-trades", help="importe un export courtier (.csv ou .parquet)")
+    importer.add_argument("fichier")
+    importer.add_argument("--portefeuille", required=True)
+    importer.add_argument("--taille-bloc", type=int, default=50_000)
+    importer.add_argument("--journal", default="portefeuille.jsonl", help="journal de l'application à tenir à jour")
+    importer.set_defaults(fonction=commande_import_trades)
+
+    compare = commandes.add_parser("compare", parents=[sortie], help="compare un portefeuille à des références")
+    compare.add_argument("portefeuille")
+    compare.add_argument("--references", default="^GSPC", help="tickers de référence séparés par des virgules")
+    compare.set_defaults(fonction=commande_compare)
+    return parseur
+
+
+def main(argv=None):
+    args = creer_parseur().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbeux else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(name)s : %(message)s")
+    if args.donnees_locales:
+        os.environ["PORTFOLIO_DONNEES_LOCALES"] = args.donnees_locales
+    code = args.fonction(args)
+    if args.mesures:
+        import instrumentation
+        print(instrumentation.tableau_durees().to_string(), file=sys.stderr)
+        print(instrumentation.instantane()["compteurs"], file=sys.stderr)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
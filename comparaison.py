@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import analytique
+
+
+def aligner_rendements(rendements_portefeuille: pd.Series, rendements_references: pd.DataFrame):
+    """Ne garde que les séances communes au portefeuille et à toutes les références."""
+    donnees = pd.concat([rendements_portefeuille.rename("__portefeuille__"), rendements_references], axis=1, join="inner").dropna()
+    return donnees["__portefeuille__"], donnees.drop(columns="__portefeuille__")
+
+
+def comparer_series(rendements_portefeuille: pd.Series, rendements_references: pd.DataFrame,
+                    taux_sans_risque: float = 0.0, periodes: int = analytique.JOURS_BOURSE) -> pd.DataFrame:
+    """
+    Compare une série de rendements quotidiens à plusieurs références en un seul passage vectorisé
+    (une colonne de `rendements_references` par référence). Retourne une ligne par référence.
+    """
+    portefeuille, references = aligner_rendements(rendements_portefeuille, rendements_references)
+    p = portefeuille.to_numpy(dtype=np.float64)
+    b = references.to_numpy(dtype=np.float64)
+    n = len(p)
+    if n < 2:
+        raise ValueError("Pas assez de séances communes pour comparer le portefeuille aux références")
+
+    actifs = p[:, None] - b
+    tracking_error = actifs.std(axis=0, ddof=1) * np.sqrt(periodes)
+
+    p_centre = p - p.mean()
+    b_centre = b - b.mean(axis=0)
+    variance_b = (b_centre ** 2).sum(axis=0) / (n - 1)
+    covariance = p_centre @ b_centre / (n - 1)
+    taux_jour = taux_sans_risque / periodes
+
+    hausse, baisse = b > 0, b < 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        information_ratio = np.where(tracking_error > 0, actifs.mean(axis=0) * periodes / tracking_error, np.nan)
+        beta = np.where(variance_b > 0, covariance / variance_b, np.nan)
+        correlation = covariance / (p.std(ddof=1) * np.sqrt(variance_b))
+        capture_hausse = (p[:, None] * hausse).sum(axis=0) / (b * hausse).sum(axis=0)
+        capture_baisse = (p[:, None] * baisse).sum(axis=0) / (b * baisse).sum(axis=0)
+    alpha = ((p.mean() - taux_jour) - beta * (b.mean(axis=0) - taux_jour)) * periodes
+
+    rendement_portefeuille = np.prod(1 + p) - 1
+    rendements_cumules = np.prod(1 + b, axis=0) - 1
+    return pd.DataFrame({
+        "Ticker": references.columns,
+        "Séances": n,
+        "Rendement portefeuille": rendement_portefeuille,
+        "Rendement référence": rendements_cumules,
+        "Surperformance": rendement_portefeuille - rendements_cumules,
+        "Tracking error": tracking_error,
+        "Information ratio": information_ratio,
+        "Bêta": beta,
+        "Alpha (annualisé)": alpha,
+        "Corrélation": correlation,
+        "Capture hausse": capture_hausse,
+        "Capture baisse": capture_baisse,
+    })
+
+
+def performance_relative_glissante(rendements_portefeuille: pd.Series, rendements_references: pd.DataFrame,
+                                   fenetre: int = 63) -> pd.DataFrame:
+    """Rendement du portefeuille relatif à chaque référence sur les `fenetre` dernières séances :
+    (1 + R_portefeuille) / (1 + R_reference) - 1, via des sommes cumulées de log-rendements."""
+    portefeuille, references = aligner_rendements(rendements_portefeuille, rendements_references)
+    ecart_log = np.log1p(portefeuille.to_numpy())[:, None] - np.log1p(references.to_numpy())
+    cumul = np.vstack([np.zeros((1, ecart_log.shape[1])), np.cumsum(ecart_log, axis=0)])
+    if len(ecart_log) < fenetre:
+        return pd.DataFrame(columns=references.columns)
+    relatif = np.expm1(cumul[fenetre:] - cumul[:-fenetre])
+    return pd.DataFrame(relatif, index=references.index[fenetre - 1:], columns=references.columns)
@@ -1,62 +1,191 @@
 import pandas as pd
-from datetime import date
+import sqlite3
 import os
+from instrumentation import logger
+
+COLONNES = ["nom_portefeuille", "ticker", "quantite", "prix_achat", "date_achat"]
+
+
+def _en_texte_date(date_achat):
+    # Format ISO unique pour que l'ordre alphabétique soit l'ordre chronologique
+    return pd.Timestamp(date_achat).isoformat()
+
 
 class DatabasePortefeuille:
-    def __init__(self, filename="portfolios.csv"):
+    """
+    Stockage des lots d'achat dans SQLite (mode WAL) : chaque opération ne touche que les lignes
+    concernées, via l'index (nom_portefeuille, ticker, date_achat).
+    Un ancien fichier portfolios.csv est importé automatiquement à la première ouverture.
+    """
+
+    def __init__(self, filename="portfolios.db", fichier_csv="portfolios.csv"):
         self.filename = filename
-        if os.path.exists(self.filename):
-            self.df = pd.read_csv(self.filename, parse_dates=["date_achat"])
-        else:
-            self.df = pd.DataFrame(columns=["nom_portefeuille", "ticker", "quantite", "prix_achat", "date_achat"])
+        self.fichier_csv = fichier_csv
+        self._connexion = None
+        self._creer_schema()
+        if self.fichier_csv and os.path.exists(self.fichier_csv) and not self._migration_faite():
+            self.migrer_depuis_csv(self.fichier_csv)
+
+    # La connexion n'est pas picklable : on ne sauvegarde que les chemins
+    def __getstate__(self):
+        return {"filename": self.filename, "fichier_csv": self.fichier_csv}
+
+    def __setstate__(self, etat):
+        if "fichier_csv" not in etat or str(etat["filename"]).lower().endswith(".csv"):
+            # Ancienne sauvegarde {"filename": "portfolios.csv", "df": ...} : la base SQLite prend
+            # le relais et le CSV est importé, comme à la première ouverture
+            ancien_csv = etat["filename"] if str(etat["filename"]).lower().endswith(".csv") else "portfolios.csv"
+            self.__init__("portfolios.db", ancien_csv)
+            return
+        self.filename = etat["filename"]
+        self.fichier_csv = etat.get("fichier_csv")
+        self._connexion = None
+
+    @property
+    def connexion(self) -> sqlite3.Connection:
+        if self._connexion is None:
+            self._connexion = sqlite3.connect(self.filename, check_same_thread=False)
+            self._connexion.execute("PRAGMA journal_mode=WAL")
+            self._connexion.execute("PRAGMA synchronous=NORMAL")
+        return self._connexion
+
+    def _creer_schema(self):
+        with self.connexion as c:
+            c.execute("CREATE TABLE IF NOT EXISTS portefeuilles (nom TEXT PRIMARY KEY)")
+            c.execute(
+                "CREATE TABLE IF NOT EXISTS lots ("
+                "id INTEGER PRIMARY KEY, nom_portefeuille TEXT NOT NULL, ticker TEXT NOT NULL, "
+                "quantite REAL NOT NULL, prix_achat REAL, date_achat TEXT NOT NULL)"
+            )
+            c.execute("CREATE INDEX IF NOT EXISTS idx_lots ON lots (nom_portefeuille, ticker, date_achat)")
+            c.execute("CREATE TABLE IF NOT EXISTS meta (cle TEXT PRIMARY KEY, valeur TEXT)")
+            # Historique des opérations (quantité signée : achat > 0, vente < 0), jamais modifié
+            c.execute(
+                "CREATE TABLE IF NOT EXISTS transactions ("
+                "id INTEGER PRIMARY KEY, nom_portefeuille TEXT NOT NULL, ticker TEXT NOT NULL, "
+                "quantite REAL NOT NULL, prix REAL, date TEXT NOT NULL)"
+            )
+            c.execute("CREATE INDEX IF NOT EXISTS idx_transactions ON transactions (nom_portefeuille, date)")
+            # Les lots d'une base antérieure deviennent les achats initiaux de l'historique
+            if c.execute("SELECT 1 FROM meta WHERE cle = 'historique_transactions'").fetchone() is None:
+                c.execute(
+                    "INSERT INTO transactions (nom_portefeuille, ticker, quantite, prix, date) "
+                    "SELECT nom_portefeuille, ticker, quantite, prix_achat, date_achat FROM lots ORDER BY id"
+                )
+                c.execute("INSERT INTO meta (cle, valeur) VALUES ('historique_transactions', '1')")
+
+    def _migration_faite(self):
+        ligne = self.connexion.execute("SELECT valeur FROM meta WHERE cle = 'migration_csv'").fetchone()
+        return ligne is not None
+
+    def migrer_depuis_csv(self, fichier_csv, taille_bloc=50_000):
+        """Importe un ancien fichier CSV par blocs, dans une seule transaction."""
+        with self.connexion as c:
+            for bloc in pd.read_csv(fichier_csv, chunksize=taille_bloc):
+                bloc = bloc[COLONNES].copy()
+                bloc["date_achat"] = pd.to_datetime(bloc["date_achat"]).map(_en_texte_date)
+                lignes = list(bloc.itertuples(index=False, name=None))
+                c.executemany(
+                    "INSERT INTO lots (nom_portefeuille, ticker, quantite, prix_achat, date_achat) VALUES (?, ?, ?, ?, ?)",
+                    lignes,
+                )
+                c.executemany(
+                    "INSERT INTO transactions (nom_portefeuille, ticker, quantite, prix, date) VALUES (?, ?, ?, ?, ?)",
+                    lignes,
+                )
+                c.executemany("INSERT OR IGNORE INTO portefeuilles (nom) VALUES (?)",
+                              ((nom,) for nom in bloc["nom_portefeuille"].unique()))
+            c.execute("INSERT OR REPLACE INTO meta (cle, valeur) VALUES ('migration_csv', ?)", (fichier_csv,))
+        logger.info("Base %s importée dans %s", fichier_csv, self.filename)
 
     def sauvegarder(self):
-        self.df.to_csv(self.filename, index=False)
+        # Chaque opération est déjà validée dans sa propre transaction
+        self.connexion.commit()
 
     def ajouter_portefeuille(self, nom):
-        # Pas besoin de ligne spéciale, on crée portefeuille à la création d'action
-        if nom not in self.df["nom_portefeuille"].unique():
-            # Juste une méthode pour avoir un nom reconnu, sans action
-            pass
+        with self.connexion as c:
+            c.execute("INSERT OR IGNORE INTO portefeuilles (nom) VALUES (?)", (nom,))
 
     def get_all_portfolios(self):
-        return list(self.df["nom_portefeuille"].unique())
+        lignes = self.connexion.execute(
+            "SELECT nom FROM portefeuilles UNION SELECT DISTINCT nom_portefeuille FROM lots"
+        ).fetchall()
+        return [nom for (nom,) in lignes]
 
     def ajouter_action(self, nom_portefeuille, ticker, quantite, prix_achat, date_achat):
-        # Ajouter ligne nouvelle action
-        new_row = {
-            "nom_portefeuille": nom_portefeuille,
-            "ticker": ticker,
-            "quantite": quantite,
-            "prix_achat": prix_achat,
-            "date_achat": pd.to_datetime(date_achat)
-        }
-        self.df = pd.concat([self.df, pd.DataFrame([new_row])], ignore_index=True)
-        self.sauvegarder()
+        self.ajouter_actions([(nom_portefeuille, ticker, quantite, prix_achat, date_achat)])
+
+    def ajouter_actions(self, lots):
+        """Insère des lots (nom_portefeuille, ticker, quantite, prix_achat, date_achat) en une transaction,
+        ainsi que les achats correspondants dans l'historique des transactions."""
+        lignes = [(nom, ticker, quantite, prix_achat, _en_texte_date(date_achat))
+                  for nom, ticker, quantite, prix_achat, date_achat in lots]
+        with self.connexion as c:
+            c.executemany(
+                "INSERT INTO lots (nom_portefeuille, ticker, quantite, prix_achat, date_achat) VALUES (?, ?, ?, ?, ?)",
+                lignes,
+            )
+            c.executemany(
+                "INSERT INTO transactions (nom_portefeuille, ticker, quantite, prix, date) VALUES (?, ?, ?, ?, ?)",
+                lignes,
+            )
 
     def get_actions(self, nom_portefeuille):
-        subset = self.df[self.df["nom_portefeuille"] == nom_portefeuille]
         # Retourne liste de tuples (ticker, quantite, prix_achat, date_achat)
-        return list(subset[["ticker", "quantite", "prix_achat", "date_achat"]].itertuples(index=False, name=None))
+        lignes = self.connexion.execute(
+            "SELECT ticker, quantite, prix_achat, date_achat FROM lots WHERE nom_portefeuille = ? ORDER BY id",
+            (nom_portefeuille,),
+        ).fetchall()
+        return [(ticker, quantite, prix_achat, pd.Timestamp(date_achat)) for ticker, quantite, prix_achat, date_achat in lignes]
 
-    def retirer_action(self, nom_portefeuille, ticker, quantite):
+    def get_transactions(self, nom_portefeuille) -> pd.DataFrame:
+        """Historique des opérations (ticker, quantite signée, prix, date), dans l'ordre chronologique.
+        Le prix d'une vente peut être inconnu (NaN)."""
+        transactions = pd.read_sql_query(
+            "SELECT ticker, quantite, prix, date FROM transactions WHERE nom_portefeuille = ? ORDER BY date, id",
+            self.connexion, params=(nom_portefeuille,),
+        )
+        transactions["date"] = pd.to_datetime(transactions["date"], format="ISO8601")
+        return transactions
+
+    def get_toutes_transactions(self, noms_portefeuilles=None) -> pd.DataFrame:
+        """Historique de plusieurs portefeuilles (tous par défaut) en une seule requête,
+        avec la colonne nom_portefeuille en plus."""
+        requete = "SELECT nom_portefeuille, ticker, quantite, prix, date FROM transactions"
+        params = ()
+        if noms_portefeuilles is not None:
+            noms_portefeuilles = list(noms_portefeuilles)
+            requete += f" WHERE nom_portefeuille IN ({', '.join('?' * len(noms_portefeuilles))})"
+            params = tuple(noms_portefeuilles)
+        transactions = pd.read_sql_query(requete + " ORDER BY date, id", self.connexion, params=params)
+        transactions["date"] = pd.to_datetime(transactions["date"], format="ISO8601")
+        return transactions
+
+    def retirer_action(self, nom_portefeuille, ticker, quantite, date_vente=None, prix_vente=None):
         # Retirer quantité dans l'ordre ancienneté date_achat
-        subset = self.df[(self.df["nom_portefeuille"] == nom_portefeuille) & (self.df["ticker"] == ticker)]
-        subset = subset.sort_values(by="date_achat")
-        
-        qty_to_remove = quantite
-        indices_to_drop = []
-        for idx, row in subset.iterrows():
-            if qty_to_remove <= 0:
-                break
-            if row["quantite"] <= qty_to_remove:
-                qty_to_remove -= row["quantite"]
-                indices_to_drop.append(idx)
-            else:
-                # Modifier la quantité restante
-                self.df.at[idx, "quantite"] = row["quantite"] - qty_to_remove
-                qty_to_remove = 0
-
-        # Supprimer les lignes où quantité totalement retirée
-        self.df = self.df.drop(indices_to_drop)
-        self.sauvegarder()
+        date_vente = pd.Timestamp.now().normalize() if date_vente is None else date_vente
+        with self.connexion as c:
+            c.execute("BEGIN IMMEDIATE")
+            c.execute(
+                "INSERT INTO transactions (nom_portefeuille, ticker, quantite, prix, date) VALUES (?, ?, ?, ?, ?)",
+                (nom_portefeuille, ticker, -quantite, prix_vente, _en_texte_date(date_vente)),
+            )
+            lots = c.execute(
+                "SELECT id, quantite FROM lots WHERE nom_portefeuille = ? AND ticker = ? ORDER BY date_achat, id",
+                (nom_portefeuille, ticker),
+            ).fetchall()
+            qty_to_remove = quantite
+            ids_to_drop = []
+            for id_lot, quantite_lot in lots:
+                if qty_to_remove <= 0:
+                    break
+                if quantite_lot <= qty_to_remove:
+                    qty_to_remove -= quantite_lot
+                    ids_to_drop.append((id_lot,))
+                else:
+                    # Modifier la quantité restante
+                    c.execute("UPDATE lots SET quantite = ? WHERE id = ?", (quantite_lot - qty_to_remove, id_lot))
+                    qty_to_remove = 0
+
+            # Supprimer les lignes où quantité totalement retirée
+            c.executemany("DELETE FROM lots WHERE id = ?", ids_to_drop)
@@ -0,0 +1,88 @@
+import json
+import os
+from datetime import datetime
+from classe_portefeuille import Portefeuille
+
+FORMAT = "portefeuille"
+VERSION = 1
+
+
+class JournalPortefeuille:
+    """
+    État du portefeuille en JSON lines, en ajout seul :
+    - 1re ligne : en-tête {"format": "portefeuille", "version": 1, "nom": ...}
+    - puis un instantané ["=", [[ticker, quantite, prix_achat, "AAAA-MM-JJ"], ...]]
+    - puis une ligne par opération : ["+", ticker, quantite, prix_achat, "AAAA-MM-JJ"] ou ["-", ticker, quantite]
+
+    Seules les positions sont enregistrées ; les données de marché sont rechargées à la demande.
+    Au-delà de `seuil_compaction` opérations, le fichier est réécrit sous forme d'un seul instantané.
+    """
+
+    def __init__(self, fichier: str = "portefeuille.jsonl", seuil_compaction: int = 1000):
+        self.fichier = fichier
+        self.seuil_compaction = seuil_compaction
+        self._operations = 0
+
+    def creer(self, portefeuille):
+        """Réécrit le fichier (de manière atomique) avec l'état courant du portefeuille."""
+        positions = [
+            [actif.ticker, quantite, prix_achat, date_achat.strftime("%Y-%m-%d")]
+            for actif, quantite, prix_achat, date_achat in zip(
+                portefeuille.actifs, portefeuille.quantites.tolist(),
+                portefeuille.positions.prix_achats.tolist(), portefeuille.dates_achat)
+        ]
+        temporaire = self.fichier + ".tmp"
+        with open(temporaire, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"format": FORMAT, "version": VERSION, "nom": portefeuille.nom}) + "\n")
+            f.write(json.dumps(["=", positions], separators=(",", ":")) + "\n")
+        os.replace(temporaire, self.fichier)
+        self._operations = 0
+        portefeuille.journal = self
+
+    def _ajouter_ligne(self, ligne):
+        with open(self.fichier, "a", encoding="utf-8") as f:
+            f.write(json.dumps(ligne, separators=(",", ":")) + "\n")
+        self._operations += 1
+
+    def journaliser_ajout(self, portefeuille, ticker, quantite, prix_achat, date_achat: datetime):
+        self._ajouter_ligne(["+", ticker, quantite, prix_achat, date_achat.strftime("%Y-%m-%d")])
+        self._compacter_si_besoin(portefeuille)
+
+    def journaliser_retrait(self, portefeuille, ticker, quantite):
+        self._ajouter_ligne(["-", ticker, quantite])
+        self._compacter_si_besoin(portefeuille)
+
+    def _compacter_si_besoin(self, portefeuille):
+        if self._operations >= self.seuil_compaction:
+            self.creer(portefeuille)
+
+    def charger(self):
+        """Reconstruit le portefeuille sans aucun appel réseau ; None si le fichier n'existe pas."""
+        if not os.path.exists(self.fichier):
+            return None
+        with open(self.fichier, encoding="utf-8") as f:
+            entete = json.loads(f.readline())
+            if entete.get("format") != FORMAT or entete.get("version") != VERSION:
+                raise ValueError(f"Format de {self.fichier} non pris en charge : {entete}")
+
+            portefeuille = Portefeuille(entete["nom"])
+            self._operations = 0
+            for ligne in f:
+                if not ligne.strip():
+                    continue
+                operation = json.loads(ligne)
+                if operation[0] == "=":
+                    portefeuille.positions.vider()
+                    for ticker, quantite, prix_achat, date_achat in operation[1]:
+                        portefeuille.restaurer_position(ticker, quantite, prix_achat, datetime.strptime(date_achat, "%Y-%m-%d"))
+                elif operation[0] == "+":
+                    _, ticker, quantite, prix_achat, date_achat = operation
+                    portefeuille.restaurer_position(ticker, quantite, prix_achat, datetime.strptime(date_achat, "%Y-%m-%d"))
+                    self._operations += 1
+                elif operation[0] == "-":
+                    _, ticker, quantite = operation
+                    if ticker in portefeuille.positions:
+                        portefeuille.positions.retirer(ticker, quantite)
+                    self._operations += 1
+        portefeuille.journal = self
+        return portefeuille
@@ -0,0 +1,514 @@
+import os
+import re
+import json
+import time
+import threading
+import zlib
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from instrumentation import compter, logger, mesurer
+
+COLONNES_OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+REPERTOIRE_CACHE = ".cache_prix"
+
+
+def _en_date(valeur) -> date:
+    if isinstance(valeur, datetime):
+        return valeur.date()
+    if isinstance(valeur, date):
+        return valeur
+    return pd.Timestamp(valeur).date()
+
+
+def convertir_periode(periode: str, fin: date = None):
+    """Convertit une période façon yfinance ("5d", "1mo", "1y", "ytd", "max")
+    en bornes (debut, fin) avec fin exclue."""
+    if fin is None:
+        fin = date.today() + timedelta(days=1)
+    periode = periode.lower()
+    if periode == "max":
+        return date(1970, 1, 1), fin
+    if periode == "ytd":
+        return date(fin.year, 1, 1), fin
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", periode)
+    if match is None:
+        raise ValueError(f"Période inconnue : {periode}")
+    n, unite = int(match.group(1)), match.group(2)
+    if unite == "d":
+        # Jours de bourse : on élargit pour couvrir week-ends et jours fériés
+        jours = int(n * 1.5) + 4
+    elif unite == "wk":
+        jours = 7 * n
+    elif unite == "mo":
+        jours = 31 * n
+    else:
+        jours = 366 * n
+    return fin - timedelta(days=jours), fin
+
+
+def _nombre_seances(periode: str):
+    # Une période en jours ("5d") désigne les N dernières séances, comme chez yfinance
+    match = re.fullmatch(r"(\d+)d", periode.lower())
+    return int(match.group(1)) if match else None
+
+
+def _normaliser_historique(data: pd.DataFrame) -> pd.DataFrame:
+    if data is None or data.empty:
+        return pd.DataFrame(columns=COLONNES_OHLCV, index=pd.DatetimeIndex([], name="Date"))
+    data = data[[c for c in COLONNES_OHLCV if c in data.columns]].copy()
+    index = pd.DatetimeIndex(data.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    data.index = index
+    data.index.name = "Date"
+    data = data[~data.index.duplicated(keep="last")]
+    return data.sort_index()
+
+
+class FournisseurDonnees:
+    """Interface commune des sources de données de marché (historique OHLCV et fondamentaux)."""
+
+    def get_historique(self, ticker: str, debut: date, fin: date, intervalle: str = "1d") -> pd.DataFrame:
+        raise NotImplementedError
+
+    def get_infos(self, ticker: str) -> dict:
+        raise NotImplementedError
+
+    def get_historiques(self, tickers: List[str], debut: date, fin: date, intervalle: str = "1d") -> Dict[str, pd.DataFrame]:
+        """Historiques de plusieurs tickers, indexés par ticker en majuscules."""
+        return {t.upper(): self.get_historique(t, debut, fin, intervalle) for t in tickers}
+
+    def get_clotures(self, tickers: List[str], debut: date, fin: date, intervalle: str = "1d") -> pd.DataFrame:
+        """Clôtures alignées sur un même index de dates, une colonne par ticker."""
+        tickers = [t.upper() for t in tickers]
+        historiques = self.get_historiques(tickers, debut, fin, intervalle)
+        clotures = pd.concat({t: h["Close"] for t, h in historiques.items()}, axis=1) if historiques else pd.DataFrame()
+        return clotures.reindex(columns=tickers).astype(float)
+
+    def get_clotures_periode(self, tickers: List[str], periode: str = "1y", intervalle: str = "1d") -> pd.DataFrame:
+        debut, fin = convertir_periode(periode)
+        return self.get_clotures(tickers, debut, fin, intervalle)
+
+    def get_historique_periode(self, ticker: str, periode: str = "1y", intervalle: str = "1d") -> pd.DataFrame:
+        debut, fin = convertir_periode(periode)
+        data = self.get_historique(ticker, debut, fin, intervalle)
+        seances = _nombre_seances(periode)
+        if seances is not None:
+            data = data.tail(seances)
+        return data
+
+    def get_serie_clotures(self, ticker: str, debut: date, fin: date, intervalle: str = "1d"):
+        """(dates, clôtures) en tableaux NumPy, séances sans cotation exclues."""
+        cloture = self.get_historique(ticker, debut, fin, intervalle)["Close"].dropna()
+        return cloture.index.to_numpy(dtype="datetime64[ns]"), cloture.to_numpy(dtype=np.float64)
+
+    def get_serie_clotures_periode(self, ticker: str, periode: str = "1y", intervalle: str = "1d"):
+        debut, fin = convertir_periode(periode)
+        dates, valeurs = self.get_serie_clotures(ticker, debut, fin, intervalle)
+        seances = _nombre_seances(periode)
+        if seances is not None:
+            dates, valeurs = dates[max(len(dates) - seances, 0):], valeurs[max(len(valeurs) - seances, 0):]
+        return dates, valeurs
+
+
+class FournisseurYFinance(FournisseurDonnees):
+    """Adaptateur yfinance : une requête réseau par appel.
+    yfinance n'est importé qu'au premier appel, pour ne pas ralentir les usages hors-ligne."""
+
+    def get_historique(self, ticker, debut, fin, intervalle="1d"):
+        import yfinance as yf
+        compter("reseau.appels")
+        with mesurer("reseau.yfinance.history"):
+            data = yf.Ticker(ticker).history(
+                start=_en_date(debut).strftime("%Y-%m-%d"),
+                end=_en_date(fin).strftime("%Y-%m-%d"),
+                interval=intervalle,
+            )
+        return _normaliser_historique(data)
+
+    def get_historiques(self, tickers, debut, fin, intervalle="1d"):
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        if len(tickers) == 1:
+            return {tickers[0]: self.get_historique(tickers[0], debut, fin, intervalle)}
+        # Une seule requête pour tous les tickers
+        import yfinance as yf
+        compter("reseau.appels")
+        with mesurer("reseau.yfinance.download"):
+            data = yf.download(
+                tickers,
+                start=_en_date(debut).strftime("%Y-%m-%d"),
+                end=_en_date(fin).strftime("%Y-%m-%d"),
+                interval=intervalle,
+                group_by="ticker",
+                auto_adjust=True,
+                threads=True,
+                progress=False,
+            )
+        recus = set(data.columns.get_level_values(0)) if not data.empty else set()
+        return {
+            t: _normaliser_historique(data[t].dropna(how="all") if t in recus else None)
+            for t in tickers
+        }
+
+    def get_infos(self, ticker):
+        import yfinance as yf
+        compter("reseau.appels")
+        with mesurer("reseau.yfinance.info"):
+            return dict(yf.Ticker(ticker).info or {})
+
+
+class FournisseurLocal(FournisseurDonnees):
+    """Source hors-ligne : historiques en mémoire ou fichiers <TICKER>.csv d'un répertoire
+    (colonnes Date, Open, High, Low, Close, Volume) et <TICKER>.json pour les infos."""
+
+    def __init__(self, repertoire: str = None):
+        self.repertoire = repertoire
+        self.historiques = {}
+        self.infos = {}
+
+    def ajouter_historique(self, ticker: str, data: pd.DataFrame):
+        self.historiques[ticker.upper()] = _normaliser_historique(data)
+
+    def ajouter_infos(self, ticker: str, infos: dict):
+        self.infos[ticker.upper()] = dict(infos)
+
+    def _charger(self, ticker):
+        ticker = ticker.upper()
+        if ticker not in self.historiques and self.repertoire:
+            chemin = os.path.join(self.repertoire, f"{ticker}.csv")
+            if os.path.exists(chemin):
+                data = pd.read_csv(chemin, index_col=0, parse_dates=True)
+                self.historiques[ticker] = _normaliser_historique(data)
+        return self.historiques.get(ticker)
+
+    def get_historique(self, ticker, debut, fin, intervalle="1d"):
+        data = self._charger(ticker)
+        if data is None:
+            return _normaliser_historique(None)
+        debut, fin = pd.Timestamp(_en_date(debut)), pd.Timestamp(_en_date(fin))
+        return data[(data.index >= debut) & (data.index < fin)]
+
+    def get_infos(self, ticker):
+        ticker = ticker.upper()
+        if ticker not in self.infos and self.repertoire:
+            chemin = os.path.join(self.repertoire, f"{ticker}.json")
+            if os.path.exists(chemin):
+                with open(chemin, encoding="utf-8") as f:
+                    self.infos[ticker] = json.load(f)
+        return dict(self.infos.get(ticker, {}))
+
+
+class FournisseurSynthetique(FournisseurDonnees):
+    """
+    Source hors-ligne et reproductible : chaque ticker suit un mouvement brownien géométrique
+    sur les `annees` dernières années de jours ouvrés, tiré d'une graine dérivée du ticker.
+    `latence` (en secondes) simule le temps d'un appel réseau ; `appels` compte les appels reçus.
+    """
+
+    def __init__(self, annees: int = 5, volatilite: float = 0.02, graine: int = 0, latence: float = 0.0):
+        self.annees = annees
+        self.volatilite = volatilite
+        self.graine = graine
+        self.latence = latence
+        self.appels = 0
+        self._historiques = {}
+
+    def _historique(self, ticker):
+        ticker = ticker.upper()
+        if ticker not in self._historiques:
+            fin = pd.Timestamp(date.today())
+            dates = pd.bdate_range(fin - pd.DateOffset(years=self.annees), fin, name="Date")
+            generateur = np.random.default_rng([zlib.crc32(ticker.encode()), self.graine])
+            rendements = generateur.normal(0.0003, self.volatilite, len(dates))
+            cloture = 100 * np.exp(np.cumsum(rendements))
+            ecart = np.abs(generateur.normal(0, self.volatilite / 2, len(dates))) * cloture
+            self._historiques[ticker] = pd.DataFrame({
+                "Open": cloture * (1 + generateur.normal(0, self.volatilite / 4, len(dates))),
+                "High": cloture + ecart,
+                "Low": cloture - ecart,
+                "Close": cloture,
+                "Volume": generateur.integers(100_000, 10_000_000, len(dates)),
+            }, index=dates)
+        return self._historiques[ticker]
+
+    def get_historique(self, ticker, debut, fin, intervalle="1d"):
+        self.appels += 1
+        if self.latence:
+            time.sleep(self.latence)
+        data = self._historique(ticker)
+        debut, fin = pd.Timestamp(_en_date(debut)), pd.Timestamp(_en_date(fin))
+        return data[(data.index >= debut) & (data.index < fin)]
+
+    def get_historiques(self, tickers, debut, fin, intervalle="1d"):
+        # Une requête groupée compte pour un seul appel, comme yf.download
+        self.appels += 1
+        if self.latence:
+            time.sleep(self.latence)
+        debut, fin = pd.Timestamp(_en_date(debut)), pd.Timestamp(_en_date(fin))
+        resultat = {}
+        for ticker in dict.fromkeys(t.upper() for t in tickers):
+            data = self._historique(ticker)
+            resultat[ticker] = data[(data.index >= debut) & (data.index < fin)]
+        return resultat
+
+    def get_infos(self, ticker):
+        self.appels += 1
+        cloture = self._historique(ticker)["Close"]
+        return {
+            "longName": f"{ticker.upper()} (synthétique)",
+            "sector": "Synthétique",
+            "industry": "Synthétique",
+            "volume": int(self._historique(ticker)["Volume"].iloc[-1]),
+            "marketCap": int(cloture.iloc[-1] * 1e9),
+            "fiftyTwoWeekHigh": float(cloture.iloc[-252:].max()),
+            "fiftyTwoWeekLow": float(cloture.iloc[-252:].min()),
+        }
+
+
+def _fusionner_plages(plages):
+    fusion = []
+    for debut, fin in sorted(plages):
+        if fusion and debut <= fusion[-1][1]:
+            fusion[-1] = (fusion[-1][0], max(fusion[-1][1], fin))
+        else:
+            fusion.append((debut, fin))
+    return fusion
+
+
+def _plages_manquantes(plages, debut, fin):
+    manquantes = []
+    curseur = debut
+    for p_debut, p_fin in plages:
+        if p_fin <= curseur:
+            continue
+        if p_debut >= fin:
+            break
+        if p_debut > curseur:
+            manquantes.append((curseur, p_debut))
+        curseur = max(curseur, p_fin)
+    if curseur < fin:
+        manquantes.append((curseur, fin))
+    return manquantes
+
+
+def _plages_a_telecharger(plages, debut, fin, derniere_date, maj_jour, ttl_jour):
+    """
+    Plages de [debut, fin[ à demander à la source. Si la séance du jour a été demandée il y a
+    moins de `ttl_jour` secondes, la dernière plage est ramenée à aujourd'hui, ou abandonnée si
+    rien n'est connu après son début (pas de nouvelle cotation depuis la dernière demande).
+    """
+    aujourdhui = date.today()
+    manquantes = _plages_manquantes(plages, debut, fin)
+    if manquantes and manquantes[-1][1] > aujourdhui and time.time() - maj_jour < ttl_jour:
+        dernier_debut = manquantes[-1][0]
+        if dernier_debut >= aujourdhui or derniere_date is None or dernier_debut > derniere_date:
+            manquantes.pop()
+        else:
+            manquantes[-1] = (dernier_debut, aujourdhui)
+    return manquantes
+
+
+def _plages_couvertes(plages, manquantes, derniere_date):
+    """
+    Plages couvertes une fois `manquantes` téléchargées. Une plage n'est couverte que jusqu'au
+    lendemain de la dernière cotation connue (`derniere_date`) et jamais au-delà d'aujourd'hui :
+    la séance du jour reste ouverte, et une réponse vide ou tronquée sera redemandée.
+    """
+    if derniere_date is None:
+        return plages
+    limite = min(date.today(), derniere_date + timedelta(days=1))
+    couvertes = [(d, min(f, limite)) for d, f in manquantes if d < min(f, limite)]
+    return _fusionner_plages(plages + couvertes)
+
+
+class CachePrix(FournisseurDonnees):
+    """Cache OHLCV persistant devant une autre source.
+
+    Pour chaque (ticker, intervalle), on conserve sur disque l'historique déjà téléchargé
+    et les plages de dates couvertes ; seules les plages manquantes sont demandées à la source.
+    La séance du jour n'est jamais considérée comme définitivement couverte : elle est
+    redemandée au plus une fois toutes les `ttl_jour` secondes.
+    """
+
+    def __init__(self, source: FournisseurDonnees, repertoire: str = REPERTOIRE_CACHE,
+                 ttl_jour: float = 900, ttl_infos: float = 86400):
+        self.source = source
+        self.repertoire = repertoire
+        self.ttl_jour = ttl_jour
+        self.ttl_infos = ttl_infos
+        self._historiques = {}
+        self._plages = {}
+        self._maj_jour = {}
+        self._infos = {}
+        # Un verrou par ticker : des chargements concurrents de tickers distincts restent parallèles
+        self._verrous = {}
+        self._verrou_global = threading.Lock()
+        if self.repertoire:
+            os.makedirs(self.repertoire, exist_ok=True)
+
+    def _verrou(self, cle):
+        with self._verrou_global:
+            return self._verrous.setdefault(cle, threading.Lock())
+
+    def _chemin(self, ticker, suffixe):
+        nom = re.sub(r"[^A-Za-z0-9.-]", "_", ticker.upper())
+        return os.path.join(self.repertoire, f"{nom}_{suffixe}")
+
+    def _charger(self, ticker, intervalle):
+        cle = (ticker, intervalle)
+        if cle in self._historiques:
+            return
+        data, plages = _normaliser_historique(None), []
+        if self.repertoire and os.path.exists(self._chemin(ticker, f"{intervalle}.json")):
+            try:
+                with open(self._chemin(ticker, f"{intervalle}.json"), encoding="utf-8") as f:
+                    plages = [(date.fromisoformat(d), date.fromisoformat(f_)) for d, f_ in json.load(f)["plages"]]
+                data = _normaliser_historique(
+                    pd.read_csv(self._chemin(ticker, f"{intervalle}.csv"), index_col=0, parse_dates=True)
+                )
+            except Exception as e:
+                logger.warning("Cache illisible pour %s (%s), il sera reconstruit : %s", ticker, intervalle, e)
+                data, plages = _normaliser_historique(None), []
+        self._historiques[cle] = data
+        self._plages[cle] = plages
+
+    def _sauvegarder(self, ticker, intervalle):
+        if not self.repertoire:
+            return
+        cle = (ticker, intervalle)
+        self._historiques[cle].to_csv(self._chemin(ticker, f"{intervalle}.csv"))
+        with open(self._chemin(ticker, f"{intervalle}.json"), "w", encoding="utf-8") as f:
+            json.dump({"plages": [(d.isoformat(), f_.isoformat()) for d, f_ in self._plages[cle]]}, f)
+
+    def _derniere_date(self, cle):
+        data = self._historiques[cle]
+        return data.index[-1].date() if not data.empty else None
+
+    def _plages_a_telecharger(self, cle, debut, fin):
+        return _plages_a_telecharger(self._plages[cle], debut, fin, self._derniere_date(cle),
+                                     self._maj_jour.get(cle, 0), self.ttl_jour)
+
+    def _integrer(self, cle, manquantes, morceaux):
+        if any(f > date.today() for _, f in manquantes):
+            self._maj_jour[cle] = time.time()
+        morceaux = [_normaliser_historique(m) for m in morceaux]
+        morceaux = [m for m in morceaux if not m.empty]
+        if not morceaux:
+            # Rien reçu (ticker inconnu, erreur de la source) : aucune plage n'est marquée couverte
+            return
+        data = pd.concat([m for m in [self._historiques[cle]] + morceaux if not m.empty])
+        self._historiques[cle] = data[~data.index.duplicated(keep="last")].sort_index()
+        self._plages[cle] = _plages_couvertes(self._plages[cle], manquantes, self._derniere_date(cle))
+        self._sauvegarder(*cle)
+
+    def get_historique(self, ticker, debut, fin, intervalle="1d"):
+        return self.get_historiques([ticker], debut, fin, intervalle)[ticker.upper()]
+
+    def get_historiques(self, tickers, debut, fin, intervalle="1d"):
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        verrous = [self._verrou((ticker, intervalle)) for ticker in sorted(tickers)]
+        for verrou in verrous:
+            verrou.acquire()
+        try:
+            return self._get_historiques(tickers, _en_date(debut), _en_date(fin), intervalle)
+        finally:
+            for verrou in reversed(verrous):
+                verrou.release()
+
+    def _get_historiques(self, tickers, debut, fin, intervalle):
+        # Les tickers auxquels il manque les mêmes plages partagent une seule requête groupée
+        groupes = {}
+        for ticker in tickers:
+            self._charger(ticker, intervalle)
+            manquantes = self._plages_a_telecharger((ticker, intervalle), debut, fin)
+            if manquantes:
+                groupes.setdefault(tuple(manquantes), []).append(ticker)
+            compter("cache.prix.echecs" if manquantes else "cache.prix.succes")
+
+        for manquantes, groupe in groupes.items():
+            recus = {ticker: [] for ticker in groupe}
+            for m_debut, m_fin in manquantes:
+                with mesurer("CachePrix.source.get_historiques"):
+                    lot = self.source.get_historiques(groupe, m_debut, m_fin, intervalle)
+                for ticker in groupe:
+                    recus[ticker].append(lot.get(ticker))
+            for ticker in groupe:
+                self._integrer((ticker, intervalle), list(manquantes), recus[ticker])
+
+        debut, fin = pd.Timestamp(debut), pd.Timestamp(fin)
+        resultat = {}
+        for ticker in tickers:
+            data = self._historiques[(ticker, intervalle)]
+            resultat[ticker] = data[(data.index >= debut) & (data.index < fin)]
+        return resultat
+
+    def get_infos(self, ticker):
+        ticker = ticker.upper()
+        with self._verrou(("infos", ticker)):
+            return self._get_infos(ticker)
+
+    def _get_infos(self, ticker):
+        entree = self._infos.get(ticker)
+        if entree is None and self.repertoire and os.path.exists(self._chemin(ticker, "infos.json")):
+            with open(self._chemin(ticker, "infos.json"), encoding="utf-8") as f:
+                entree = json.load(f)
+        compter("cache.infos.echecs" if entree is None or time.time() - entree["maj"] > self.ttl_infos else "cache.infos.succes")
+        if entree is None or time.time() - entree["maj"] > self.ttl_infos:
+            with mesurer("CachePrix.source.get_infos"):
+                entree = {"maj": time.time(), "infos": self.source.get_infos(ticker)}
+            if self.repertoire:
+                with open(self._chemin(ticker, "infos.json"), "w", encoding="utf-8") as f:
+                    json.dump(entree, f, default=str)
+        self._infos[ticker] = entree
+        return dict(entree["infos"])
+
+    def vider(self, ticker: str = None, disque: bool = False):
+        """Oublie le cache mémoire (d'un ticker ou de tous). Avec `disque`, les fichiers et donc
+        les plages couvertes sont aussi supprimés : tout sera retéléchargé auprès de la source."""
+        if ticker is None:
+            self._historiques.clear()
+            self._plages.clear()
+            self._maj_jour.clear()
+            self._infos.clear()
+        else:
+            ticker = ticker.upper()
+            for cle in [c for c in self._historiques if c[0] == ticker]:
+                del self._historiques[cle]
+                del self._plages[cle]
+                self._maj_jour.pop(cle, None)
+            self._infos.pop(ticker, None)
+        if disque and self.repertoire:
+            # <TICKER>_<intervalle>.csv / .json et <TICKER>_infos.json
+            prefixe = re.escape(re.sub(r"[^A-Za-z0-9.-]", "_", ticker)) + "_" if ticker else r".+_"
+            motif = re.compile(prefixe + r"[^_]+\.(csv|json)")
+            for nom in os.listdir(self.repertoire):
+                if motif.fullmatch(nom):
+                    os.remove(os.path.join(self.repertoire, nom))
+
+
+_fournisseur_defaut = None
+
+
+def get_fournisseur() -> FournisseurDonnees:
+    """Fournisseur partagé par défaut : yfinance derrière le stockage en colonnes des clôtures
+    (et le cache disque pour le reste), ou les fichiers du répertoire indiqué par
+    PORTFOLIO_DONNEES_LOCALES pour travailler hors-ligne."""
+    global _fournisseur_defaut
+    if _fournisseur_defaut is None:
+        repertoire_local = os.environ.get("PORTFOLIO_DONNEES_LOCALES")
+        if repertoire_local:
+            _fournisseur_defaut = CachePrix(FournisseurLocal(repertoire_local), repertoire=None)
+        else:
+            from stockage_colonnes import StockageColonnes  # import différé : ce module-ci y est importé
+            # Clôtures quotidiennes dans le stockage en colonnes seulement ; le cache CSV ne sert
+            # qu'aux historiques OHLCV, aux fondamentaux et aux autres intervalles
+            yfinance = FournisseurYFinance()
+            _fournisseur_defaut = StockageColonnes(yfinance, autres=CachePrix(yfinance))
+    return _fournisseur_defaut
+
+
+def set_fournisseur(fournisseur: FournisseurDonnees):
+    global _fournisseur_defaut
+    _fournisseur_defaut = fournisseur
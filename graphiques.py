@@ -0,0 +1,134 @@
+"""
+Graphiques de prix réduits à la largeur d'affichage et mis en cache.
+
+Une série de plusieurs décennies compte des milliers de points pour quelques centaines de
+pixels. On la réduit par LTTB (Largest-Triangle-Three-Buckets), qui garde les extrêmes et la
+forme de la courbe. Les figures sont des matplotlib.figure.Figure explicites, sans l'état
+global de pyplot. Elles ne s'accumulent donc pas d'un rendu à l'autre. Les séries réduites et
+les images PNG sont conservées dans un cache LRU borné. La clé est le ticker, la plage de
+dates et la dernière valeur, si bien qu'une nouvelle séance invalide l'entrée.
+"""
+import io
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from instrumentation import compter, chronometre
+
+LARGEUR_PIXELS = 800  # nombre de points gardés par défaut (≈ largeur du graphique en pixels)
+TAILLE_CACHE = 128
+
+
+def lttb(x, y, n_points: int) -> np.ndarray:
+    """
+    Indices des points retenus par Largest-Triangle-Three-Buckets. Le premier et le dernier point
+    sont gardés. Ailleurs, on garde dans chaque tranche le point qui forme le plus grand triangle
+    avec le point retenu précédent et la moyenne de la tranche suivante.
+    """
+    n = len(y)
+    if n_points >= n or n_points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # n_points - 2 tranches sur [1, n - 1[, puis le dernier point comme tranche finale
+    bornes = np.append(np.linspace(1, n - 1, n_points - 1).astype(np.int64), n)
+    indices = np.empty(n_points, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_points - 2):
+        debut, fin = bornes[i], bornes[i + 1]
+        suivant_debut, suivant_fin = bornes[i + 1], bornes[i + 2]
+        moyenne_x = x[suivant_debut:suivant_fin].mean()
+        moyenne_y = y[suivant_debut:suivant_fin].mean()
+        aires = np.abs((x[a] - moyenne_x) * (y[debut:fin] - y[a]) - (x[a] - x[debut:fin]) * (moyenne_y - y[a]))
+        a = debut + int(aires.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+class _CacheLRU:
+    def __init__(self, taille: int):
+        self.taille = taille
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def get(self, cle):
+        with self._verrou:
+            valeur = self._entrees.get(cle)
+            if valeur is not None:
+                self._entrees.move_to_end(cle)
+            compter("cache.graphiques.echecs" if valeur is None else "cache.graphiques.succes")
+            return valeur
+
+    def put(self, cle, valeur):
+        with self._verrou:
+            self._entrees[cle] = valeur
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille:
+                self._entrees.popitem(last=False)
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+
+_cache = _CacheLRU(TAILLE_CACHE)
+
+
+def _cle(nature, ticker, dates, valeurs, *options):
+    # La plage et la dernière valeur identifient les données : une séance ajoutée change la clé
+    if len(valeurs) == 0:
+        return (nature, ticker, 0) + options
+    return (nature, ticker, dates[0], dates[-1], len(valeurs), float(valeurs[-1])) + options
+
+
+def _en_serie(dates, valeurs, indices, nom):
+    return pd.Series(np.asarray(valeurs)[indices], index=pd.DatetimeIndex(np.asarray(dates)[indices], name="Date"), name=nom)
+
+
+@chronometre()
+def serie_reduite(ticker: str, dates, valeurs, n_points: int = LARGEUR_PIXELS) -> pd.Series:
+    """Clôtures réduites à `n_points` points par LTTB, mises en cache par (ticker, plage)."""
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+    cle = _cle("serie", ticker, dates, valeurs, n_points)
+    serie = _cache.get(cle)
+    if serie is None:
+        serie = _en_serie(dates, valeurs, lttb(dates.astype(np.int64), valeurs, n_points), "Close")
+        _cache.put(cle, serie)
+    return serie
+
+
+def figure_prix(serie: pd.Series, titre: str, etiquette: str = "Prix de clôture"):
+    """Courbe de prix sur une Figure explicite ; rien n'est enregistré dans pyplot."""
+    from matplotlib.figure import Figure  # uniquement pour l'affichage, pas au chargement du module
+    figure = Figure(figsize=(10, 5))
+    axe = figure.subplots()
+    axe.plot(serie.index, serie.to_numpy(), label=etiquette)
+    axe.set_title(titre)
+    axe.set_xlabel("Date")
+    axe.set_ylabel("Prix")
+    axe.grid(True)
+    axe.legend()
+    figure.tight_layout()
+    return figure
+
+
+@chronometre()
+def image_prix(ticker: str, dates, valeurs, titre: str = None, n_points: int = LARGEUR_PIXELS) -> bytes:
+    """Graphique PNG des clôtures réduites, mis en cache par (ticker, plage)."""
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+    titre = titre or f"Historique des prix pour {ticker.upper()}"
+    cle = _cle("image", ticker, dates, valeurs, titre, n_points)
+    image = _cache.get(cle)
+    if image is None:
+        figure = figure_prix(serie_reduite(ticker, dates, valeurs, n_points), titre)
+        tampon = io.BytesIO()
+        figure.savefig(tampon, format="png", dpi=80)
+        figure.clear()  # libère les artistes tout de suite, sans attendre le ramasse-miettes
+        image = tampon.getvalue()
+        _cache.put(cle, image)
+    return image
+
+
+def vider_cache_graphiques():
+    _cache.vider()
@@ -0,0 +1,136 @@
+"""
+Instrumentation des chemins critiques : durée de chaque appel mesuré, compteurs (succès et
+échecs de cache, appels réseau) et journalisation des appels lents, via le logger "portfolio".
+
+    with mesurer("Portefeuille.get_rendements"):
+        ...
+
+    @chronometre("Actifs.charger")
+    def charger(self): ...
+
+    compter("cache.prix.succes")
+
+Les mesures sont cumulées pour tout le processus (instantane(), tableau_durees()) ; un bloc
+`with rendu("performance"):` isole celles d'un rendu de page (derniers_rendus()).
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+import pandas as pd
+
+logger = logging.getLogger("portfolio")
+
+# Au-delà de ce seuil (en secondes), l'appel est journalisé en avertissement
+SEUIL_LENT = float(os.environ.get("PORTFOLIO_SEUIL_LENT", "1.0"))
+NOMBRE_RENDUS = 20
+
+_verrou = threading.Lock()
+_durees = {}      # nom -> [appels, total, max, erreurs]
+_compteurs = {}   # nom -> valeur
+_rendus = deque(maxlen=NOMBRE_RENDUS)
+# Mesures du rendu en cours ; variable de contexte pour suivre aussi les threads lancés avec
+# contextvars.copy_context() (chargement concurrent)
+_rendu_courant = contextvars.ContextVar("rendu_courant", default=None)
+
+
+def _enregistrer_duree(nom, duree, erreur):
+    with _verrou:
+        statistiques = _durees.setdefault(nom, [0, 0.0, 0.0, 0])
+        statistiques[0] += 1
+        statistiques[1] += duree
+        statistiques[2] = max(statistiques[2], duree)
+        statistiques[3] += erreur
+        courant = _rendu_courant.get()
+        if courant is not None:
+            courant["durees"][nom] = courant["durees"].get(nom, 0.0) + duree
+    if duree >= SEUIL_LENT:
+        logger.warning("Appel lent : %s (%.3f s)", nom, duree)
+
+
+@contextmanager
+def mesurer(nom: str):
+    debut = time.perf_counter()
+    erreur = False
+    try:
+        yield
+    except BaseException:
+        erreur = True
+        raise
+    finally:
+        _enregistrer_duree(nom, time.perf_counter() - debut, erreur)
+
+
+def chronometre(nom: str = None):
+    """Décorateur : mesure chaque appel de la fonction sous `nom` (son nom qualifié par défaut)."""
+    def decorateur(fonction):
+        nom_mesure = nom or fonction.__qualname__
+
+        @wraps(fonction)
+        def appel(*args, **kwargs):
+            with mesurer(nom_mesure):
+                return fonction(*args, **kwargs)
+        return appel
+    return decorateur
+
+
+def compter(nom: str, n: int = 1):
+    with _verrou:
+        _compteurs[nom] = _compteurs.get(nom, 0) + n
+        courant = _rendu_courant.get()
+        if courant is not None:
+            courant["compteurs"][nom] = courant["compteurs"].get(nom, 0) + n
+
+
+@contextmanager
+def rendu(nom: str):
+    """Isole les mesures d'un rendu de page ; le résumé est ajouté à derniers_rendus()."""
+    mesures = {"page": nom, "durees": {}, "compteurs": {}}
+    jeton = _rendu_courant.set(mesures)
+    debut = time.perf_counter()
+    try:
+        yield mesures
+    finally:
+        _rendu_courant.reset(jeton)
+        mesures["duree"] = time.perf_counter() - debut
+        with _verrou:
+            _rendus.append(mesures)
+        logger.debug("Rendu %s : %.3f s, %d appel(s) réseau", nom, mesures["duree"],
+                     mesures["compteurs"].get("reseau.appels", 0))
+
+
+def instantane() -> dict:
+    """Copie des mesures cumulées : {"durees": {nom: {...}}, "compteurs": {nom: valeur}}."""
+    with _verrou:
+        durees = {
+            nom: {"appels": appels, "total (s)": total, "moyenne (s)": total / appels, "max (s)": maximum, "erreurs": erreurs}
+            for nom, (appels, total, maximum, erreurs) in _durees.items()
+        }
+        return {"durees": durees, "compteurs": dict(_compteurs)}
+
+
+def tableau_durees() -> pd.DataFrame:
+    durees = instantane()["durees"]
+    return pd.DataFrame.from_dict(durees, orient="index").sort_values("total (s)", ascending=False) if durees else pd.DataFrame()
+
+
+def taux_succes_cache(prefixe: str = "cache.prix"):
+    compteurs = instantane()["compteurs"]
+    succes, echecs = compteurs.get(f"{prefixe}.succes", 0), compteurs.get(f"{prefixe}.echecs", 0)
+    return succes / (succes + echecs) if succes + echecs else None
+
+
+def derniers_rendus():
+    with _verrou:
+        return list(_rendus)
+
+
+def reinitialiser():
+    with _verrou:
+        _durees.clear()
+        _compteurs.clear()
+        _rendus.clear()
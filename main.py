@@ -3,26 +3,98 @@ from datetime import datetime, date
 from classe_actifs import Actifs
 from classe_index import Index
 from classe_portefeuille import Portefeuille
+from etat_portefeuille import JournalPortefeuille
+from analyse_multi_portefeuilles import analyser_portefeuilles
+from service_covariance import ServiceCovariance, figure_correlation
 import pandas as pd
 import pickle
 import os
+import logging
+import instrumentation
 
-# Fonctions de sauvegarde et chargement du portefeuille
-def save_portefeuille_to_file(portefeuille, filename="portefeuille.pkl"):
-    with open(filename, "wb") as f:
-        pickle.dump(portefeuille, f)
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s : %(message)s")
 
-def load_portefeuille_from_file(filename="portefeuille.pkl"):
-    if os.path.exists(filename):
-        with open(filename, "rb") as f:
-            return pickle.load(f)
-    return None
+FICHIER_ETAT = "portefeuille.jsonl"
+ANCIEN_FICHIER_PICKLE = "portefeuille.pkl"
+
+# Chargement du portefeuille : journal des positions, les opérations y sont ajoutées au fil de l'eau
+def load_portefeuille_from_file(filename=FICHIER_ETAT):
+    journal = JournalPortefeuille(filename)
+    port = journal.charger()
+    if port is None and os.path.exists(ANCIEN_FICHIER_PICKLE):
+        # Ancienne sauvegarde pickle : convertie une seule fois dans le nouveau format
+        with open(ANCIEN_FICHIER_PICKLE, "rb") as f:
+            port = pickle.load(f)
+        journal.creer(port)
+    return port
+
+def new_portefeuille(nom, filename=FICHIER_ETAT):
+    port = Portefeuille(nom)
+    JournalPortefeuille(filename).creer(port)
+    return port
+
+# Cache partagé entre sessions : objets Actifs / Index (données chargées à la demande puis
+# conservées en mémoire) et calculs du portefeuille, bornés en durée et en nombre d'entrées
+DUREE_CACHE = 900  # secondes
+TAILLE_CACHE = 256
+
+@st.cache_resource(ttl=DUREE_CACHE, max_entries=TAILLE_CACHE, show_spinner=False)
+def get_actifs(ticker):
+    return Actifs(ticker.upper())
+
+@st.cache_resource(ttl=DUREE_CACHE, max_entries=TAILLE_CACHE, show_spinner=False)
+def get_index(ticker):
+    return Index(ticker.upper())
+
+@st.cache_resource(ttl=DUREE_CACHE, max_entries=TAILLE_CACHE, show_spinner=False)
+def get_service_covariance(tickers, methode, fenetre, decroissance):
+    # Construit une fois par jeu de tickers ; les rendus suivants n'ajoutent que les nouvelles séances
+    return ServiceCovariance(list(tickers), methode=methode, fenetre=fenetre, decroissance=decroissance)
+
+def signature_portefeuille(portefeuille):
+    # Clé des calculs mis en cache : le contenu du portefeuille, pas l'objet
+    return (portefeuille.nom, tuple(portefeuille.positions.tickers), tuple(portefeuille.quantites.tolist()))
+
+@st.cache_data(ttl=DUREE_CACHE, max_entries=TAILLE_CACHE, show_spinner=False)
+def get_valeur_portefeuille(_portefeuille, signature):
+    return _portefeuille.get_valeur_historique()
+
+@st.cache_data(ttl=DUREE_CACHE, max_entries=TAILLE_CACHE, show_spinner=False)
+def get_ratio_sharpe(_portefeuille, signature):
+    return _portefeuille.ratio_sharpe()
+
+@st.cache_data(ttl=DUREE_CACHE, max_entries=TAILLE_CACHE, show_spinner=False)
+def get_rendements_ponderes(_portefeuille, signature):
+    # (TWR, MWR) depuis le premier achat, à partir de l'historique des transactions
+    try:
+        moteur = _portefeuille.moteur_rendements()
+        return moteur.twr(), moteur.mwr()
+    except Exception as e:
+        instrumentation.logger.error("Erreur dans le calcul des rendements pondérés : %s", e)
+        return None, None
+
+@st.cache_data(ttl=DUREE_CACHE, max_entries=TAILLE_CACHE, show_spinner=False)
+def get_risque_monte_carlo(_portefeuille, signature, methode, n_simulations):
+    # Graine fixe : le tableau ne change pas d'un rendu à l'autre
+    return _portefeuille.risque_monte_carlo(methode=methode, n_simulations=n_simulations, graine=0)
+
+@st.cache_data(ttl=DUREE_CACHE, max_entries=TAILLE_CACHE, show_spinner=False)
+def get_optimisation(_portefeuille, signature, poids_max):
+    return _portefeuille.optimiser(poids_max=poids_max)
+
+def invalider_cache_portefeuille():
+    # Appelé après chaque opération sur le portefeuille
+    get_valeur_portefeuille.clear()
+    get_ratio_sharpe.clear()
+    get_rendements_ponderes.clear()
+    get_risque_monte_carlo.clear()
+    get_optimisation.clear()
 
 # Initialisation du portefeuille dans la session
 if "portefeuille" not in st.session_state or not isinstance(st.session_state.portefeuille, Portefeuille):
     port = load_portefeuille_from_file()
     if port is None:
-        port = Portefeuille("Mon Portefeuille")
+        port = new_portefeuille("Mon Portefeuille")
     st.session_state.portefeuille = port
 
 def main():
@@ -37,17 +109,45 @@ def main():
         "5) Consulter un Index": "index",
         "6) Comparer rendements du portefeuille à un Index": "compare",
         "7) Metrics du portefeuille (ratio de Sharpe)": "metrics",
+        "8) Analyse de tous les portefeuilles": "multi",
+        "9) Corrélations du portefeuille": "correlation",
     }
 
     choix = st.sidebar.selectbox("Menu", list(menu.keys()))
+    debug = st.sidebar.checkbox("Panneau de debug")
+
+    with instrumentation.rendu(menu[choix]):
+        afficher_page(menu[choix])
+
+    if debug:
+        afficher_panneau_debug()
 
-    match menu[choix]:
+def afficher_panneau_debug():
+    # Mesures du dernier rendu puis cumuls depuis le démarrage du serveur
+    rendus = instrumentation.derniers_rendus()
+    mesures = instrumentation.instantane()
+    with st.sidebar.expander("Debug", expanded=True):
+        if rendus:
+            dernier = rendus[-1]
+            st.metric("Dernier rendu", f"{dernier['duree']:.3f} s")
+            st.metric("Appels réseau (dernier rendu)", dernier["compteurs"].get("reseau.appels", 0))
+            st.write(dernier["durees"])
+        taux = instrumentation.taux_succes_cache()
+        st.metric("Succès du cache de prix", "N/A" if taux is None else f"{taux:.0%}")
+        st.write(mesures["compteurs"])
+    st.subheader("Durées cumulées")
+    st.dataframe(instrumentation.tableau_durees())
+    if st.button("Réinitialiser les mesures"):
+        instrumentation.reinitialiser()
+
+def afficher_page(page):
+    match page:
 
         # 1 - Consultation d'une action
         case "action":
             ticker = st.text_input("Ticker de l'action")
             if ticker:
-                actifs = Actifs(ticker)
+                actifs = get_actifs(ticker)
                 st.subheader(f"Informations sur {ticker.upper()}")
                 st.write(actifs.afficher_infos())
                 actifs.afficher_graphique()
@@ -56,8 +156,8 @@ def main():
         case "create_port":
             nom = st.text_input("Nom du portefeuille")
             if st.button("Créer") and nom:
-                st.session_state.portefeuille = Portefeuille(nom)
-                save_portefeuille_to_file(st.session_state.portefeuille)
+                st.session_state.portefeuille = new_portefeuille(nom)
+                invalider_cache_portefeuille()
                 st.success(f"Portefeuille '{nom}' créé ✔️")
 
         # 3 - Ajouter / Retirer des actions
@@ -73,15 +173,14 @@ def main():
                 date_achat = st.date_input("Date d'achat", value=date.today())
 
             if st.button("Valider") and actifs_ticker and quantite:
-                actifs = Actifs(actifs_ticker)
                 if op == "Ajouter":
-                    port.ajouter_action(actifs, int(quantite), datetime.combine(date_achat, datetime.min.time()))
+                    port.ajouter_action(get_actifs(actifs_ticker), int(quantite), datetime.combine(date_achat, datetime.min.time()))
                     st.success("Actifs ajoutés au portefeuille ✅")
                 else:
-                    port.retirer_action(actifs_ticker, int(quantite))
+                    port.retirer_action(actifs_ticker.upper(), int(quantite))
                     st.success("Actifs retirés du portefeuille 🗑️")
 
-                save_portefeuille_to_file(port)
+                invalider_cache_portefeuille()
                 st.session_state.portefeuille = port
 
             
@@ -93,12 +192,14 @@ def main():
                 st.warning("Portefeuille vide.")
             else:
                 st.subheader("Performance du portefeuille")
+                rapport = port.prechauffer()
+                for ticker, erreur in rapport.echecs.items():
+                    st.warning(f"Données indisponibles pour {ticker} : {erreur}")
                 perf_df = port.afficher_performance()
                 st.dataframe(perf_df)
 
                 data = []
-                for action, quantite in zip(port.actifs, port.quantites):
-                    prix_achat = port.prix_achats.get(action.ticker, 0)
+                for action, quantite, prix_achat in zip(port.actifs, port.quantites.tolist(), port.positions.prix_achats.tolist()):
                     prix_courant = action.get_prix_actuel()
                     rendement = (prix_courant - prix_achat) / prix_achat if prix_achat else 0
                     data.append({
@@ -112,16 +213,26 @@ def main():
                 perf_df = pd.DataFrame(data)
                 st.dataframe(perf_df)
 
+                if port.actifs:
+                    try:
+                        st.line_chart(get_valeur_portefeuille(port, signature_portefeuille(port)))
+                    except ValueError as e:
+                        st.warning(str(e))
+
         # 5 - Consulter un Index
         case "index":
             ticker_index = st.text_input("Ticker de l'Index")
             if ticker_index:
-                index = Index(ticker_index)
+                index = get_index(ticker_index)
+                if st.button("Rafraîchir"):
+                    nouvelles = index.rafraichir()
+                    st.info(f"{nouvelles} séance(s) ajoutée(s) ou révisée(s)")
                 st.subheader(f"Informations sur l'Index {ticker_index.upper()}")
                 st.write(index.afficher_infos())
-                fig = index.afficher_graphique()
-                if fig:
-                    st.pyplot(fig)
+                st.dataframe(index.get_performances_fenetres())
+                image = index.image_graphique()
+                if image:
+                    st.image(image)
 
         # 6 - Comparer au marché
         case "compare":
@@ -129,11 +240,16 @@ def main():
             if port is None:
                 st.warning("Créez d'abord un portefeuille.")
             else:
-                ticker_index = st.text_input("Ticker de l'Index de référence")
-                if ticker_index and st.button("Comparer"):
-                    index = Index(ticker_index)
-                    compar_df = port.comparer_a_reference(index)
-                    st.dataframe(compar_df)
+                saisie = st.text_input("Ticker(s) des Index de référence, séparés par des virgules")
+                tickers_index = [t.strip().upper() for t in saisie.split(",") if t.strip()]
+                if tickers_index and st.button("Comparer"):
+                    compar_df = port.comparer_a_reference(tickers_index)
+                    if compar_df is None:
+                        st.error("Comparaison impossible (données insuffisantes).")
+                    else:
+                        st.dataframe(compar_df.set_index("Ticker"))
+                        st.subheader("Performance relative glissante (3 mois)")
+                        st.line_chart(port.performance_relative_glissante(tickers_index))
 
         # 7 - Ratio de Sharpe
         case "metrics":
@@ -141,12 +257,69 @@ def main():
             if port is None:
                 st.warning("Créez d'abord un portefeuille.")
             else:
-                ratio = port.ratio_sharpe()
+                ratio = get_ratio_sharpe(port, signature_portefeuille(port))
                 if ratio is not None : 
                     st.metric("Ratio de Sharpe", f"{ratio:.4f}")
                 else:
                     st.metric("Ratio de Sharpe" , "N/A")
-               
+                twr, mwr = get_rendements_ponderes(port, signature_portefeuille(port))
+                col_twr, col_mwr = st.columns(2)
+                col_twr.metric("Rendement pondéré par le temps (TWR)", "N/A" if twr is None else f"{twr:.2%}")
+                col_mwr.metric("Rendement pondéré par les capitaux (TRI annuel)", "N/A" if mwr is None else f"{mwr:.2%}")
+
+                st.subheader("VaR / CVaR (Monte Carlo)")
+                methode = st.selectbox("Méthode de simulation", ["covariance", "bootstrap"])
+                n_simulations = st.select_slider("Nombre de trajectoires", [10_000, 50_000, 100_000, 200_000], 100_000)
+                if st.button("Simuler"):
+                    try:
+                        st.dataframe(get_risque_monte_carlo(port, signature_portefeuille(port), methode, n_simulations))
+                    except Exception as e:
+                        st.error(f"Simulation impossible : {e}")
+
+                st.subheader("Optimisation moyenne-variance")
+                n_actifs = max(len(port.actifs), 1)
+                poids_max = st.slider("Poids maximal par actif", min(1.0, round(1 / n_actifs + 0.005, 2)), 1.0, 1.0, 0.01)
+                if st.button("Optimiser"):
+                    try:
+                        resultat = get_optimisation(port, signature_portefeuille(port), poids_max)
+                        st.dataframe(resultat["statistiques"])
+                        st.dataframe(resultat["poids"].style.format("{:.2%}"))
+                        st.line_chart(resultat["frontiere"].set_index("Volatilité")["Rendement"])
+                    except Exception as e:
+                        st.error(f"Optimisation impossible : {e}")
+
+        # 8 - Tous les portefeuilles de la base
+        case "multi":
+            saisie = st.text_input("Ticker(s) des Index de référence, séparés par des virgules", "^GSPC")
+            references = [t.strip().upper() for t in saisie.split(",") if t.strip()]
+            if st.button("Analyser"):
+                with st.spinner("Analyse des portefeuilles..."):
+                    st.dataframe(analyser_portefeuilles(references=references))
+
+        # 9 - Corrélations entre actifs et index
+        case "correlation":
+            port = st.session_state.portefeuille
+            saisie = st.text_input("Ticker(s) des Index à inclure, séparés par des virgules", "^GSPC")
+            tickers = [actif.ticker for actif in port.actifs] if port is not None else []
+            tickers += [t.strip().upper() for t in saisie.split(",") if t.strip()]
+            methode = st.selectbox("Estimation", ["cumulee", "glissante", "exponentielle"],
+                                   format_func={"cumulee": "Toute la période (1 an)", "glissante": "Fenêtre glissante",
+                                                "exponentielle": "Pondération exponentielle"}.get)
+            fenetre = st.slider("Fenêtre (séances)", 20, 252, 63) if methode == "glissante" else 63
+            decroissance = st.slider("Facteur de décroissance", 0.80, 0.99, 0.94, 0.01) if methode == "exponentielle" else 0.94
+            if len(tickers) < 2:
+                st.warning("Il faut au moins deux tickers (actifs du portefeuille ou index).")
+            else:
+                try:
+                    service = get_service_covariance(tuple(dict.fromkeys(tickers)), methode, fenetre, decroissance)
+                    service.actualiser()
+                    correlation = service.correlation()
+                    st.pyplot(figure_correlation(correlation))
+                    st.dataframe(correlation.style.format("{:.2f}"))
+                    st.subheader("Volatilités annualisées")
+                    st.dataframe(service.volatilites(annualiser=True))
+                except Exception as e:
+                    st.error(f"Calcul des corrélations impossible : {e}")
 
 if __name__ == "__main__":
     main()
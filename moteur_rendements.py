@@ -0,0 +1,152 @@
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from fournisseur_donnees import get_fournisseur
+from instrumentation import logger
+
+JOURS_PAR_AN = 365.0
+
+
+class MoteurRendements:
+    """
+    Rejoue l'historique des transactions (quantité signée : achat > 0, vente < 0) sur les clôtures
+    quotidiennes pour obtenir les positions détenues chaque jour, la valeur liquidative,
+    le rendement pondéré par le temps (TWR) et le rendement pondéré par les capitaux (MWR / TRI).
+
+    Les positions forment une matrice dates x tickers obtenue par sommes cumulées des quantités
+    échangées, sans boucle sur les jours ni sur les transactions. Une transaction passée un jour
+    sans cotation prend effet à la séance suivante, ou à la dernière séance disponible si elle est
+    postérieure à la dernière clôture ; sans prix renseigné, elle est valorisée à la clôture de
+    cette séance.
+    """
+
+    def __init__(self, transactions: pd.DataFrame, clotures: pd.DataFrame):
+        transactions = transactions.dropna(subset=["ticker", "quantite", "date"])
+        clotures = clotures.sort_index().ffill().bfill()
+        self.dates = pd.DatetimeIndex(clotures.index)
+        self.tickers = list(clotures.columns)
+        prix = clotures.to_numpy(dtype=np.float64)
+
+        colonnes = {ticker: j for j, ticker in enumerate(self.tickers)}
+        connus = transactions["ticker"].isin(colonnes).to_numpy()
+        if not connus.all():
+            for ticker in transactions.loc[~connus, "ticker"].unique():
+                logger.warning("Erreur récupération historique prix pour %s : transactions ignorées", ticker)
+        transactions = transactions[connus]
+
+        lignes = np.searchsorted(self.dates.to_numpy(), pd.DatetimeIndex(transactions["date"]).normalize().to_numpy(), side="left")
+        # Une transaction postérieure à la dernière clôture (achat du jour avant la clôture) compte à la dernière séance
+        lignes = np.minimum(lignes, len(self.dates) - 1)
+        cols = transactions["ticker"].map(colonnes).to_numpy()
+        quantites = transactions["quantite"].to_numpy(dtype=np.float64)
+        prix_transactions = transactions["prix"].to_numpy(dtype=np.float64)
+        prix_transactions = np.where(np.isnan(prix_transactions), prix[lignes, cols], prix_transactions)
+
+        # Quantités échangées par (jour, ticker), puis positions détenues par somme cumulée
+        echanges = np.zeros(prix.shape)
+        np.add.at(echanges, (lignes, cols), quantites)
+        self.quantites = np.cumsum(echanges, axis=0)
+
+        # Apports nets du jour (achats - ventes), en montant
+        self.flux = np.zeros(len(self.dates))
+        np.add.at(self.flux, lignes, np.nan_to_num(quantites * prix_transactions))
+
+        self.valeurs = np.einsum("ij,ij->i", self.quantites, np.nan_to_num(prix))
+
+    @classmethod
+    def depuis_transactions(cls, transactions: pd.DataFrame, fin: date = None) -> "MoteurRendements":
+        """Télécharge en une requête groupée les clôtures de tous les tickers depuis la première transaction."""
+        if transactions.empty:
+            raise ValueError("Aucune transaction à rejouer")
+        debut = pd.Timestamp(transactions["date"].min()).date()
+        fin = fin or date.today() + timedelta(days=1)
+        tickers = list(dict.fromkeys(transactions["ticker"]))
+        clotures = get_fournisseur().get_clotures(tickers, debut, fin)
+        clotures = clotures.loc[:, clotures.notna().any(axis=0)]
+        if clotures.empty:
+            raise ValueError("Pas de données historiques disponibles")
+        return cls(transactions, clotures)
+
+    def positions(self) -> pd.DataFrame:
+        return pd.DataFrame(self.quantites, index=self.dates, columns=self.tickers)
+
+    def valeur_liquidative(self) -> pd.Series:
+        return pd.Series(self.valeurs, index=self.dates, name="Valeur liquidative")
+
+    def rendements_twr(self) -> pd.Series:
+        """
+        Rendements quotidiens neutralisés des apports et retraits :
+        r_t = (V_t - F_t) / V_{t-1} - 1, nul tant que le portefeuille est vide.
+        """
+        precedentes = np.concatenate([[0.0], self.valeurs[:-1]])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = np.where(precedentes > 0, (self.valeurs - self.flux) / precedentes - 1, 0.0)
+        return pd.Series(r, index=self.dates, name="TWR")
+
+    def _bornes(self, debut=None, fin=None):
+        i = 0 if debut is None else int(self.dates.searchsorted(pd.Timestamp(debut), side="left"))
+        j = len(self.dates) if fin is None else int(self.dates.searchsorted(pd.Timestamp(fin), side="right"))
+        if i >= j:
+            raise ValueError("Aucune séance dans la période demandée")
+        return i, j
+
+    def twr(self, debut=None, fin=None) -> float:
+        """Rendement pondéré par le temps sur [debut, fin], chaîné jour par jour."""
+        i, j = self._bornes(debut, fin)
+        return float(np.prod(1 + self.rendements_twr().to_numpy()[i + 1:j]) - 1) if i + 1 < j else 0.0
+
+    def mwr(self, debut=None, fin=None):
+        """
+        Rendement pondéré par les capitaux (TRI annualisé, convention XIRR) sur [debut, fin] :
+        valeur de départ et apports comptés comme décaissements, valeur finale comme encaissement.
+        None si le TRI n'est pas défini (pas de flux de signes opposés).
+        """
+        i, j = self._bornes(debut, fin)
+        flux = -self.flux[i:j].copy()
+        if i > 0:
+            # La valeur de la veille est réinvestie au premier jour de la période
+            flux[0] -= self.valeurs[i - 1]
+        flux[-1] += self.valeurs[j - 1]
+        jours = (self.dates[i:j] - self.dates[i]).days.to_numpy()
+        utiles = flux != 0
+        return tri(flux[utiles], jours[utiles] / JOURS_PAR_AN)
+
+
+def tri(flux: np.ndarray, annees: np.ndarray, iterations: int = 100, tolerance: float = 1e-10):
+    """Taux r tel que sum(flux / (1 + r) ** annees) = 0 : Newton, puis dichotomie en secours."""
+    flux = np.asarray(flux, dtype=np.float64)
+    annees = np.asarray(annees, dtype=np.float64)
+    if len(flux) < 2 or not (flux > 0).any() or not (flux < 0).any():
+        return None
+
+    def valeur_actuelle(taux):
+        return float(np.sum(flux * (1 + taux) ** -annees))
+
+    taux = 0.1
+    for _ in range(iterations):
+        actualisation = (1 + taux) ** -annees
+        va = float(np.sum(flux * actualisation))
+        derivee = float(np.sum(-annees * flux * actualisation / (1 + taux)))
+        if derivee == 0 or not np.isfinite(va):
+            break
+        suivant = taux - va / derivee
+        if suivant <= -1 or not np.isfinite(suivant):
+            break
+        if abs(suivant - taux) < tolerance:
+            return float(suivant)
+        taux = suivant
+
+    bas, haut = -0.9999, 1.0
+    while valeur_actuelle(bas) * valeur_actuelle(haut) > 0 and haut < 1e6:
+        haut *= 10
+    if valeur_actuelle(bas) * valeur_actuelle(haut) > 0:
+        return None
+    for _ in range(200):
+        milieu = (bas + haut) / 2
+        if valeur_actuelle(bas) * valeur_actuelle(milieu) <= 0:
+            haut = milieu
+        else:
+            bas = milieu
+        if haut - bas < tolerance:
+            break
+    return float((bas + haut) / 2)
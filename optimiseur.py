@@ -0,0 +1,223 @@
+"""
+Optimisation moyenne-variance sans solveur externe.
+
+- Rendements espérés : moyenne historique annualisée.
+- Covariance : estimateur de Ledoit-Wolf (rétrécissement vers une identité mise à l'échelle),
+  bien conditionné même avec plus d'actifs que de séances.
+- Contraintes : poids positifs, somme égale à 1 et plafond par actif (simplexe plafonné).
+
+Chaque point de la frontière minimise wᵀΣw - γ μᵀw par gradient projeté accéléré (FISTA), en partant
+de la solution du point précédent : d'un γ au suivant la solution bouge peu et quelques dizaines
+d'itérations suffisent. Le portefeuille de Sharpe maximal est cherché le long de cette frontière,
+puis affiné par section dorée sur γ.
+"""
+import numpy as np
+import pandas as pd
+import analytique
+
+
+def covariance_ledoit_wolf(rendements):
+    """(covariance rétrécie, intensité de rétrécissement) d'une matrice de rendements T x N."""
+    x = np.asarray(rendements, dtype=np.float64)
+    t, n = x.shape
+    x = x - x.mean(axis=0)
+    echantillon = x.T @ x / t
+    mu = np.trace(echantillon) / n
+    cible = mu * np.eye(n)
+    d2 = np.sum((echantillon - cible) ** 2) / n
+    # Variance de l'estimateur empirique, bornée par d2
+    b2 = np.sum((x ** 2).T @ (x ** 2) / t - echantillon ** 2) / (n * t)
+    b2 = min(b2, d2)
+    intensite = b2 / d2 if d2 > 0 else 1.0
+    return intensite * cible + (1 - intensite) * echantillon, float(intensite)
+
+
+def estimer_parametres(rendements, periodes=analytique.JOURS_BOURSE):
+    """Rendements espérés et covariance annualisés à partir de rendements quotidiens (T x N)."""
+    rendements = np.asarray(rendements, dtype=np.float64)
+    rendements = rendements[~np.isnan(rendements).any(axis=1)]
+    if len(rendements) < 2:
+        raise ValueError("Pas assez de séances pour estimer la covariance")
+    covariance, _ = covariance_ledoit_wolf(rendements)
+    return rendements.mean(axis=0) * periodes, covariance * periodes
+
+
+def projeter_simplexe(v, poids_max=1.0):
+    """
+    Projection euclidienne sur {w : sum(w) = 1, 0 <= w <= poids_max} : w = clip(v - τ, 0, poids_max).
+    La somme est linéaire par morceaux en τ, de points de rupture v et v - poids_max ; on la calcule
+    en tous ces points par sommes cumulées après un seul tri, puis on interpole (O(n log n)).
+    """
+    v = np.asarray(v, dtype=np.float64)
+    n = len(v)
+    ruptures = np.concatenate([v - poids_max, v])
+    ordre = np.argsort(ruptures, kind="stable")
+    ruptures = ruptures[ordre]
+    # Un actif devient "actif" (entre 0 et le plafond) en v - poids_max et s'annule en v
+    variations = np.where(ordre < n, 1, -1)
+    actifs = np.cumsum(variations)
+    sommes = n * poids_max - np.concatenate([[0.0], np.cumsum(actifs[:-1] * np.diff(ruptures))])
+    k = int(np.searchsorted(-sommes, -1.0, side="left"))
+    if k == 0:
+        tau = ruptures[0]
+    elif k >= len(ruptures):
+        tau = ruptures[-1]
+    else:
+        # Entre les ruptures k-1 et k, la somme décroît avec une pente égale au nombre d'actifs
+        tau = ruptures[k - 1] + (sommes[k - 1] - 1.0) / max(actifs[k - 1], 1)
+    return np.clip(v - tau, 0.0, poids_max)
+
+
+def portefeuille_rendement_max(rendements_esperes, poids_max=1.0):
+    """Coin du simplexe plafonné de rendement maximal : on remplit les actifs par rendement décroissant."""
+    ordre = np.argsort(-np.asarray(rendements_esperes), kind="stable")
+    poids = np.zeros(len(ordre))
+    reste = 1.0
+    for i in ordre:
+        poids[i] = min(poids_max, reste)
+        reste -= poids[i]
+        if reste <= 1e-15:
+            break
+    return poids
+
+
+def _plus_grande_valeur_propre(matrice, iterations=100):
+    v = np.ones(len(matrice)) / np.sqrt(len(matrice))
+    valeur = 0.0
+    for _ in range(iterations):
+        w = matrice @ v
+        nouvelle = float(np.linalg.norm(w))
+        if nouvelle == 0:
+            return 0.0
+        v = w / nouvelle
+        if abs(nouvelle - valeur) < 1e-12 * nouvelle:
+            break
+        valeur = nouvelle
+    return nouvelle
+
+
+class OptimiseurMoyenneVariance:
+    def __init__(self, rendements_esperes, covariance, poids_max=1.0, tickers=None,
+                 tolerance=1e-9, iterations_max=10_000):
+        self.mu = np.asarray(rendements_esperes, dtype=np.float64)
+        self.covariance = np.asarray(covariance, dtype=np.float64)
+        n = len(self.mu)
+        if poids_max * n < 1 - 1e-12:
+            raise ValueError(f"Plafond {poids_max:g} impossible à respecter avec {n} actifs")
+        self.poids_max = poids_max
+        self.tickers = list(tickers) if tickers is not None else [str(i) for i in range(n)]
+        self.tolerance = tolerance
+        self.iterations_max = iterations_max
+        # Pas du gradient : 1 / constante de Lipschitz de 2Σ
+        self._pas = 1.0 / max(2 * _plus_grande_valeur_propre(self.covariance), 1e-18)
+        self.iterations = 0
+
+    @classmethod
+    def depuis_rendements(cls, rendements: pd.DataFrame, poids_max=1.0, **options):
+        mu, covariance = estimer_parametres(rendements.to_numpy())
+        return cls(mu, covariance, poids_max, tickers=rendements.columns, **options)
+
+    def resoudre(self, gamma, depart=None):
+        """Minimise wᵀΣw - γ μᵀw sur le simplexe plafonné (FISTA avec redémarrage)."""
+        w = projeter_simplexe(np.full(len(self.mu), 1 / len(self.mu)) if depart is None else depart, self.poids_max)
+        y, t = w.copy(), 1.0
+        for iteration in range(1, self.iterations_max + 1):
+            gradient = 2 * self.covariance @ y - gamma * self.mu
+            suivant = projeter_simplexe(y - self._pas * gradient, self.poids_max)
+            if np.max(np.abs(suivant - w)) < self.tolerance:
+                w = suivant
+                break
+            t_suivant = (1 + np.sqrt(1 + 4 * t * t)) / 2
+            # Redémarrage si le pas accéléré remonte l'objectif
+            if np.dot(y - suivant, suivant - w) > 0:
+                y, t_suivant = suivant.copy(), 1.0
+            else:
+                y = suivant + (t - 1) / t_suivant * (suivant - w)
+            w, t = suivant, t_suivant
+        self.iterations += iteration
+        return w
+
+    def statistiques(self, poids, taux_sans_risque=0.0):
+        rendement = float(self.mu @ poids)
+        volatilite = float(np.sqrt(max(poids @ self.covariance @ poids, 0.0)))
+        sharpe = (rendement - taux_sans_risque) / volatilite if volatilite > 0 else np.nan
+        return rendement, volatilite, sharpe
+
+    def _gammas(self, n_points):
+        # Plus petit gamma donnant le portefeuille de rendement maximal (au-delà la frontière ne bouge
+        # plus) : doublements puis dichotomie ; les points sont répartis géométriquement en dessous
+        rendement_max = float(self.mu @ portefeuille_rendement_max(self.mu, self.poids_max))
+        tolerance = max(abs(rendement_max), 1e-12) * 1e-6
+
+        def atteint(gamma, depart):
+            poids = self.resoudre(gamma, depart)
+            return float(self.mu @ poids) >= rendement_max - tolerance, poids
+
+        haut = _plus_grande_valeur_propre(self.covariance) / max(float(np.ptp(self.mu)), 1e-12)
+        ok, poids = atteint(haut, None)
+        for _ in range(60):
+            if ok:
+                break
+            haut *= 2
+            ok, poids = atteint(haut, poids)
+        bas = haut / 2
+        for _ in range(10):
+            milieu = (bas + haut) / 2
+            ok, poids_milieu = atteint(milieu, poids)
+            if ok:
+                haut = milieu
+            else:
+                bas = milieu
+        return np.concatenate([[0.0], np.geomspace(haut * 1e-3, haut, max(n_points - 1, 1))])
+
+    def min_variance(self):
+        return pd.Series(self.resoudre(0.0), index=self.tickers, name="Min variance")
+
+    def frontiere(self, n_points=50, taux_sans_risque=0.0) -> pd.DataFrame:
+        """Points de la frontière efficiente (rendement, volatilité, Sharpe, puis un poids par ticker)."""
+        lignes, poids = [], None
+        for gamma in self._gammas(n_points):
+            poids = self.resoudre(gamma, depart=poids)
+            rendement, volatilite, sharpe = self.statistiques(poids, taux_sans_risque)
+            lignes.append([gamma, rendement, volatilite, sharpe] + poids.tolist())
+        frontiere = pd.DataFrame(lignes, columns=["Gamma", "Rendement", "Volatilité", "Sharpe"] + self.tickers)
+        # Les extrémités peuvent se répéter une fois un coin du simplexe atteint
+        doublons = frontiere[self.tickers].round(8).duplicated()
+        return frontiere[~doublons].reset_index(drop=True)
+
+    def max_sharpe(self, taux_sans_risque=0.0, frontiere: pd.DataFrame = None, iterations=40):
+        if frontiere is None:
+            frontiere = self.frontiere(taux_sans_risque=taux_sans_risque)
+        meilleur = int(frontiere["Sharpe"].fillna(-np.inf).to_numpy().argmax())
+        gammas = frontiere["Gamma"].to_numpy()
+        bas, haut = gammas[max(meilleur - 1, 0)], gammas[min(meilleur + 1, len(gammas) - 1)]
+        poids = frontiere.loc[meilleur, self.tickers].to_numpy(dtype=np.float64)
+        sharpe_max = frontiere.loc[meilleur, "Sharpe"]
+
+        # Section dorée sur gamma entre les deux voisins du meilleur point. Sur un palier (coin du
+        # simplexe, même Sharpe des deux côtés) on se rapproche du meilleur point de la frontière.
+        nombre_or = (np.sqrt(5) - 1) / 2
+        gamma_frontiere = gammas[meilleur]
+
+        def evaluer(gamma, depart):
+            w = self.resoudre(gamma, depart)
+            return w, self.statistiques(w, taux_sans_risque)[2]
+
+        g1, g2 = haut - nombre_or * (haut - bas), bas + nombre_or * (haut - bas)
+        w1, s1 = evaluer(g1, poids)
+        w2, s2 = evaluer(g2, w1)
+        for _ in range(iterations):
+            for w, s in ((w1, s1), (w2, s2)):
+                if s > sharpe_max:
+                    poids, sharpe_max = w, s
+            if haut - bas < 1e-8 * max(haut, 1e-12):
+                break
+            if s1 > s2 or (s1 == s2 and gamma_frontiere < g2):
+                haut, g2, w2, s2 = g2, g1, w1, s1
+                g1 = haut - nombre_or * (haut - bas)
+                w1, s1 = evaluer(g1, w2)
+            else:
+                bas, g1, w1, s1 = g1, g2, w2, s2
+                g2 = bas + nombre_or * (haut - bas)
+                w2, s2 = evaluer(g2, w1)
+        return pd.Series(poids, index=self.tickers, name="Max Sharpe")
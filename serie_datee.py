@@ -0,0 +1,238 @@
+import threading
+from datetime import date, timedelta
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from fournisseur_donnees import FournisseurDonnees, get_fournisseur
+import analytique
+from instrumentation import chronometre, compter
+
+# Écart admis entre le début demandé et la première séance connue (week-end prolongé, jours fériés)
+TOLERANCE_DEBUT = 7
+
+
+class SerieDatee:
+    """Valeurs indexées par des dates triées ; les recherches "à date" se font par dichotomie
+    et renvoient la dernière valeur connue à cette date (week-ends et jours fériés compris)."""
+
+    def __init__(self, dates, valeurs):
+        self.dates = np.asarray(dates, dtype="datetime64[ns]")
+        self.valeurs = np.ascontiguousarray(valeurs, dtype=np.float64)
+        # Structures des requêtes par fenêtre, construites à la première requête
+        self._prefixes = None
+        self._arbre = None
+
+    @classmethod
+    def depuis_serie(cls, serie: pd.Series) -> "SerieDatee":
+        serie = serie.dropna().sort_index()
+        return cls(serie.index.to_numpy(), serie.to_numpy())
+
+    def __len__(self):
+        return len(self.dates)
+
+    def position_au(self, date) -> int:
+        """Indice de la dernière date inférieure ou égale à `date`, -1 s'il n'y en a pas."""
+        return int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(date), "ns"), side="right")) - 1
+
+    def valeur_au(self, date):
+        position = self.position_au(date)
+        if position < 0:
+            return None
+        return float(self.valeurs[position])
+
+    def valeurs_au(self, dates) -> np.ndarray:
+        """Version vectorisée de valeur_au (NaN avant la première date)."""
+        dates = np.asarray(pd.DatetimeIndex(dates), dtype="datetime64[ns]")
+        positions = np.searchsorted(self.dates, dates, side="right") - 1
+        resultat = np.full(len(dates), np.nan)
+        trouve = positions >= 0
+        resultat[trouve] = self.valeurs[positions[trouve]]
+        return resultat
+
+    # Requêtes sur une fenêtre quelconque [debut, fin] : dichotomie sur les dates, puis sommes
+    # préfixes (volatilité) et arbre de segments (drawdown), soit O(log n) par requête.
+
+    def fenetre(self, debut=None, fin=None):
+        """
+        Positions (i, j) de la première séance >= debut et de la dernière <= fin, ou None. Une
+        fenêtre qui commence plus de TOLERANCE_DEBUT avant la première date connue n'est pas
+        couverte par l'historique : None plutôt que la fenêtre tronquée.
+        """
+        if debut is not None and len(self):
+            if np.datetime64(pd.Timestamp(debut), "ns") < self.dates[0] - np.timedelta64(TOLERANCE_DEBUT, "D"):
+                return None
+        i = 0 if debut is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(debut), "ns"), side="left"))
+        j = len(self) - 1 if fin is None else self.position_au(fin)
+        if i > j or j < 0:
+            return None
+        return i, j
+
+    def _sommes_prefixes(self):
+        if self._prefixes is None:
+            r = analytique.rendements(self.valeurs)
+            self._prefixes = (np.concatenate([[0.0], np.cumsum(r)]), np.concatenate([[0.0], np.cumsum(r * r)]))
+        return self._prefixes
+
+    def _arbre_drawdown(self):
+        if self._arbre is None:
+            self._arbre = _ArbreDrawdown(self.valeurs)
+        return self._arbre
+
+    def rendement_entre(self, debut=None, fin=None):
+        bornes = self.fenetre(debut, fin)
+        if bornes is None or self.valeurs[bornes[0]] == 0:
+            return None
+        return float(self.valeurs[bornes[1]] / self.valeurs[bornes[0]] - 1)
+
+    def volatilite_entre(self, debut=None, fin=None, annualiser: bool = False):
+        bornes = self.fenetre(debut, fin)
+        if bornes is None:
+            return None
+        # Rendements des séances i+1 à j
+        n = bornes[1] - bornes[0]
+        if n < 2:
+            return 0.0
+        somme, somme_carres = self._sommes_prefixes()
+        s = somme[bornes[1]] - somme[bornes[0]]
+        s2 = somme_carres[bornes[1]] - somme_carres[bornes[0]]
+        vol = float(np.sqrt(max((s2 - s * s / n) / (n - 1), 0.0)))
+        return vol * float(np.sqrt(analytique.JOURS_BOURSE)) if annualiser else vol
+
+    def drawdown_entre(self, debut=None, fin=None):
+        bornes = self.fenetre(debut, fin)
+        if bornes is None:
+            return None
+        return self._arbre_drawdown().requete(bornes[0], bornes[1])
+
+    def performances_fenetres(self, date_ref=None) -> Dict[str, dict]:
+        """Rendement, volatilité annualisée et drawdown maximal sur les fenêtres usuelles."""
+        if len(self) == 0:
+            return {}
+        date_ref = pd.Timestamp(self.dates[-1] if date_ref is None else date_ref)
+        resultat = {}
+        for nom, debut in _debuts_fenetres(date_ref).items():
+            resultat[nom] = {
+                "Rendement": self.rendement_entre(debut, date_ref),
+                "Volatilité": self.volatilite_entre(debut, date_ref, annualiser=True),
+                "Maximum Drawdown": self.drawdown_entre(debut, date_ref),
+            }
+        return resultat
+
+
+def _debuts_fenetres(date_ref: pd.Timestamp):
+    return {
+        "1M": date_ref - pd.DateOffset(months=1),
+        "3M": date_ref - pd.DateOffset(months=3),
+        "YTD": pd.Timestamp(date_ref.year, 1, 1),
+        "1Y": date_ref - pd.DateOffset(years=1),
+        "3Y": date_ref - pd.DateOffset(years=3),
+        "5Y": date_ref - pd.DateOffset(years=5),
+    }
+
+
+class _ArbreDrawdown:
+    """Arbre de segments sur les prix : chaque nœud garde (plus haut, plus bas, drawdown maximal)
+    de son intervalle, ce qui permet d'obtenir le drawdown de n'importe quelle fenêtre en O(log n)."""
+
+    def __init__(self, prix):
+        n = len(prix)
+        self.taille = 1
+        while self.taille < max(n, 1):
+            self.taille *= 2
+        self.hauts = np.full(2 * self.taille, -np.inf)
+        self.bas = np.full(2 * self.taille, np.inf)
+        self.drawdowns = np.zeros(2 * self.taille)
+        self.hauts[self.taille:self.taille + n] = prix
+        self.bas[self.taille:self.taille + n] = prix
+        # Construction niveau par niveau, vectorisée
+        debut = self.taille
+        while debut > 1:
+            parents = np.arange(debut // 2, debut)
+            gauche, droite = 2 * parents, 2 * parents + 1
+            self.hauts[parents] = np.maximum(self.hauts[gauche], self.hauts[droite])
+            self.bas[parents] = np.minimum(self.bas[gauche], self.bas[droite])
+            self.drawdowns[parents] = np.maximum(
+                np.maximum(self.drawdowns[gauche], self.drawdowns[droite]),
+                _baisse(self.hauts[gauche], self.bas[droite]),
+            )
+            debut //= 2
+
+    def requete(self, i, j):
+        # Parcours de bas en haut : nœuds de gauche dans l'ordre, nœuds de droite à l'envers
+        gauche, droite = [], []
+        i += self.taille
+        j += self.taille + 1
+        while i < j:
+            if i & 1:
+                gauche.append(i)
+                i += 1
+            if j & 1:
+                j -= 1
+                droite.append(j)
+            i //= 2
+            j //= 2
+        haut, drawdown = -np.inf, 0.0
+        for noeud in gauche + droite[::-1]:
+            drawdown = max(drawdown, self.drawdowns[noeud], float(_baisse(haut, self.bas[noeud])))
+            haut = max(haut, self.hauts[noeud])
+        return float(drawdown)
+
+
+def _baisse(hauts, bas):
+    # 1 - bas / haut, nul pour les nœuds vides ou un plus haut nul
+    hauts, bas = np.asarray(hauts, dtype=np.float64), np.asarray(bas, dtype=np.float64)
+    valide = np.isfinite(hauts) & np.isfinite(bas) & (hauts > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(valide, 1.0 - bas / np.where(valide, hauts, 1.0), 0.0)
+
+
+# Clôtures quotidiennes partagées : (fournisseur, ticker) -> (début couvert, jour de mise à jour, série)
+_clotures = {}
+_verrou = threading.Lock()
+
+
+def _a_jour(entree, debut, aujourdhui):
+    return entree is not None and entree[0] <= debut and entree[1] >= aujourdhui
+
+
+@chronometre()
+def series_clotures(tickers: List[str], debut, fournisseur: FournisseurDonnees = None) -> Dict[str, SerieDatee]:
+    """
+    Séries de clôtures couvrant au moins [debut, aujourd'hui] pour chaque ticker, lues auprès de
+    `fournisseur` (par défaut le fournisseur partagé). Les séries déjà en mémoire sont réutilisées ;
+    les autres sont chargées ensemble en une seule requête groupée, depuis le 1er janvier de
+    l'année demandée. Le verrou n'est pas tenu pendant la requête : des chargements concurrents
+    ne s'attendent pas, au prix d'une éventuelle requête en double.
+    """
+    fournisseur = fournisseur or get_fournisseur()
+    debut = pd.Timestamp(debut).date()
+    aujourdhui = date.today()
+    tickers = [t.upper() for t in tickers]
+    with _verrou:
+        series = {t: _clotures.get((fournisseur, t)) for t in dict.fromkeys(tickers)}
+    a_charger = [t for t, entree in series.items() if not _a_jour(entree, debut, aujourdhui)]
+    compter("cache.series.succes", len(series) - len(a_charger))
+    compter("cache.series.echecs", len(a_charger))
+    if a_charger:
+        debut_requete = min([debut] + [series[t][0] for t in a_charger if series[t] is not None])
+        debut_requete = date(debut_requete.year, 1, 1)
+        clotures = fournisseur.get_clotures(a_charger, debut_requete, aujourdhui + timedelta(days=1))
+        with _verrou:
+            for ticker in a_charger:
+                entree = (debut_requete, aujourdhui, SerieDatee.depuis_serie(clotures[ticker]))
+                # Un autre thread a pu publier entre-temps une série au moins aussi complète
+                publiee = _clotures.get((fournisseur, ticker))
+                if not _a_jour(publiee, debut_requete, aujourdhui):
+                    _clotures[(fournisseur, ticker)] = publiee = entree
+                series[ticker] = publiee
+    return {t: series[t][2] for t in tickers}
+
+
+def prix_a_date(ticker: str, date_prix, fournisseur: FournisseurDonnees = None):
+    """Clôture de la dernière séance à `date_prix` ou avant, None si inconnue."""
+    return series_clotures([ticker], date_prix, fournisseur)[ticker.upper()].valeur_au(date_prix)
+
+
+def vider_series_clotures():
+    with _verrou:
+        _clotures.clear()
@@ -0,0 +1,326 @@
+"""
+Matrices de covariance et de corrélation des rendements quotidiens d'un ensemble de tickers
+(actifs d'un portefeuille, index de référence), tenues à jour séance par séance.
+
+Trois estimateurs partagent la même interface (initialiser, ajouter, covariance, correlation) :
+
+- CovarianceCumulee : tout l'historique, par l'algorithme de Welford en version matricielle ;
+- CovarianceGlissante : les `fenetre` derniers rendements, par sommes courantes (on ajoute le
+  nouveau jour et on retire le plus ancien), recalculées exactement toutes les `fenetre` mises à
+  jour comme dans analytique.MetriquesGlissantes ;
+- CovarianceExponentielle : pondération exponentielle des jours (facteur `decroissance`, 0,94
+  façon RiskMetrics).
+
+Une nouvelle séance coûte O(n²) au lieu de O(T·n²) pour un recalcul complet.
+"""
+import threading
+from collections import deque
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import analytique
+from fournisseur_donnees import get_fournisseur
+from instrumentation import chronometre
+
+METHODES = ("cumulee", "glissante", "exponentielle")
+
+
+def _correlation(covariance):
+    ecarts = np.sqrt(np.clip(np.diag(covariance), 0.0, None))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = covariance / np.outer(ecarts, ecarts)
+    correlation = np.clip(correlation, -1.0, 1.0)
+    np.fill_diagonal(correlation, np.where(ecarts > 0, 1.0, np.nan))
+    return correlation
+
+
+def _rendements(precedents, prix):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(precedents != 0, prix / precedents - 1.0, 0.0)
+
+
+class CovarianceCumulee:
+    def __init__(self, n: int):
+        self.n = 0
+        self.moyenne = np.zeros(n)
+        self._m2 = np.zeros((n, n))
+        self._precedent = None
+
+    def initialiser(self, rendements):
+        """Construit l'état à partir de rendements T x N (calcul vectorisé, sauf la dernière
+        séance ajoutée par ajouter() pour pouvoir la remplacer)."""
+        r = np.asarray(rendements, dtype=np.float64)
+        self.__init__(r.shape[1])
+        if len(r) == 0:
+            return
+        if len(r) > 1:
+            self.n = len(r) - 1
+            self.moyenne = r[:-1].mean(axis=0)
+            centres = r[:-1] - self.moyenne
+            self._m2 = centres.T @ centres
+        self.ajouter(r[-1])
+
+    def remplacer_dernier(self, r):
+        """Remplace les rendements de la dernière séance (clôtures révisées)."""
+        self.n, self.moyenne, self._m2 = self._precedent
+        self.ajouter(r)
+
+    def ajouter(self, r):
+        r = np.asarray(r, dtype=np.float64)
+        self._precedent = (self.n, self.moyenne.copy(), self._m2.copy())
+        self.n += 1
+        ecart = r - self.moyenne
+        self.moyenne += ecart / self.n
+        self._m2 += np.outer(ecart, r - self.moyenne)
+
+    def covariance(self):
+        if self.n < 2:
+            return np.full(self._m2.shape, np.nan)
+        return self._m2 / (self.n - 1)
+
+    def correlation(self):
+        return _correlation(self.covariance())
+
+
+class CovarianceGlissante:
+    def __init__(self, n: int, fenetre: int = 63):
+        self.fenetre = fenetre
+        self._rendements = deque()
+        self._somme = np.zeros(n)
+        self._somme_produits = np.zeros((n, n))
+        self._mises_a_jour = 0
+
+    @property
+    def n(self):
+        return len(self._rendements)
+
+    def initialiser(self, rendements):
+        r = np.asarray(rendements, dtype=np.float64)
+        self.__init__(r.shape[1], self.fenetre)
+        self._rendements.extend(r[-self.fenetre:])
+        self._recalculer_sommes()
+
+    def _recalculer_sommes(self):
+        if self._rendements:
+            r = np.array(self._rendements)
+            self._somme = r.sum(axis=0)
+            self._somme_produits = r.T @ r
+
+    def ajouter(self, r):
+        """Intègre une nouvelle séance en O(n²)."""
+        r = np.array(r, dtype=np.float64)
+        self._rendements.append(r)
+        self._somme += r
+        self._somme_produits += np.outer(r, r)
+        if len(self._rendements) > self.fenetre:
+            ancien = self._rendements.popleft()
+            self._somme -= ancien
+            self._somme_produits -= np.outer(ancien, ancien)
+        self._mises_a_jour += 1
+        if self._mises_a_jour % self.fenetre == 0:
+            self._recalculer_sommes()
+
+    def remplacer_dernier(self, r):
+        """Remplace les rendements de la dernière séance (clôtures révisées)."""
+        r = np.array(r, dtype=np.float64)
+        ancien = self._rendements[-1]
+        self._rendements[-1] = r
+        self._somme += r - ancien
+        self._somme_produits += np.outer(r, r) - np.outer(ancien, ancien)
+
+    def covariance(self):
+        n = self.n
+        if n < 2:
+            return np.full(self._somme_produits.shape, np.nan)
+        return (self._somme_produits - np.outer(self._somme, self._somme) / n) / (n - 1)
+
+    def correlation(self):
+        return _correlation(self.covariance())
+
+
+class CovarianceExponentielle:
+    """Moyenne et covariance pondérées exponentiellement : le poids d'un jour est multiplié par
+    `decroissance` à chaque nouvelle séance."""
+
+    def __init__(self, n: int, decroissance: float = 0.94):
+        self.decroissance = decroissance
+        self.n = 0
+        self.moyenne = np.zeros(n)
+        self._covariance = np.zeros((n, n))
+        self._precedent = None
+
+    def initialiser(self, rendements):
+        r = np.asarray(rendements, dtype=np.float64)
+        self.__init__(r.shape[1], self.decroissance)
+        if len(r) == 0:
+            return
+        # Forme fermée de la récurrence d'ajouter() jusqu'à l'avant-dernier jour : le jour k pèse
+        # (1 - λ) λ^(T-2-k), le premier jour λ^(T-2) (les poids somment à 1). Le dernier jour
+        # passe par ajouter() pour pouvoir être remplacé.
+        precedents = r[:-1]
+        if len(precedents):
+            poids = (1.0 - self.decroissance) * self.decroissance ** np.arange(len(precedents) - 1, -1, -1.0)
+            poids[0] = self.decroissance ** (len(precedents) - 1)
+            self.n = len(precedents)
+            self.moyenne = poids @ precedents
+            centres = precedents - self.moyenne
+            self._covariance = (centres * poids[:, None]).T @ centres
+        self.ajouter(r[-1])
+
+    def remplacer_dernier(self, r):
+        """Remplace les rendements de la dernière séance (clôtures révisées)."""
+        self.n, self.moyenne, self._covariance = self._precedent
+        self.ajouter(r)
+
+    def ajouter(self, r):
+        r = np.asarray(r, dtype=np.float64)
+        self._precedent = (self.n, self.moyenne.copy(), self._covariance.copy())
+        if self.n == 0:
+            self.moyenne = r.copy()
+            self.n = 1
+            return
+        alpha = 1.0 - self.decroissance
+        ecart = r - self.moyenne
+        self.moyenne += alpha * ecart
+        self._covariance = self.decroissance * (self._covariance + alpha * np.outer(ecart, ecart))
+        self.n += 1
+
+    def covariance(self):
+        if self.n < 2:
+            return np.full(self._covariance.shape, np.nan)
+        return self._covariance.copy()
+
+    def correlation(self):
+        return _correlation(self.covariance())
+
+
+def creer_estimateur(methode: str, n: int, fenetre: int = 63, decroissance: float = 0.94):
+    if methode == "cumulee":
+        return CovarianceCumulee(n)
+    if methode == "glissante":
+        return CovarianceGlissante(n, fenetre)
+    if methode == "exponentielle":
+        return CovarianceExponentielle(n, decroissance)
+    raise ValueError(f"Méthode inconnue : {methode} (attendu : {', '.join(METHODES)})")
+
+
+class ServiceCovariance:
+    """
+    Covariance et corrélation des rendements quotidiens de `tickers` depuis `period`. L'estimateur
+    est construit une fois sur l'historique, puis actualiser() n'ajoute que les séances
+    postérieures à la dernière date connue. Un jour sans cotation compte comme un rendement nul
+    pour ce ticker (dernier prix connu), comme pour la référence de MetriquesGlissantes.
+    """
+
+    def __init__(self, tickers, methode="cumulee", period="1y", fenetre=63, decroissance=0.94, fournisseur=None):
+        self.tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        if not self.tickers:
+            raise ValueError("Aucun ticker pour la matrice de covariance")
+        self.methode = methode
+        self.period = period
+        self.fournisseur = fournisseur
+        self.estimateur = creer_estimateur(methode, len(self.tickers), fenetre, decroissance)
+        self.derniere_date = None
+        self._derniers_prix = None
+        self._avant_derniers_prix = None
+        self._verrou = threading.Lock()
+        self._initialiser()
+
+    @classmethod
+    def depuis_portefeuille(cls, portefeuille, indices=(), **options):
+        """Actifs du portefeuille suivis des index (objets Index ou tickers)."""
+        tickers = [actif.ticker for actif in portefeuille.actifs]
+        tickers += [i if isinstance(i, str) else i.ticker for i in indices]
+        return cls(tickers, **options)
+
+    def _fournisseur(self):
+        return self.fournisseur or get_fournisseur()
+
+    @chronometre()
+    def _initialiser(self):
+        clotures = self._fournisseur().get_clotures_periode(self.tickers, self.period).ffill()
+        disponibles = clotures.notna().any(axis=0)
+        if not disponibles.all():
+            raise ValueError(f"Aucune donnée de prix pour {', '.join(clotures.columns[~disponibles])}")
+        # Début commun : le premier jour où tous les tickers ont un prix
+        clotures = clotures.dropna()
+        if len(clotures) < 2:
+            raise ValueError("Pas assez de séances communes pour estimer la covariance")
+        prix = clotures.to_numpy(dtype=np.float64)
+        self.estimateur.initialiser(analytique.rendements(prix))
+        self._derniers_prix = prix[-1].copy()
+        self._avant_derniers_prix = prix[-2].copy()
+        self.derniere_date = clotures.index[-1]
+
+    @chronometre()
+    def actualiser(self):
+        """
+        Relit la dernière séance connue et ajoute les suivantes ; si les clôtures de la dernière
+        séance ont été révisées (prix en séance), ses rendements sont remplacés.
+        Retourne le nombre de séances ajoutées ou révisées.
+        """
+        with self._verrou:
+            clotures = self._fournisseur().get_clotures(self.tickers, self.derniere_date, date.today() + timedelta(days=1))
+            clotures = clotures[clotures.index >= self.derniere_date].dropna(how="all")
+            revisees = 0
+            if len(clotures) and clotures.index[0] == self.derniere_date:
+                premiere = clotures.iloc[0].to_numpy(dtype=np.float64)
+                prix = np.where(np.isnan(premiere), self._derniers_prix, premiere)
+                if not np.array_equal(prix, self._derniers_prix):
+                    self.estimateur.remplacer_dernier(_rendements(self._avant_derniers_prix, prix))
+                    self._derniers_prix = prix
+                    revisees = 1
+                clotures = clotures.iloc[1:]
+            for date_seance, prix in zip(clotures.index, clotures.to_numpy(dtype=np.float64)):
+                prix = np.where(np.isnan(prix), self._derniers_prix, prix)
+                self.estimateur.ajouter(_rendements(self._derniers_prix, prix))
+                self._avant_derniers_prix, self._derniers_prix = self._derniers_prix, prix
+                self.derniere_date = date_seance
+            return revisees + len(clotures)
+
+    def covariance(self, annualiser: bool = False, periodes: int = analytique.JOURS_BOURSE) -> pd.DataFrame:
+        with self._verrou:
+            covariance = self.estimateur.covariance()
+        return pd.DataFrame(covariance * periodes if annualiser else covariance, index=self.tickers, columns=self.tickers)
+
+    def correlation(self) -> pd.DataFrame:
+        with self._verrou:
+            correlation = self.estimateur.correlation()
+        return pd.DataFrame(correlation, index=self.tickers, columns=self.tickers)
+
+    def volatilites(self, annualiser: bool = False) -> pd.Series:
+        covariance = self.covariance(annualiser)
+        return pd.Series(np.sqrt(np.clip(np.diag(covariance), 0.0, None)), index=self.tickers, name="Volatilité")
+
+    def betas(self, reference: str) -> pd.Series:
+        """Bêta de chaque ticker par rapport à `reference` (qui doit faire partie des tickers)."""
+        covariance = self.covariance()
+        reference = reference.upper()
+        return (covariance[reference] / covariance.loc[reference, reference]).rename(f"Bêta / {reference}")
+
+    def ratio_diversification(self, poids) -> float:
+        """Moyenne pondérée des volatilités divisée par la volatilité du portefeuille (1 : aucune diversification)."""
+        poids = np.asarray(poids, dtype=np.float64)
+        covariance = self.covariance().to_numpy()
+        volatilite = float(np.sqrt(max(poids @ covariance @ poids, 0.0)))
+        return float(poids @ np.sqrt(np.diag(covariance))) / volatilite if volatilite > 0 else np.nan
+
+
+def figure_correlation(correlation: pd.DataFrame, titre: str = "Corrélation des rendements quotidiens"):
+    """Carte de chaleur sur une Figure matplotlib explicite (sans l'état global de pyplot)."""
+    from matplotlib.figure import Figure  # uniquement pour l'affichage, pas au chargement du module
+    n = len(correlation)
+    taille = min(max(4.0, 0.45 * n + 2), 14.0)
+    figure = Figure(figsize=(taille + 1, taille))
+    axe = figure.subplots()
+    image = axe.imshow(correlation.to_numpy(), cmap="RdBu_r", vmin=-1, vmax=1)
+    axe.set_xticks(range(n), correlation.columns, rotation=90, fontsize=8)
+    axe.set_yticks(range(n), correlation.index, fontsize=8)
+    if n <= 15:
+        for i in range(n):
+            for j in range(n):
+                axe.text(j, i, f"{correlation.iat[i, j]:.2f}", ha="center", va="center", fontsize=7)
+    axe.set_title(titre)
+    figure.colorbar(image, ax=axe, fraction=0.046, pad=0.04)
+    figure.tight_layout()
+    return figure
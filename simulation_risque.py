@@ -0,0 +1,132 @@
+"""
+VaR et CVaR par simulation de Monte Carlo de trajectoires de plusieurs jours.
+
+Chaque simulation tire `max(horizons)` jours de rendements pour tous les actifs, soit selon une loi
+normale multivariée ajustée (moyenne et covariance historiques, via Cholesky), soit en rééchantillonnant
+des jours historiques entiers (bootstrap, qui conserve les queues épaisses et les corrélations du jour).
+Les positions sont conservées sans rééquilibrage : le rendement du portefeuille à l'horizon h est
+sum(poids * prod(1 + r[:h])) - 1.
+
+Les tirages sont faits par lots de `TAILLE_LOT` trajectoires, chacun avec son propre générateur issu
+de la même SeedSequence ; les lots sont regroupés en blocs (bornés par `MEMOIRE_BLOC` éléments) répartis
+sur le pool. Le résultat pour une graine donnée est donc identique avec ou sans pool de processus et
+quelle que soit la taille des blocs.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+METHODES = ("covariance", "bootstrap")
+MEMOIRE_BLOC = 4_000_000  # nombre de rendements tirés par bloc (32 Mo en float64)
+TAILLE_BLOC_MAX = 50_000
+TAILLE_LOT = 1_000  # trajectoires tirées par générateur : fixe, pour ne pas dépendre de la taille des blocs
+
+# Paramètres partagés par les processus du pool (envoyés une seule fois par processus)
+_parametres = None
+
+
+def _initialiser_processus(parametres):
+    global _parametres
+    _parametres = parametres
+
+
+def _simuler_bloc(graines, tailles, parametres=None):
+    """Rendements simulés du portefeuille (trajectoires x nombre d'horizons) pour un bloc de lots."""
+    parametres = parametres or _parametres
+    return np.concatenate([_simuler_lot(graine, taille, parametres) for graine, taille in zip(graines, tailles)])
+
+
+def _simuler_lot(graine, taille, parametres):
+    methode, rendements, moyenne, cholesky, poids, horizons = parametres
+    generateur = np.random.default_rng(graine)
+    jours = horizons[-1]
+    if methode == "bootstrap":
+        tirages = rendements[generateur.integers(0, len(rendements), size=(taille, jours))]
+    else:
+        tirages = moyenne + generateur.standard_normal((taille, jours, len(moyenne))) @ cholesky.T
+    # Croissance cumulée de chaque actif, lue aux horizons demandés
+    croissance = np.cumprod(1.0 + tirages, axis=1)[:, np.asarray(horizons) - 1, :]
+    return croissance @ poids - 1.0
+
+
+def _cholesky(covariance):
+    # Matrice éventuellement semi-définie (actifs redondants) : petit terme diagonal si nécessaire
+    saut = 0.0
+    for _ in range(8):
+        try:
+            return np.linalg.cholesky(covariance + saut * np.eye(len(covariance)))
+        except np.linalg.LinAlgError:
+            saut = max(saut * 10, 1e-12 * max(np.trace(covariance), 1e-12))
+    raise ValueError("Covariance non définie positive")
+
+
+def simuler_rendements(rendements, poids, horizons=(1, 10), n_simulations=100_000, methode="covariance",
+                       graine=None, processus=0, taille_bloc=None) -> dict:
+    """
+    Simule `n_simulations` trajectoires à partir de la matrice de rendements quotidiens (T x N)
+    et des poids (N) ; retourne {horizon: rendements simulés du portefeuille}.
+    `processus` > 1 répartit les blocs sur un pool de processus.
+    """
+    if methode not in METHODES:
+        raise ValueError(f"Méthode inconnue : {methode} (attendu : {', '.join(METHODES)})")
+    rendements = np.asarray(rendements, dtype=np.float64)
+    if rendements.ndim == 1:
+        rendements = rendements[:, None]
+    rendements = rendements[~np.isnan(rendements).any(axis=1)]
+    poids = np.asarray(poids, dtype=np.float64).reshape(-1)
+    if len(rendements) < 2 or rendements.shape[1] != len(poids):
+        raise ValueError("Matrice de rendements insuffisante ou incompatible avec les poids")
+    horizons = tuple(sorted(set(int(h) for h in horizons)))
+    if horizons[0] < 1:
+        raise ValueError("Les horizons doivent être des nombres de jours positifs")
+
+    moyenne = cholesky = None
+    if methode == "covariance":
+        moyenne = rendements.mean(axis=0)
+        cholesky = _cholesky(np.atleast_2d(np.cov(rendements, rowvar=False)))
+    parametres = (methode, rendements, moyenne, cholesky, poids, horizons)
+
+    # Découpage en lots indépendant de la taille des blocs : les lots sont seulement regroupés
+    tailles = [TAILLE_LOT] * (n_simulations // TAILLE_LOT)
+    if n_simulations % TAILLE_LOT:
+        tailles.append(n_simulations % TAILLE_LOT)
+    graines = np.random.SeedSequence(graine).spawn(len(tailles))
+    if taille_bloc is None:
+        taille_bloc = int(np.clip(MEMOIRE_BLOC // (horizons[-1] * len(poids)), 1, TAILLE_BLOC_MAX))
+    lots_par_bloc = max(1, int(taille_bloc) // TAILLE_LOT)
+    graines_blocs = [graines[i:i + lots_par_bloc] for i in range(0, len(tailles), lots_par_bloc)]
+    tailles_blocs = [tailles[i:i + lots_par_bloc] for i in range(0, len(tailles), lots_par_bloc)]
+
+    if processus and processus > 1 and len(tailles_blocs) > 1:
+        with ProcessPoolExecutor(max_workers=min(processus, len(tailles_blocs)), initializer=_initialiser_processus,
+                                 initargs=(parametres,)) as executeur:
+            blocs = list(executeur.map(_simuler_bloc, graines_blocs, tailles_blocs))
+    else:
+        blocs = [_simuler_bloc(g, t, parametres) for g, t in zip(graines_blocs, tailles_blocs)]
+
+    simules = np.concatenate(blocs, axis=0)
+    return {h: simules[:, i] for i, h in enumerate(horizons)}
+
+
+def var_cvar(rendements_simules, niveau=0.95):
+    """(VaR, CVaR) au niveau de confiance donné, exprimées en pertes positives."""
+    rendements_simules = np.asarray(rendements_simules)
+    seuil = np.quantile(rendements_simules, 1 - niveau)
+    queue = rendements_simules[rendements_simules <= seuil]
+    return float(-seuil), float(-queue.mean())
+
+
+def var_cvar_monte_carlo(rendements, poids, horizons=(1, 10), niveaux=(0.95, 0.99), n_simulations=100_000,
+                         methode="covariance", graine=None, processus=0, valeur=None) -> pd.DataFrame:
+    """Tableau VaR / CVaR par horizon et niveau de confiance (en fraction, et en montant si `valeur` est donnée)."""
+    simules = simuler_rendements(rendements, poids, horizons, n_simulations, methode, graine, processus)
+    lignes = []
+    for horizon, rendements_horizon in simules.items():
+        for niveau in niveaux:
+            var, cvar = var_cvar(rendements_horizon, niveau)
+            ligne = {"Horizon (jours)": horizon, "Niveau": niveau, "VaR": var, "CVaR": cvar}
+            if valeur is not None:
+                ligne["VaR (montant)"] = var * valeur
+                ligne["CVaR (montant)"] = cvar * valeur
+            lignes.append(ligne)
+    return pd.DataFrame(lignes)
@@ -0,0 +1,405 @@
+"""
+Stockage en colonnes des clôtures quotidiennes, pour de grands univers de tickers.
+
+Un seul axe de dates (dates_<g>.npy, datetime64[ns]) est partagé par tous les tickers. Les clôtures
+sont rangées par blocs de `LARGEUR_BLOC` tickers : bloc<k>_<g>.npy est un tableau float64
+(LARGEUR_BLOC x capacité), une ligne contiguë par ticker, avec NaN les jours sans cotation. Les
+blocs sont ouverts en mémoire partagée (np.load(mmap_mode=...)) : chaque fichier ouvert garde un
+descripteur, on n'en ouvre donc qu'un par bloc et non un par ticker. L'ouverture est quasi
+instantanée et les lectures sont des vues sans copie. Pour 5 000 tickers et 20 ans de séances,
+cela fait environ 200 Mo sur disque, et seules les pages lues sont chargées.
+
+L'axe et les blocs ont une capacité supérieure au nombre de séances. Les nouvelles séances
+sont donc écrites sur place. Si la capacité est dépassée, ou si des dates s'insèrent avant ou
+au milieu de l'axe (historique plus ancien), tout est réécrit dans une nouvelle génération <g>
+de fichiers. Les vues déjà distribuées restent valides sur l'ancienne génération.
+
+meta.json garde la génération, le nombre de séances, la capacité et, pour chaque ticker, sa
+colonne et les plages de dates couvertes. Comme dans CachePrix, seules les plages manquantes
+sont demandées à la source, en une requête groupée par ensemble de plages.
+
+Plusieurs processus peuvent partager le répertoire (application et tâche planifiée de cli.py) :
+toute écriture se fait sous un verrou sur le fichier `verrou`, après relecture de meta.json s'il
+a changé. Les fichiers d'une génération ne sont supprimés qu'une fois la suivante enregistrée.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+from fournisseur_donnees import FournisseurDonnees, _en_date, _plages_a_telecharger, _plages_couvertes
+from instrumentation import compter, logger, mesurer
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+REPERTOIRE_STOCKAGE = ".stockage_prix"
+CAPACITE_MIN = 1024
+LARGEUR_BLOC = 256
+VERSION_META = 2
+
+
+def _verrouiller_fichier(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _deverrouiller_fichier(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class StockageColonnes(FournisseurDonnees):
+    """Clôtures quotidiennes servies depuis le stockage en colonnes. Les plages manquantes sont
+    demandées à `source`, de préférence la source brute : placer un CachePrix entre les deux
+    conserverait chaque clôture une seconde fois. Les historiques OHLCV, les fondamentaux et les
+    autres intervalles sont délégués tels quels à `autres` (par défaut `source`), par exemple un
+    CachePrix sur la même source brute."""
+
+    def __init__(self, source: FournisseurDonnees, repertoire: str = REPERTOIRE_STOCKAGE, ttl_jour: float = 900,
+                 autres: FournisseurDonnees = None):
+        self.source = source
+        self.autres = autres or source
+        self.repertoire = repertoire
+        self.ttl_jour = ttl_jour
+        self._verrou = threading.RLock()
+        self._profondeur = 0
+        self._signature = False  # jamais égale à une signature : ouverture au premier verrouillage
+        self._blocs = {}
+        os.makedirs(self.repertoire, exist_ok=True)
+        self._fichier_verrou = open(self._chemin("verrou"), "a+b")
+        with self._verrouille():
+            self._supprimer_generations(self._meta["generation"])
+
+    # --- Fichiers ---
+
+    def _chemin(self, nom):
+        return os.path.join(self.repertoire, nom)
+
+    def _fichier(self, nom):
+        return self._chemin(f"{nom}_{self._meta['generation']}.npy")
+
+    @contextmanager
+    def _verrouille(self):
+        """Verrou des threads de ce processus et, au premier niveau, des autres processus ; meta.json
+        est relu s'il a été réécrit ailleurs depuis la dernière lecture."""
+        with self._verrou:
+            if self._profondeur == 0:
+                _verrouiller_fichier(self._fichier_verrou)
+            self._profondeur += 1
+            try:
+                if self._profondeur == 1 and self._signature_meta() != self._signature:
+                    self._ouvrir()
+                yield
+            finally:
+                self._profondeur -= 1
+                if self._profondeur == 0:
+                    _deverrouiller_fichier(self._fichier_verrou)
+
+    def _signature_meta(self):
+        # os.replace crée un nouvel inode à chaque sauvegarde
+        try:
+            etat = os.stat(self._chemin("meta.json"))
+        except FileNotFoundError:
+            return None
+        return etat.st_ino, etat.st_mtime_ns, etat.st_size
+
+    def _ouvrir(self):
+        meta = None
+        signature = self._signature_meta()
+        if signature is not None:
+            try:
+                with open(self._chemin("meta.json"), encoding="utf-8") as f:
+                    meta = json.load(f)
+            except Exception as e:
+                logger.warning("Stockage en colonnes illisible, il sera reconstruit : %s", e)
+        generation = 0
+        if meta is not None and meta.get("version") != VERSION_META:
+            # Ancien format (un fichier par ticker) : ses fichiers partiront avec la génération suivante
+            logger.info("Stockage en colonnes d'un format précédent, il sera reconstruit")
+            generation, meta = meta.get("generation", 0) + 1, None
+        if meta is None:
+            meta = {"version": VERSION_META, "generation": generation, "lignes": 0, "capacite": 0,
+                    "colonnes": 0, "tickers": {}}
+        self._meta = meta
+        self._signature = signature
+        self._blocs = {}
+        if meta["capacite"]:
+            self._axe = np.load(self._fichier("dates"), mmap_mode="r+")
+        else:
+            self._axe = np.zeros(0, dtype="datetime64[ns]")
+
+    def _supprimer_generations(self, generation):
+        # Appelé sous le verrou, meta.json à jour : seule `generation` y est référencée. Les fichiers
+        # plus anciens peuvent rester ouverts dans d'autres processus (sous Windows on réessaiera).
+        suffixe = f"_{generation}.npy"
+        for nom in os.listdir(self.repertoire):
+            if nom.endswith(".npy") and not nom.endswith(suffixe):
+                try:
+                    os.remove(self._chemin(nom))
+                except OSError:
+                    pass
+
+    def _sauvegarder_meta(self):
+        temporaire = self._chemin("meta.json.tmp")
+        with open(temporaire, "w", encoding="utf-8") as f:
+            json.dump(self._meta, f)
+        os.replace(temporaire, self._chemin("meta.json"))
+        self._signature = self._signature_meta()
+
+    def _nombre_blocs(self):
+        return -(-self._meta["colonnes"] // LARGEUR_BLOC)
+
+    def _bloc(self, k, creer=False):
+        bloc = self._blocs.get(k)
+        if bloc is None:
+            if creer:
+                bloc = open_memmap(self._fichier(f"bloc{k}"), mode="w+", dtype=np.float64,
+                                   shape=(LARGEUR_BLOC, self._meta["capacite"]))
+                bloc[:] = np.nan
+            else:
+                bloc = np.load(self._fichier(f"bloc{k}"), mmap_mode="r+")
+            self._blocs[k] = bloc
+        return bloc
+
+    def _nouvelle_colonne(self, entree):
+        indice = self._meta["colonnes"]
+        self._meta["colonnes"] += 1
+        entree["colonne"] = indice
+        k, ligne = divmod(indice, LARGEUR_BLOC)
+        return self._bloc(k, creer=ligne == 0)[ligne]
+
+    def _colonne(self, ticker):
+        """Colonne en mémoire partagée du ticker (toute la capacité), None s'il n'a aucune donnée."""
+        entree = self._meta["tickers"].get(ticker)
+        if entree is None or entree.get("colonne") is None:
+            return None
+        k, ligne = divmod(entree["colonne"], LARGEUR_BLOC)
+        return self._bloc(k)[ligne]
+
+    # --- Axe des dates ---
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self._axe[:self._meta["lignes"]]
+
+    def _etendre_axe(self, nouvelles_dates):
+        """Ajoute des dates à l'axe : sur place en fin d'axe si la capacité suffit, sinon réécriture."""
+        axe = self.dates
+        union = np.union1d(axe, nouvelles_dates)
+        if len(union) == len(axe):
+            return
+        n = len(axe)
+        if len(union) <= self._meta["capacite"] and (n == 0 or union[n - 1] == axe[-1]):
+            self._axe[n:len(union)] = union[n:]
+            self._axe.flush()
+            self._meta["lignes"] = len(union)
+            return
+        capacite = self._meta["capacite"]
+        if len(union) > capacite:
+            capacite = max(len(union), 2 * capacite, CAPACITE_MIN)
+        self._reecrire(union, capacite)
+
+    def _reecrire(self, union, capacite):
+        ancien_axe, anciens = self.dates, [self._bloc(k) for k in range(self._nombre_blocs())]
+        positions = np.searchsorted(union, ancien_axe)
+        n = len(ancien_axe)
+        with mesurer("StockageColonnes.reecrire"):
+            self._meta["generation"] += 1
+            self._meta["capacite"] = capacite
+            axe = open_memmap(self._fichier("dates"), mode="w+", dtype="datetime64[ns]", shape=(capacite,))
+            axe[:] = np.datetime64("NaT")
+            axe[:len(union)] = union
+            axe.flush()
+            blocs = {}
+            for k, ancien in enumerate(anciens):
+                bloc = open_memmap(self._fichier(f"bloc{k}"), mode="w+", dtype=np.float64, shape=(LARGEUR_BLOC, capacite))
+                bloc[:] = np.nan
+                bloc[:, positions] = ancien[:, :n]
+                bloc.flush()
+                blocs[k] = bloc
+        self._axe, self._blocs = axe, blocs
+        self._meta["lignes"] = len(union)
+        self._sauvegarder_meta()
+        self._supprimer_generations(self._meta["generation"])
+
+    # --- Écriture et lecture ---
+
+    def ecrire(self, clotures: pd.DataFrame):
+        """Écrit des clôtures (dates x tickers) ; les NaN ne remplacent pas les valeurs connues."""
+        clotures = clotures.dropna(how="all")
+        if clotures.empty:
+            return
+        dates = np.asarray(pd.DatetimeIndex(clotures.index).normalize(), dtype="datetime64[ns]")
+        with self._verrouille():
+            self._etendre_axe(dates)
+            positions = np.searchsorted(self.dates, dates)
+            modifies = set()
+            for ticker in clotures.columns:
+                valeurs = clotures[ticker].to_numpy(dtype=np.float64)
+                connues = ~np.isnan(valeurs)
+                if not connues.any():
+                    continue
+                entree = self._meta["tickers"].setdefault(ticker, {"colonne": None, "plages": []})
+                colonne = self._colonne(ticker)
+                if colonne is None:
+                    colonne = self._nouvelle_colonne(entree)
+                colonne[positions[connues]] = valeurs[connues]
+                modifies.add(entree["colonne"] // LARGEUR_BLOC)
+            for k in modifies:
+                self._blocs[k].flush()
+            self._sauvegarder_meta()
+
+    def _bornes(self, debut, fin):
+        dates = self.dates
+        i = 0 if debut is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(debut), "ns"), side="left"))
+        j = len(dates) if fin is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(fin), "ns"), side="left"))
+        return i, j
+
+    def lire(self, ticker: str, debut=None, fin=None):
+        """
+        (dates, clôtures) du ticker sur [debut, fin[, sans appel à la source. Ce sont des vues en
+        lecture seule sur les fichiers. Une copie n'est faite que si la colonne a des trous à
+        l'intérieur de la fenêtre (places de cotation aux jours fériés différents).
+        """
+        ticker = ticker.upper()
+        with self._verrouille():
+            i, j = self._bornes(debut, fin)
+            colonne = self._colonne(ticker)
+            dates = np.asarray(self._axe[i:j])
+        if colonne is None or i >= j:
+            return np.zeros(0, dtype="datetime64[ns]"), np.zeros(0)
+        valeurs = np.asarray(colonne[i:j])
+        connues = ~np.isnan(valeurs)
+        if not connues.all():
+            if not connues.any():
+                return np.zeros(0, dtype="datetime64[ns]"), np.zeros(0)
+            # Avant la première cotation et après la dernière : on réduit la vue
+            premier, dernier = int(connues.argmax()), len(connues) - int(connues[::-1].argmax())
+            dates, valeurs, connues = dates[premier:dernier], valeurs[premier:dernier], connues[premier:dernier]
+            if not connues.all():
+                dates, valeurs = dates[connues], valeurs[connues]
+        dates.flags.writeable = False
+        valeurs.flags.writeable = False
+        return dates, valeurs
+
+    # --- Couverture et source ---
+
+    def _plages(self, ticker):
+        entree = self._meta["tickers"].get(ticker, {"plages": []})
+        return [(date.fromisoformat(d), date.fromisoformat(f)) for d, f in entree["plages"]]
+
+    def _derniere_date(self, ticker):
+        colonne = self._colonne(ticker)
+        if colonne is None:
+            return None
+        connues = ~np.isnan(colonne[:self._meta["lignes"]])
+        if not connues.any():
+            return None
+        return pd.Timestamp(self.dates[len(connues) - 1 - int(connues[::-1].argmax())]).date()
+
+    def _plages_a_telecharger(self, ticker, debut, fin):
+        entree = self._meta["tickers"].get(ticker, {})
+        return _plages_a_telecharger(self._plages(ticker), debut, fin, self._derniere_date(ticker),
+                                     entree.get("maj_jour", 0), self.ttl_jour)
+
+    def _couvrir(self, tickers, manquantes, recus):
+        """Met à jour les plages couvertes ; un ticker pour lequel la source n'a rien renvoyé n'en gagne aucune."""
+        for ticker in tickers:
+            entree = self._meta["tickers"].setdefault(ticker, {"colonne": None, "plages": []})
+            if any(f > date.today() for _, f in manquantes):
+                entree["maj_jour"] = time.time()
+            if ticker not in recus:
+                continue
+            plages = _plages_couvertes(self._plages(ticker), manquantes, self._derniere_date(ticker))
+            entree["plages"] = [(d.isoformat(), f.isoformat()) for d, f in plages]
+
+    def assurer(self, tickers, debut, fin):
+        """Télécharge auprès de la source les plages de [debut, fin[ pas encore couvertes."""
+        debut, fin = _en_date(debut), _en_date(fin)
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        with self._verrouille():
+            groupes = {}
+            for ticker in tickers:
+                manquantes = self._plages_a_telecharger(ticker, debut, fin)
+                if manquantes:
+                    groupes.setdefault(tuple(manquantes), []).append(ticker)
+                compter("cache.colonnes.echecs" if manquantes else "cache.colonnes.succes")
+        # La source est interrogée hors du verrou : elle a ses propres verrous par ticker
+        for manquantes, groupe in groupes.items():
+            lots = []
+            for m_debut, m_fin in manquantes:
+                with mesurer("StockageColonnes.source.get_clotures"):
+                    lots.append(self.source.get_clotures(groupe, m_debut, m_fin))
+            recus = {ticker for lot in lots for ticker in lot.columns[lot.notna().any(axis=0)]}
+            with self._verrouille():
+                for lot in lots:
+                    self.ecrire(lot)
+                self._couvrir(groupe, list(manquantes), recus)
+                self._sauvegarder_meta()
+
+    # --- Interface FournisseurDonnees ---
+
+    def get_clotures(self, tickers, debut, fin, intervalle="1d"):
+        if intervalle != "1d":
+            return self.autres.get_clotures(tickers, debut, fin, intervalle)
+        tickers = [t.upper() for t in tickers]
+        self.assurer(tickers, debut, fin)
+        with self._verrouille():
+            i, j = self._bornes(_en_date(debut), _en_date(fin))
+            index = pd.DatetimeIndex(self._axe[i:j], name="Date")
+            colonnes = {}
+            for ticker in dict.fromkeys(tickers):
+                colonne = self._colonne(ticker)
+                colonnes[ticker] = colonne[i:j] if colonne is not None else np.full(j - i, np.nan)
+            clotures = pd.DataFrame(colonnes, index=index)
+        return clotures.dropna(how="all").reindex(columns=tickers)
+
+    def get_serie_clotures(self, ticker, debut, fin, intervalle="1d"):
+        if intervalle != "1d":
+            return self.autres.get_serie_clotures(ticker, debut, fin, intervalle)
+        self.assurer([ticker], debut, fin)
+        return self.lire(ticker, _en_date(debut), _en_date(fin))
+
+    def get_historique(self, ticker, debut, fin, intervalle="1d"):
+        return self.autres.get_historique(ticker, debut, fin, intervalle)
+
+    def get_historiques(self, tickers, debut, fin, intervalle="1d"):
+        return self.autres.get_historiques(tickers, debut, fin, intervalle)
+
+    def get_infos(self, ticker):
+        return self.autres.get_infos(ticker)
+
+    def vider(self, ticker: str = None, disque: bool = False):
+        """Ferme les blocs ouverts et vide le cache mémoire de `autres`. Avec `disque`, les
+        clôtures et les plages couvertes sont aussi effacées : elles seront retéléchargées."""
+        with self._verrouille():
+            tickers = list(self._meta["tickers"]) if ticker is None else [ticker.upper()]
+            if disque:
+                for nom in tickers:
+                    colonne = self._colonne(nom)
+                    if colonne is not None:
+                        colonne[:] = np.nan
+                    if nom in self._meta["tickers"]:
+                        self._meta["tickers"][nom]["plages"] = []
+                        self._meta["tickers"][nom].pop("maj_jour", None)
+                for bloc in self._blocs.values():
+                    bloc.flush()
+                self._sauvegarder_meta()
+            if ticker is None:
+                self._blocs = {}
+        if hasattr(self.autres, "vider"):
+            self.autres.vider(ticker, disque=disque)
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+import pytest
+import analytique
+
+
+def _prix(n=400, n_actifs=4, graine=0):
+    generateur = np.random.default_rng(graine)
+    return 100.0 * np.exp(np.cumsum(generateur.normal(0.0003, 0.02, (n, n_actifs)), axis=0))
+
+
+def _duree_drawdown_directe(prix):
+    # Séances consécutives passées sous le plus haut précédent, comptées une à une
+    pic, duree, plus_longue = -np.inf, 0, 0
+    for valeur in prix:
+        if valeur >= pic:
+            pic, duree = valeur, 0
+        else:
+            duree += 1
+        plus_longue = max(plus_longue, duree)
+    return plus_longue
+
+
+def test_rendements_egaux_a_pct_change():
+    prix = _prix()
+    attendu = pd.DataFrame(prix).pct_change().to_numpy()[1:]
+    np.testing.assert_allclose(analytique.rendements(prix), attendu, rtol=1e-12)
+    assert analytique.rendements([100.0]).shape == (0,)
+
+
+@pytest.mark.parametrize("fenetre", [2, 20, 252])
+def test_volatilite_glissante_egale_a_rolling_std(fenetre):
+    rendements = analytique.rendements(_prix())
+    attendu = pd.DataFrame(rendements).rolling(fenetre).std().to_numpy()[fenetre - 1:]
+    np.testing.assert_allclose(analytique.volatilite_glissante(rendements, fenetre), attendu, rtol=1e-8, atol=1e-12)
+    np.testing.assert_allclose(analytique.volatilite_glissante(rendements[:, 0], fenetre, annualiser=True),
+                               attendu[:, 0] * np.sqrt(252), rtol=1e-8, atol=1e-12)
+
+
+def test_volatilite_glissante_fenetre_trop_longue():
+    assert analytique.volatilite_glissante(np.zeros(5), 10).shape == (0,)
+
+
+def test_volatilite_egale_a_std():
+    rendements = analytique.rendements(_prix())
+    attendu = pd.DataFrame(rendements).std().to_numpy()
+    np.testing.assert_allclose(analytique.volatilite(rendements), attendu, rtol=1e-12)
+    np.testing.assert_allclose(analytique.volatilite(rendements, annualiser=True), attendu * np.sqrt(252), rtol=1e-12)
+
+
+def test_sharpe_egal_a_la_definition():
+    rendements = analytique.rendements(_prix())
+    serie = pd.DataFrame(rendements)
+    attendu = (serie.mean() * 252 - 0.02) / (serie.std() * np.sqrt(252))
+    np.testing.assert_allclose(analytique.sharpe(rendements, 0.02), attendu.to_numpy(), rtol=1e-12)
+    assert analytique.sharpe(np.zeros(10)) == 0.0
+
+
+def test_sortino_egal_a_la_definition():
+    rendements = analytique.rendements(_prix())
+    for colonne in range(rendements.shape[1]):
+        r = rendements[:, colonne] - 0.02 / 252
+        ecart_baissier = np.sqrt(np.sum(np.where(r < 0, r, 0.0) ** 2) / len(r))
+        attendu = r.mean() * 252 / (ecart_baissier * np.sqrt(252))
+        assert np.isclose(analytique.sortino(rendements[:, colonne], 0.02), attendu, rtol=1e-12)
+    assert analytique.sortino(np.full(10, 0.01)) == 0.0
+
+
+def test_maximum_et_duree_drawdown():
+    prix = np.array([100.0, 120.0, 90.0, 110.0, 130.0, 117.0, 117.0, 125.0])
+    assert np.isclose(analytique.maximum_drawdown(prix), 0.25)
+    assert analytique.duree_drawdown(prix) == 3
+    assert analytique.duree_drawdown(np.arange(1.0, 10.0)) == 0
+
+    prix = _prix(n_actifs=6)
+    for colonne in range(prix.shape[1]):
+        pics = np.maximum.accumulate(prix[:, colonne])
+        assert np.isclose(analytique.maximum_drawdown(prix[:, colonne]), np.max(1.0 - prix[:, colonne] / pics))
+        assert analytique.duree_drawdown(prix[:, colonne]) == _duree_drawdown_directe(prix[:, colonne])
+
+
+@pytest.mark.parametrize("fonction", [analytique.volatilite, analytique.sharpe, analytique.sortino])
+def test_entree_2d_egale_aux_colonnes(fonction):
+    rendements = analytique.rendements(_prix())
+    resultat = fonction(rendements)
+    assert resultat.shape == (rendements.shape[1],)
+    np.testing.assert_allclose(resultat, [fonction(rendements[:, j]) for j in range(rendements.shape[1])], rtol=1e-12)
+
+
+@pytest.mark.parametrize("fonction", [analytique.maximum_drawdown, analytique.duree_drawdown])
+def test_drawdown_2d_egal_aux_colonnes(fonction):
+    prix = _prix()
+    resultat = fonction(prix)
+    assert resultat.shape == (prix.shape[1],)
+    np.testing.assert_allclose(resultat, [fonction(prix[:, j]) for j in range(prix.shape[1])])
+
+
+def test_volatilite_glissante_2d_egale_aux_colonnes():
+    rendements = analytique.rendements(_prix())
+    resultat = analytique.volatilite_glissante(rendements, 30)
+    for j in range(rendements.shape[1]):
+        np.testing.assert_allclose(resultat[:, j], analytique.volatilite_glissante(rendements[:, j], 30), rtol=1e-12)
+
+
+def test_metriques_glissantes_egales_au_calcul_vectorise():
+    prix = _prix(n=600, n_actifs=2)
+    metriques = analytique.MetriquesGlissantes(60)
+    metriques.initialiser(prix[:300, 0], prix[:300, 1])
+    for i in range(300, len(prix)):
+        metriques.ajouter(prix[i, 0], prix[i, 1])
+    r = analytique.rendements(prix)[-60:]
+    assert np.isclose(metriques.volatilite(), r[:, 0].std(ddof=1), rtol=1e-10)
+    assert np.isclose(metriques.beta(), np.cov(r[:, 0], r[:, 1])[0, 1] / r[:, 1].var(ddof=1), rtol=1e-10)
+    assert np.isclose(metriques.maximum_drawdown, analytique.maximum_drawdown(prix[:, 0]))
+
+
+def test_statistiques_cumulees_egales_au_calcul_vectorise():
+    prix = _prix(n_actifs=1)[:, 0]
+    statistiques = analytique.StatistiquesCumulees()
+    statistiques.initialiser(prix[:100])
+    for valeur in prix[100:]:
+        statistiques.ajouter(valeur)
+    r = analytique.rendements(prix)
+    assert np.isclose(statistiques.volatilite(), analytique.volatilite(r), rtol=1e-10)
+    assert np.isclose(statistiques.sharpe(0.01), analytique.sharpe(r, 0.01), rtol=1e-10)
+    assert np.isclose(statistiques.maximum_drawdown, analytique.maximum_drawdown(prix))
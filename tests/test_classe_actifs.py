@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import analytique
+from classe_actifs import Actifs
+from classe_index import Index
+from fournisseur_donnees import FournisseurLocal
+
+
+def _ajouter(fournisseur, dates, prix, prix_ref):
+    fournisseur.ajouter_historique("AAA", pd.DataFrame({"Close": prix}, index=dates))
+    fournisseur.ajouter_historique("REF", pd.DataFrame({"Close": prix_ref}, index=dates))
+
+
+def _verifier(actif, prix, prix_ref):
+    attendu = analytique.MetriquesGlissantes(actif.fenetre_risque)
+    attendu.initialiser(prix, prix_ref)
+    metriques = actif.metriques
+    assert np.isclose(metriques.volatilite(), attendu.volatilite())
+    assert np.isclose(metriques.beta(), attendu.beta())
+    assert np.isclose(metriques.value_at_risk(), attendu.value_at_risk())
+    assert np.isclose(metriques.maximum_drawdown, attendu.maximum_drawdown)
+    assert metriques.dernier_prix == prix[-1]
+
+
+def test_actualiser_metriques_revise_la_derniere_seance():
+    generateur = np.random.default_rng(0)
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize() - pd.Timedelta(days=10), periods=30)
+    prix = 100.0 * np.cumprod(1 + generateur.normal(0.0, 0.02, len(dates)))
+    prix_ref = 50.0 * np.cumprod(1 + generateur.normal(0.0, 0.01, len(dates)))
+    fournisseur = FournisseurLocal()
+    _ajouter(fournisseur, dates, prix, prix_ref)
+    actif = Actifs("AAA", fournisseur=fournisseur, reference=Index("REF", fournisseur=fournisseur), fenetre_risque=10)
+    _verifier(actif, prix, prix_ref)
+
+    prix, prix_ref = prix.copy(), prix_ref.copy()
+    prix[-1] *= 1.3
+    prix_ref[-1] *= 0.9
+    _ajouter(fournisseur, dates, prix, prix_ref)
+    assert actif.actualiser_metriques() == 1
+    assert actif.actualiser_metriques() == 0
+    _verifier(actif, prix, prix_ref)
+
+    dates = dates.append(pd.DatetimeIndex([dates[-1] + pd.offsets.BDay()]))
+    prix, prix_ref = np.append(prix, prix[-1] * 0.95), np.append(prix_ref, prix_ref[-1] * 1.01)
+    _ajouter(fournisseur, dates, prix, prix_ref)
+    assert actif.actualiser_metriques() == 1
+    _verifier(actif, prix, prix_ref)
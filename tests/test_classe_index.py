@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import analytique
+from classe_index import Index
+from fournisseur_donnees import FournisseurLocal
+
+
+def _fournisseur(dates, prix):
+    fournisseur = FournisseurLocal()
+    fournisseur.ajouter_historique("IDX", pd.DataFrame({"Close": prix}, index=dates))
+    return fournisseur
+
+
+def test_rafraichir_revise_la_derniere_seance():
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize() - pd.Timedelta(days=10), periods=10)
+    prix = np.array([100.0, 105.0, 103.0, 110.0, 108.0, 112.0, 111.0, 115.0, 114.0, 100.0])
+    fournisseur = _fournisseur(dates, prix)
+    index = Index("IDX", fournisseur=fournisseur)
+
+    # Prix en séance de 100, clôture définitive à 130
+    revises = prix.copy()
+    revises[-1] = 130.0
+    fournisseur.ajouter_historique("IDX", pd.DataFrame({"Close": revises}, index=dates))
+    assert index.rafraichir() == 1
+    assert index.rafraichir() == 0
+
+    attendu = analytique.StatistiquesCumulees()
+    attendu.initialiser(revises)
+    assert index.historique_prix[-1] == 130.0
+    np.testing.assert_allclose(index.historique_rendements, analytique.rendements(revises))
+    assert np.isclose(index.maximum_drawdown(), analytique.maximum_drawdown(revises))
+    assert np.isclose(index.volatilite(), attendu.volatilite())
+    assert np.isclose(index.calculer_sharpe(), attendu.sharpe(0.01))
+    assert index.serie().valeur_au(dates[-1]) == 130.0
+
+    # Séance suivante : le rendement part de la clôture révisée
+    suivante = pd.DataFrame({"Close": np.append(revises, 117.0)}, index=dates.append(pd.DatetimeIndex([dates[-1] + pd.offsets.BDay()])))
+    fournisseur.ajouter_historique("IDX", suivante)
+    assert index.rafraichir() == 1
+    assert np.isclose(index.historique_rendements[-1], 117.0 / 130.0 - 1.0)
+
+
+def test_performances_fenetres_sur_cinq_ans():
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=5 * 262 + 10)
+    prix = 100.0 * np.cumprod(1 + np.random.default_rng(0).normal(0.0, 0.01, len(dates)))
+    index = Index("IDX", fournisseur=_fournisseur(dates, prix))
+    performances = index.get_performances_fenetres()["Rendement"]
+    assert performances.notna().all()
+    assert len(set(performances[["1Y", "3Y", "5Y"]])) == 3
@@ -0,0 +1,84 @@
+import logging
+from datetime import datetime
+import pandas as pd
+import fournisseur_donnees
+from classe_portefeuille import DATA_FILE, Portefeuille
+from fournisseur_donnees import FournisseurDonnees
+
+
+def test_import_ventes_et_lignes_invalides(tmp_path, monkeypatch, caplog):
+    monkeypatch.chdir(tmp_path)
+    portefeuille = Portefeuille("p")
+    transactions = pd.DataFrame({
+        "ticker": ["AAPL", "AAPL", "AAPL", "MSFT", "MSFT"],
+        "quantite": ["10", "-4", "0", "abc", "3"],
+        "date_achat": ["2024-01-02", "2024-02-01", "2024-02-02", "2024-02-03", "2024-01-05"],
+        "prix_achat": [100.0, 120.0, 110.0, 300.0, 310.0],
+    })
+
+    with caplog.at_level(logging.WARNING, logger="portfolio"):
+        assert portefeuille.importer_transactions(transactions) == 3
+
+    assert portefeuille.positions.get("AAPL")[1] == 6
+    assert portefeuille.positions.get("MSFT")[1] == 3
+    ignorees = [r for r in caplog.records if "Transaction ignorée" in r.getMessage()]
+    assert len(ignorees) == 2
+    vente = portefeuille.db.get_transactions("p").query("quantite < 0")
+    assert vente[["ticker", "quantite", "prix"]].values.tolist() == [["AAPL", -4, 120.0]]
+    assert vente["date"].iloc[0] == pd.Timestamp("2024-02-01")
+    assert [(t, q) for t, q, _, _ in portefeuille.db.get_actions("p")] == [("AAPL", 6), ("MSFT", 3)]
+
+
+class _FournisseurInterdit(FournisseurDonnees):
+    def get_historique(self, ticker, debut, fin, intervalle="1d"):
+        raise AssertionError("appel réseau inattendu")
+
+    def get_infos(self, ticker):
+        raise AssertionError("appel réseau inattendu")
+
+
+def _portefeuille_sauvegarde():
+    portefeuille = Portefeuille("p")
+    portefeuille.importer_transactions([("AAPL", 10, "2024-01-02", 100.0), ("AAPL", 10, "2024-02-02", 120.0),
+                                        ("MSFT", 3, "2024-01-05", 310.0)])
+    portefeuille.save_portefeuille_to_file()
+    return portefeuille
+
+
+def test_rechargement_sans_appel_reseau(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _portefeuille_sauvegarde()
+    monkeypatch.setattr(fournisseur_donnees, "_fournisseur_defaut", _FournisseurInterdit())
+
+    recharge = Portefeuille("p")
+    recharge.charger_portefeuille_depuis_fichier()
+
+    assert recharge.positions.get("AAPL")[1:3] == (20, 110.0)
+    assert recharge.positions.get("MSFT")[1:3] == (3, 310.0)
+    assert recharge.date_achat_portefeuille == datetime(2024, 1, 2)
+
+
+def test_rechargement_ancien_fichier_sans_prix(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _portefeuille_sauvegarde()
+    pd.read_csv(DATA_FILE).drop(columns="Prix Achat").to_csv(DATA_FILE, index=False)
+    monkeypatch.setattr(fournisseur_donnees, "_fournisseur_defaut", _FournisseurInterdit())
+
+    recharge = Portefeuille("p")
+    recharge.charger_portefeuille_depuis_fichier()
+
+    assert recharge.positions.get("AAPL")[2] == 110.0
+
+
+def test_rechargement_n_ecrit_pas_dans_le_registre(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    portefeuille = _portefeuille_sauvegarde()
+    transactions = portefeuille.db.get_transactions("p")
+    lots = portefeuille.db.get_actions("p")
+    monkeypatch.setattr(fournisseur_donnees, "_fournisseur_defaut", _FournisseurInterdit())
+
+    for _ in range(2):
+        Portefeuille("p").charger_portefeuille_depuis_fichier()
+
+    pd.testing.assert_frame_equal(portefeuille.db.get_transactions("p"), transactions)
+    assert portefeuille.db.get_actions("p") == lots
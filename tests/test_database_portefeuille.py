@@ -0,0 +1,39 @@
+import copyreg
+import pickle
+from datetime import datetime
+import pandas as pd
+from database_portefeuille import COLONNES, DatabasePortefeuille
+
+
+class _AncienneBase:
+    # Reproduit le pickle des anciennes versions : l'état contient le CSV et le DataFrame
+    def __init__(self, df):
+        self.df = df
+
+    def __reduce__(self):
+        return copyreg._reconstructor, (DatabasePortefeuille, object, None), {"filename": "portfolios.csv", "df": self.df}
+
+
+def test_ancien_pickle_migre_vers_sqlite(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    df = pd.DataFrame([("p", "AAPL", 10, 150.0, "2024-01-02")], columns=COLONNES)
+    df.to_csv("portfolios.csv", index=False)
+
+    db = pickle.loads(pickle.dumps(_AncienneBase(df)))
+
+    assert db.filename == "portfolios.db"
+    assert db.fichier_csv == "portfolios.csv"
+    db.ajouter_action("p", "MSFT", 5, 300.0, datetime(2024, 2, 1))
+    db.retirer_action("p", "AAPL", 4)
+    actions = {ticker: quantite for ticker, quantite, _, _ in db.get_actions("p")}
+    assert actions == {"AAPL": 6, "MSFT": 5}
+    assert len(db.get_transactions("p")) == 3
+
+
+def test_pickle_recent_conserve_les_chemins(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = DatabasePortefeuille(filename="base.db", fichier_csv=None)
+    copie = pickle.loads(pickle.dumps(db))
+    assert (copie.filename, copie.fichier_csv) == ("base.db", None)
+    copie.ajouter_action("p", "AAPL", 1, 100.0, datetime(2024, 1, 2))
+    assert len(db.get_actions("p")) == 1
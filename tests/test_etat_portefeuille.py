@@ -0,0 +1,64 @@
+from datetime import datetime
+import fournisseur_donnees
+from classe_portefeuille import Portefeuille
+from etat_portefeuille import JournalPortefeuille
+from fournisseur_donnees import FournisseurDonnees
+
+
+class _FournisseurInterdit(FournisseurDonnees):
+    def get_historique(self, ticker, debut, fin, intervalle="1d"):
+        raise AssertionError("appel réseau inattendu")
+
+    def get_infos(self, ticker):
+        raise AssertionError("appel réseau inattendu")
+
+
+def _etat(portefeuille):
+    return (portefeuille.nom, list(zip(portefeuille.positions.tickers, portefeuille.quantites.tolist(),
+                                       portefeuille.positions.prix_achats.tolist(), portefeuille.dates_achat)))
+
+
+def _lignes(fichier):
+    with open(fichier, encoding="utf-8") as f:
+        return [ligne for ligne in f if ligne.strip()]
+
+
+def test_aller_retour_journal_et_compaction(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(fournisseur_donnees, "_fournisseur_defaut", _FournisseurInterdit())
+    fichier = str(tmp_path / "portefeuille.jsonl")
+    journal = JournalPortefeuille(fichier, seuil_compaction=5)
+
+    portefeuille = Portefeuille("p")
+    journal.creer(portefeuille)
+    portefeuille.importer_transactions([("AAPL", 10, "2024-01-02", 100.0), ("MSFT", 3, "2024-01-05", 310.0),
+                                        ("AIR.PA", 7, "2024-03-01", 150.5)])
+    assert portefeuille.retirer_action("AAPL", 4)
+    attendu = _etat(portefeuille)
+    assert attendu[1][0][:2] == ("AAPL", 6)
+    # En-tête, instantané vide, trois ajouts et un retrait : pas encore de compaction
+    assert len(_lignes(fichier)) == 6
+
+    recharge = JournalPortefeuille(fichier, seuil_compaction=5).charger()
+    assert _etat(recharge) == attendu
+    assert recharge.journal._operations == 4
+
+    # Cinquième opération sur le portefeuille rechargé : le fichier est compacté en un instantané
+    assert recharge.retirer_action("MSFT", 3)
+    attendu = _etat(recharge)
+    assert [ticker for ticker, *_ in attendu[1]] == ["AAPL", "AIR.PA"]
+    assert len(_lignes(fichier)) == 2
+    assert recharge.journal._operations == 0
+
+    compacte = JournalPortefeuille(fichier).charger()
+    assert _etat(compacte) == attendu
+    assert compacte.dates_achat == [datetime(2024, 1, 2), datetime(2024, 3, 1)]
+
+    # Les opérations suivantes s'ajoutent après l'instantané et sont relues
+    assert compacte.retirer_action("AIR.PA", 2)
+    attendu = _etat(compacte)
+    assert _etat(JournalPortefeuille(fichier).charger()) == attendu
+
+
+def test_fichier_absent(tmp_path):
+    assert JournalPortefeuille(str(tmp_path / "absent.jsonl")).charger() is None
@@ -0,0 +1,41 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+from fournisseur_donnees import CachePrix, FournisseurLocal
+
+
+class _SourceComptee(FournisseurLocal):
+    def __init__(self):
+        super().__init__()
+        self.appels = []
+
+    def get_historique(self, ticker, debut, fin, intervalle="1d"):
+        self.appels.append((ticker.upper(), debut, fin))
+        return super().get_historique(ticker, debut, fin, intervalle)
+
+
+def _source():
+    source = _SourceComptee()
+    dates = pd.bdate_range("2024-01-01", "2024-03-29")
+    prix = np.linspace(100.0, 120.0, len(dates))
+    source.ajouter_historique("AAPL", pd.DataFrame({"Open": prix, "High": prix, "Low": prix, "Close": prix, "Volume": 1.0}, index=dates))
+    return source
+
+
+def test_plage_couverte_jusqu_a_la_derniere_cotation(tmp_path):
+    source = _source()
+    cache = CachePrix(source, repertoire=str(tmp_path))
+    assert len(cache.get_historique("AAPL", date(2024, 1, 1), date(2024, 6, 1))) == 65
+    assert cache._plages[("AAPL", "1d")] == [(date(2024, 1, 1), date(2024, 3, 30))]
+    source.appels.clear()
+    cache.get_historique("AAPL", date(2024, 2, 1), date(2024, 3, 1))
+    assert source.appels == []
+
+
+def test_ticker_vide_non_couvert(tmp_path):
+    source = _source()
+    cache = CachePrix(source, repertoire=str(tmp_path))
+    assert cache.get_historique("INCONNU", date(2024, 1, 1), date(2024, 3, 1)).empty
+    assert cache._plages[("INCONNU", "1d")] == []
+    cache.get_historique("INCONNU", date(2024, 1, 1), date(2024, 3, 1))
+    assert len(source.appels) == 2
@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+from moteur_rendements import MoteurRendements
+
+
+def _clotures():
+    dates = pd.bdate_range("2024-01-01", periods=5)
+    return pd.DataFrame({"AAPL": [100.0, 101.0, 102.0, 103.0, 104.0]}, index=dates)
+
+
+def test_transaction_apres_derniere_cloture_compte_a_la_derniere_seance():
+    clotures = _clotures()
+    transactions = pd.DataFrame({
+        "ticker": ["AAPL", "AAPL", "AAPL"],
+        "quantite": [10.0, 5.0, -3.0],
+        "prix": [100.0, np.nan, 110.0],
+        "date": pd.to_datetime(["2024-01-01", "2024-01-08", "2024-01-09"]),
+    })
+    moteur = MoteurRendements(transactions, clotures)
+    positions = moteur.positions()["AAPL"]
+    assert positions.iloc[-2] == 10.0
+    assert positions.iloc[-1] == 12.0
+    # Achat sans prix valorisé à la dernière clôture, vente à son prix
+    assert moteur.flux[-1] == 5.0 * 104.0 - 3.0 * 110.0
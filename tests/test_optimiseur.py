@@ -0,0 +1,41 @@
+import numpy as np
+from optimiseur import OptimiseurMoyenneVariance, projeter_simplexe
+
+
+def _projection_par_dichotomie(v, poids_max):
+    # sum(clip(v - τ, 0, poids_max)) décroît avec τ : on cherche τ tel que la somme vaille 1
+    bas, haut = v.min() - poids_max - 1.0, v.max() + 1.0
+    for _ in range(200):
+        tau = (bas + haut) / 2
+        if np.clip(v - tau, 0.0, poids_max).sum() > 1.0:
+            bas = tau
+        else:
+            haut = tau
+    return np.clip(v - (bas + haut) / 2, 0.0, poids_max)
+
+
+def test_projeter_simplexe_egal_a_la_dichotomie():
+    generateur = np.random.default_rng(0)
+    for n in (1, 2, 5, 30):
+        for poids_max in (1.0, 0.5, 0.2):
+            if poids_max * n < 1:
+                continue
+            for _ in range(20):
+                v = generateur.normal(0.0, 1.0, n)
+                poids = projeter_simplexe(v, poids_max)
+                assert np.isclose(poids.sum(), 1.0, atol=1e-12)
+                assert poids.min() >= 0.0 and poids.max() <= poids_max + 1e-12
+                np.testing.assert_allclose(poids, _projection_par_dichotomie(v, poids_max), atol=1e-10)
+
+
+def test_min_variance_egal_a_la_forme_fermee():
+    generateur = np.random.default_rng(1)
+    n = 6
+    facteurs = generateur.normal(0.0, 0.05, (n, n))
+    covariance = facteurs @ facteurs.T + np.diag(generateur.uniform(0.02, 0.08, n))
+    # Sans contrainte active, w = Σ⁻¹1 / 1ᵀΣ⁻¹1
+    inverse_un = np.linalg.solve(covariance, np.ones(n))
+    attendu = inverse_un / inverse_un.sum()
+    assert attendu.min() > 0
+    optimiseur = OptimiseurMoyenneVariance(np.zeros(n), covariance, tolerance=1e-13, iterations_max=100_000)
+    np.testing.assert_allclose(optimiseur.min_variance().to_numpy(), attendu, atol=1e-8)
@@ -0,0 +1,89 @@
+import threading
+import numpy as np
+import pandas as pd
+import fournisseur_donnees
+from classe_actifs import Actifs
+from fournisseur_donnees import FournisseurLocal
+from serie_datee import SerieDatee, series_clotures, vider_series_clotures
+
+
+def _drawdown_direct(prix):
+    pics = np.maximum.accumulate(prix)
+    return float(np.max(1.0 - prix / pics))
+
+
+def test_drawdown_entre_egal_au_calcul_direct():
+    generateur = np.random.default_rng(0)
+    dates = pd.bdate_range("2020-01-01", periods=300)
+    prix = 100.0 * np.exp(np.cumsum(generateur.normal(0.0, 0.02, len(dates))))
+    serie = SerieDatee(dates, prix)
+    for _ in range(200):
+        i, j = np.sort(generateur.integers(0, len(dates), 2))
+        attendu = _drawdown_direct(prix[i:j + 1])
+        assert np.isclose(serie.drawdown_entre(dates[i], dates[j]), attendu, rtol=0, atol=1e-12)
+    assert np.isclose(serie.drawdown_entre(), _drawdown_direct(prix), rtol=0, atol=1e-12)
+
+
+def test_drawdown_entre_bornes_hors_seances():
+    dates = pd.bdate_range("2024-01-01", periods=5)
+    serie = SerieDatee(dates, [100.0, 120.0, 90.0, 130.0, 117.0])
+    # Samedi et dimanche : la fenêtre va de la séance suivante à la séance précédente
+    assert np.isclose(serie.drawdown_entre("2023-12-30", "2024-01-07"), 0.25)
+    assert np.isclose(serie.drawdown_entre("2024-01-04", "2024-01-05"), 0.1)
+    assert serie.drawdown_entre("2024-02-01", "2024-03-01") is None
+
+
+def _fournisseur_local(ticker, prix):
+    fournisseur = FournisseurLocal()
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=len(prix))
+    fournisseur.ajouter_historique(ticker, pd.DataFrame({"Close": prix}, index=dates))
+    return fournisseur, dates
+
+
+def test_fournisseur_injecte_utilise(monkeypatch):
+    class _Interdit(FournisseurLocal):
+        def get_historique(self, ticker, debut, fin, intervalle="1d"):
+            raise AssertionError("fournisseur partagé utilisé")
+
+    monkeypatch.setattr(fournisseur_donnees, "_fournisseur_defaut", _Interdit())
+    fournisseur, dates = _fournisseur_local("XYZ", [10.0, 11.0, 12.0])
+    actif = Actifs("XYZ", fournisseur=fournisseur)
+    assert actif.get_prix_a_date(dates[1].to_pydatetime()) == 11.0
+    assert np.isclose(actif.performance_entre(dates[0])["Rendement"], 0.2)
+
+
+def test_chargement_hors_verrou():
+    vider_series_clotures()
+    debloque = threading.Event()
+
+    class _Lent(FournisseurLocal):
+        def get_historique(self, ticker, debut, fin, intervalle="1d"):
+            debloque.wait(5)
+            return super().get_historique(ticker, debut, fin, intervalle)
+
+    lent = _Lent()
+    rapide, _ = _fournisseur_local("B", [1.0, 2.0])
+    fil = threading.Thread(target=series_clotures, args=(["A"], "2024-01-01", lent))
+    fil.start()
+    try:
+        resultat = {}
+        autre = threading.Thread(target=lambda: resultat.update(series_clotures(["B"], "2024-01-01", rapide)))
+        autre.start()
+        autre.join(2)
+        # Le chargement de B n'attend pas celui de A, bloqué chez son fournisseur
+        assert not autre.is_alive() and len(resultat["B"]) == 2
+    finally:
+        debloque.set()
+        fil.join()
+    vider_series_clotures()
+
+
+def test_fenetre_plus_ancienne_que_l_historique():
+    dates = pd.bdate_range(end="2024-06-28", periods=300)
+    prix = np.linspace(100.0, 130.0, len(dates))
+    performances = SerieDatee(dates, prix).performances_fenetres()
+    assert performances["1Y"]["Rendement"] is not None
+    for fenetre in ("3Y", "5Y"):
+        assert all(valeur is None for valeur in performances[fenetre].values())
+    # Un début tombant juste avant la première séance (week-end) reste accepté
+    assert np.isclose(SerieDatee(dates, prix).rendement_entre(dates[0] - pd.Timedelta(days=3)), 0.3)
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import analytique
+from fournisseur_donnees import FournisseurLocal
+from service_covariance import CovarianceCumulee, CovarianceExponentielle, CovarianceGlissante, ServiceCovariance
+
+
+def _rendements(t=120, n=4):
+    return np.random.default_rng(0).normal(0.0, 0.01, (t, n))
+
+
+def test_exponentielle_initialiser_egal_aux_ajouts_successifs():
+    r = _rendements()
+    for decroissance in (0.94, 0.97):
+        initialise = CovarianceExponentielle(r.shape[1], decroissance)
+        initialise.initialiser(r)
+        pas_a_pas = CovarianceExponentielle(r.shape[1], decroissance)
+        for ligne in r:
+            pas_a_pas.ajouter(ligne)
+        np.testing.assert_allclose(initialise.moyenne, pas_a_pas.moyenne, rtol=0, atol=1e-15)
+        np.testing.assert_allclose(initialise.covariance(), pas_a_pas.covariance(), rtol=0, atol=1e-15)
+        # L'état reste cohérent pour les séances suivantes
+        initialise.ajouter(r[0])
+        pas_a_pas.ajouter(r[0])
+        np.testing.assert_allclose(initialise.covariance(), pas_a_pas.covariance(), rtol=0, atol=1e-15)
+
+
+def test_cumulee_et_glissante_egales_a_numpy():
+    r = _rendements()
+    cumulee = CovarianceCumulee(r.shape[1])
+    cumulee.initialiser(r[:50])
+    glissante = CovarianceGlissante(r.shape[1], fenetre=30)
+    glissante.initialiser(r[:50])
+    for ligne in r[50:]:
+        cumulee.ajouter(ligne)
+        glissante.ajouter(ligne)
+    np.testing.assert_allclose(cumulee.covariance(), np.cov(r, rowvar=False), rtol=0, atol=1e-15)
+    np.testing.assert_allclose(glissante.covariance(), np.cov(r[-30:], rowvar=False), rtol=0, atol=1e-15)
+    np.testing.assert_allclose(cumulee.correlation(), np.corrcoef(r, rowvar=False), rtol=0, atol=1e-12)
+
+
+def test_remplacer_dernier_egal_a_l_initialisation_sur_les_rendements_revises():
+    r = _rendements()
+    revises = r.copy()
+    revises[-1] = [0.05, -0.03, 0.01, 0.02]
+    for classe in (CovarianceCumulee, CovarianceGlissante, CovarianceExponentielle):
+        estimateur = classe(r.shape[1])
+        estimateur.initialiser(r[:-1])
+        estimateur.ajouter(r[-1])
+        estimateur.remplacer_dernier(revises[-1])
+        attendu = classe(r.shape[1])
+        attendu.initialiser(revises)
+        np.testing.assert_allclose(estimateur.covariance(), attendu.covariance(), rtol=0, atol=1e-15)
+
+
+def test_service_actualiser_revise_la_derniere_seance():
+    generateur = np.random.default_rng(2)
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize() - pd.Timedelta(days=10), periods=40)
+    prix = 100.0 * np.cumprod(1 + generateur.normal(0.0, 0.01, (len(dates), 3)), axis=0)
+    fournisseur = FournisseurLocal()
+
+    def publier(dates, prix):
+        for j, ticker in enumerate(("A", "B", "C")):
+            fournisseur.ajouter_historique(ticker, pd.DataFrame({"Close": prix[:, j]}, index=dates))
+
+    publier(dates, prix)
+    service = ServiceCovariance(["A", "B", "C"], methode="exponentielle", period="1y", fournisseur=fournisseur)
+    prix = prix.copy()
+    prix[-1] *= [1.2, 0.9, 1.0]
+    publier(dates, prix)
+    assert service.actualiser() == 1
+    assert service.actualiser() == 0
+
+    dates = dates.append(pd.DatetimeIndex([dates[-1] + pd.offsets.BDay()]))
+    prix = np.vstack([prix, prix[-1] * [0.97, 1.02, 1.01]])
+    publier(dates, prix)
+    assert service.actualiser() == 1
+
+    attendu = CovarianceExponentielle(3)
+    attendu.initialiser(analytique.rendements(prix))
+    np.testing.assert_allclose(service.covariance().to_numpy(), attendu.covariance(), rtol=0, atol=1e-15)
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from simulation_risque import simuler_rendements, var_cvar, var_cvar_monte_carlo
+
+
+def _rendements(n_jours=500, n_actifs=3, graine=0):
+    generateur = np.random.default_rng(graine)
+    return generateur.normal(0.0005, 0.015, (n_jours, n_actifs))
+
+
+@pytest.mark.parametrize("methode", ["covariance", "bootstrap"])
+def test_resultats_identiques_avec_ou_sans_pool(methode):
+    rendements, poids = _rendements(), [0.5, 0.3, 0.2]
+    sequentiel = simuler_rendements(rendements, poids, (1, 10), 5_000, methode, graine=42, processus=0,
+                                    taille_bloc=1_000)
+    parallele = simuler_rendements(rendements, poids, (1, 10), 5_000, methode, graine=42, processus=2,
+                                   taille_bloc=1_000)
+    for horizon in (1, 10):
+        np.testing.assert_array_equal(sequentiel[horizon], parallele[horizon])
+
+
+@pytest.mark.parametrize("methode", ["covariance", "bootstrap"])
+def test_resultats_identiques_quelle_que_soit_la_taille_des_blocs(methode):
+    rendements, poids = _rendements(), [0.5, 0.3, 0.2]
+    resultats = [simuler_rendements(rendements, poids, (1, 10), 7_500, methode, graine=7, taille_bloc=taille)
+                 for taille in (None, 1, 1_000, 3_000, 50_000)]
+    for resultat in resultats[1:]:
+        for horizon in (1, 10):
+            np.testing.assert_array_equal(resultat[horizon], resultats[0][horizon])
+    assert len(resultats[0][1]) == 7_500
+
+
+def test_graines_differentes_resultats_differents():
+    rendements, poids = _rendements(), [0.5, 0.3, 0.2]
+    premier = simuler_rendements(rendements, poids, (1,), 2_000, graine=1)
+    second = simuler_rendements(rendements, poids, (1,), 2_000, graine=2)
+    assert not np.array_equal(premier[1], second[1])
+
+
+def test_var_cvar_signe_et_ordre():
+    resultat = var_cvar_monte_carlo(_rendements(), [0.5, 0.3, 0.2], horizons=(1, 10), niveaux=(0.95, 0.99),
+                                    n_simulations=20_000, graine=0, valeur=10_000)
+    resultat = resultat.set_index(["Horizon (jours)", "Niveau"])
+    # Pertes exprimées en positif, CVaR au moins égale à la VaR
+    assert (resultat["VaR"] > 0).all()
+    assert (resultat["CVaR"] >= resultat["VaR"]).all()
+    for horizon in (1, 10):
+        assert resultat.loc[(horizon, 0.99), "VaR"] > resultat.loc[(horizon, 0.95), "VaR"]
+        assert resultat.loc[(horizon, 0.99), "CVaR"] > resultat.loc[(horizon, 0.95), "CVaR"]
+    for niveau in (0.95, 0.99):
+        assert resultat.loc[(10, niveau), "VaR"] > resultat.loc[(1, niveau), "VaR"]
+    assert np.allclose(resultat["VaR (montant)"], resultat["VaR"] * 10_000)
+
+
+def test_var_cvar_sur_distribution_connue():
+    rendements_simules = np.linspace(-0.10, 0.10, 2001)
+    var, cvar = var_cvar(rendements_simules, 0.95)
+    assert np.isclose(var, 0.09)
+    assert np.isclose(cvar, 0.095, atol=1e-4)
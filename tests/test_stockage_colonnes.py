@@ -0,0 +1,137 @@
+import json
+import os
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+from fournisseur_donnees import FournisseurLocal
+from stockage_colonnes import LARGEUR_BLOC, StockageColonnes
+
+
+class _SourceComptee(FournisseurLocal):
+    def __init__(self):
+        super().__init__()
+        self.appels = []
+
+    def get_historique(self, ticker, debut, fin, intervalle="1d"):
+        self.appels.append((ticker.upper(), debut, fin))
+        return super().get_historique(ticker, debut, fin, intervalle)
+
+
+def _source():
+    source = _SourceComptee()
+    dates = pd.bdate_range("2024-01-01", "2024-03-29")
+    prix = np.linspace(100.0, 120.0, len(dates))
+    source.ajouter_historique("AAPL", pd.DataFrame({"Open": prix, "High": prix, "Low": prix, "Close": prix, "Volume": 1.0}, index=dates))
+    return source, pd.Series(prix, index=dates)
+
+
+def test_clotures_identiques_a_la_source_et_reouverture_sans_appel(tmp_path):
+    source, attendu = _source()
+    stockage = StockageColonnes(source, repertoire=str(tmp_path))
+    clotures = stockage.get_clotures(["AAPL"], date(2024, 1, 1), date(2024, 6, 1))
+    np.testing.assert_array_equal(clotures["AAPL"].to_numpy(), attendu.to_numpy())
+    assert stockage._plages("AAPL") == [(date(2024, 1, 1), date(2024, 3, 30))]
+
+    source.appels.clear()
+    reouvert = StockageColonnes(source, repertoire=str(tmp_path))
+    dates, valeurs = reouvert.get_serie_clotures("AAPL", date(2024, 2, 1), date(2024, 3, 1))
+    assert source.appels == []
+    np.testing.assert_array_equal(valeurs, attendu["2024-02-01":"2024-02-29"].to_numpy())
+
+
+def test_ticker_vide_non_couvert(tmp_path):
+    source, _ = _source()
+    stockage = StockageColonnes(source, repertoire=str(tmp_path))
+    assert stockage.get_clotures(["INCONNU"], date(2024, 1, 1), date(2024, 3, 1)).empty
+    assert stockage._plages("INCONNU") == []
+    stockage.get_clotures(["INCONNU"], date(2024, 1, 1), date(2024, 3, 1))
+    assert len(source.appels) == 2
+
+
+def test_historiques_et_infos_delegues_a_autres(tmp_path):
+    source, _ = _source()
+    autres, _ = _source()
+    stockage = StockageColonnes(source, repertoire=str(tmp_path), autres=autres)
+    stockage.get_clotures(["AAPL"], date(2024, 1, 1), date(2024, 2, 1))
+    stockage.get_historique("AAPL", date(2024, 1, 1), date(2024, 2, 1))
+    stockage.get_clotures(["AAPL"], date(2024, 1, 1), date(2024, 2, 1), intervalle="1wk")
+    assert len(source.appels) == 1
+    assert len(autres.appels) == 2
+
+
+def test_vider_sur_disque_force_le_retelechargement(tmp_path):
+    from fournisseur_donnees import CachePrix
+    source, attendu = _source()
+    autres = CachePrix(source, repertoire=str(tmp_path / "cache"))
+    stockage = StockageColonnes(source, repertoire=str(tmp_path / "colonnes"), autres=autres)
+    stockage.get_clotures(["AAPL"], date(2024, 1, 1), date(2024, 6, 1))
+    stockage.get_historique("AAPL", date(2024, 1, 1), date(2024, 6, 1))
+
+    stockage.vider("AAPL", disque=True)
+    assert stockage._plages("AAPL") == []
+    assert not any(tmp_path.joinpath("cache").iterdir())
+
+    # Un autre processus qui rouvre le stockage ne retrouve rien non plus
+    source.appels.clear()
+    reouvert = StockageColonnes(source, repertoire=str(tmp_path / "colonnes"), autres=CachePrix(source, repertoire=str(tmp_path / "cache")))
+    clotures = reouvert.get_clotures(["AAPL"], date(2024, 1, 1), date(2024, 6, 1))
+    reouvert.get_historique("AAPL", date(2024, 1, 1), date(2024, 6, 1))
+    assert len(source.appels) == 2
+    np.testing.assert_array_equal(clotures["AAPL"].to_numpy(), attendu.to_numpy())
+
+
+def _clotures(tickers, dates, decalage=0.0):
+    return pd.DataFrame({t: np.arange(len(dates), dtype=np.float64) + i + decalage for i, t in enumerate(tickers)},
+                        index=dates)
+
+
+def test_milliers_de_tickers_sous_une_limite_de_fichiers_ouverts(tmp_path):
+    resource = pytest.importorskip("resource")
+    souple, dure = resource.getrlimit(resource.RLIMIT_NOFILE)
+    tickers = [f"T{i:04d}" for i in range(1500)]
+    dates = pd.bdate_range("2024-01-01", periods=20)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (256, dure))
+    try:
+        stockage = StockageColonnes(FournisseurLocal(), repertoire=str(tmp_path))
+        stockage.ecrire(_clotures(tickers, dates))
+        vues = [stockage.lire(t)[1] for t in tickers]
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (souple, dure))
+    assert len(stockage._blocs) == -(-len(tickers) // LARGEUR_BLOC)
+    assert vues[1234][0] == 1234.0
+
+
+def test_deux_processus_sur_le_meme_repertoire(tmp_path):
+    # Deux instances sur le même répertoire se comportent comme deux processus (verrous distincts)
+    premier = StockageColonnes(FournisseurLocal(), repertoire=str(tmp_path))
+    second = StockageColonnes(FournisseurLocal(), repertoire=str(tmp_path))
+    dates = pd.bdate_range("2024-01-01", periods=20)
+    premier.ecrire(_clotures(["AAPL"], dates))
+    second.ecrire(_clotures(["MSFT"], dates, decalage=100.0))
+    assert premier._meta["tickers"].keys() != second._meta["tickers"].keys()
+
+    # Le premier réécrit tout dans une nouvelle génération : le second la relit au lieu de
+    # continuer sur les fichiers supprimés, et ses écritures ne perdent pas celles du premier
+    longues = pd.bdate_range("2010-01-01", "2024-01-26")
+    premier.ecrire(_clotures(["AAPL"], longues))
+    second.ecrire(_clotures(["MSFT"], pd.bdate_range("2024-01-29", periods=5), decalage=500.0))
+
+    troisieme = StockageColonnes(FournisseurLocal(), repertoire=str(tmp_path))
+    assert len(troisieme.lire("AAPL")[1]) == len(longues)
+    dates_msft, valeurs_msft = troisieme.lire("MSFT")
+    assert len(valeurs_msft) == 25 and valeurs_msft[0] == 100.0 and valeurs_msft[-1] == 504.0
+    generation = troisieme._meta["generation"]
+    assert generation > 0
+    assert all(nom.endswith(f"_{generation}.npy") for nom in os.listdir(tmp_path) if nom.endswith(".npy"))
+
+
+def test_ancien_format_reconstruit(tmp_path):
+    np.save(tmp_path / "AAPL_0.npy", np.zeros(4))
+    with open(tmp_path / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"generation": 0, "lignes": 0, "capacite": 4, "tickers": {"AAPL": {"fichier": "AAPL", "plages": []}}}, f)
+    source, attendu = _source()
+    stockage = StockageColonnes(source, repertoire=str(tmp_path))
+    clotures = stockage.get_clotures(["AAPL"], date(2024, 1, 1), date(2024, 6, 1))
+    np.testing.assert_array_equal(clotures["AAPL"].to_numpy(), attendu.to_numpy())
+    assert not (tmp_path / "AAPL_0.npy").exists()